@@ -352,16 +352,21 @@ class XenServer(object):
         self.hostname = hostname
         self.dryrun = dryrun
 
+    exec_timeout = 120
+
     def exec_cmd(self, cmd):
-        """Execute a command and return output"""
-        output = subprocess.check_output(cmd, shell=True)
+        """Execute a command and return output
+
+        cmd is an argument list, executed without a shell. A hung command
+        is killed after exec_timeout seconds (subprocess.TimeoutExpired)."""
+        output = subprocess.check_output(cmd, timeout=XenServer.exec_timeout)
         return output.decode('ascii')
 
     def xe(self, cmd):
         """Execute a xe command on the XenServer"""
         log.debug("XenServer.xe(%s)" % cmd)
 
-        return self.exec_cmd("ssh %s 'xe %s'" % (self.hostname, cmd))
+        return self.exec_cmd(["ssh", self.hostname, "xe %s" % cmd])
     
     def vm_list(self):
         """Return a dict of vm:s"""
@@ -1 +1 @@
-__all__ = ['jobs', 'launcher', 'lrms', 'remote', 'settings', 'slurm', 'config', 'desktop', 'lmod', 'lmod_ui', 'splash_win', 'resource_win', 'monitor', 'hostlist', 'integration', 'scripts', 'node_monitor', 'ui_main_window_simplified', 'ui_job_info', 'ui_lmod_query', 'ui_main_window_simplified', 'ui_node_window', 'ui_notebook_job_prop_win',  'ui_resource_specification', 'ui_session_manager', 'toolbar_icons_rc', 'setup_win', 'basic_config', 'local_queue', 'launch_utils', 'nblaunch']
+__all__ = ['jobs', 'launcher', 'lrms', 'remote', 'settings', 'slurm', 'config', 'desktop', 'lmod', 'lmod_ui', 'splash_win', 'resource_win', 'monitor', 'hostlist', 'integration', 'scripts', 'node_monitor', 'ui_main_window_simplified', 'ui_job_info', 'ui_lmod_query', 'ui_main_window_simplified', 'ui_node_window', 'ui_notebook_job_prop_win',  'ui_resource_specification', 'ui_session_manager', 'toolbar_icons_rc', 'setup_win', 'basic_config', 'local_queue', 'launch_utils', 'nblaunch', 'startup_cache', 'stated', 'queue_snapshot', 'queue_search', 'scontrol', 'slurm_json', 'slurm_rest', 'runner', 'command_stats', 'launch_trace', 'warm_pool', 'telemetry']
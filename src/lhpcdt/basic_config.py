@@ -66,6 +66,8 @@ class BasicConfig:
         Initializes the configuration with default values for the GFX Launcher.
         """
 
+        self.cluster_index = None
+
         self.clear()
         self.init_defaults()
         self.query_slurm()
@@ -112,20 +114,24 @@ class BasicConfig:
         Query the SLURM scheduler for partition information.
 
         This method uses the `sinfo` command to query the SLURM scheduler for partition information.
-        It then parses the output to extract the partition names and descriptions.
+        Features are looked up in a cluster index built from a single `scontrol show nodes` query,
+        which is reused when the configuration is reloaded.
         The partition names and descriptions are stored in the `config` attribute.
 
         Returns:
             None
         """
-        slurm = lrms.Slurm()
-        slurm.query_partitions()
+        if self.cluster_index is None:
+            slurm = lrms.Slurm()
+            slurm.query_partitions()
+            self.cluster_index = slurm.query_cluster_index()
+            self.slurm_partitions = slurm.partitions
 
-        for part in slurm.partitions:
+        for part in self.slurm_partitions:
             self.partitions[part] = ""
 
         for part in self.partitions:
-            features = slurm.query_features(part)
+            features = self.cluster_index.features(part)
 
             for feature in features:
                 self.features[feature] = ""
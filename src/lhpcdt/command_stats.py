@@ -0,0 +1,237 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Command statistics module
+
+Keeps per-process statistics of the external commands run by the command
+runner and of slurmrestd requests. Commands are grouped in classes, e.g.
+"squeue", "scontrol show nodes" or "ssh". For each class the number of
+calls, failures, timeouts, output size and a latency histogram are kept.
+
+The statistics are written as JSON to ~/.lhpc/stats when the process
+exits, unless command_stats = no is set in the [general] section of the
+configuration.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import datetime
+import threading
+
+from lhpcdt import config
+
+# Upper bounds of the latency histogram buckets in milliseconds. The last
+# bucket collects everything slower.
+
+latency_buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+
+# Tools where the sub command and object are part of the class
+
+subcommand_tools = ["scontrol", "sacctmgr", "xe"]
+
+outcomes = ["ok", "failed", "timeout", "cancelled", "error"]
+
+
+def command_class(args):
+    """Return the statistics class of a command argument list"""
+
+    if len(args) == 0:
+        return ""
+
+    tool = os.path.basename(str(args[0]))
+
+    if tool in subcommand_tools:
+        words = [str(arg) for arg in args[1:3] if not str(arg).startswith("-")]
+        return " ".join([tool] + words)
+    elif tool in ["sh", "bash"] and len(args) > 2 and args[1] == "-c":
+        words = str(args[2]).split()
+        return "%s -c %s" % (tool, os.path.basename(words[0]) if len(words) > 0 else "")
+    else:
+        return tool
+
+
+class ClassStats(object):
+    """Counters and latency histogram of a command class"""
+
+    def __init__(self):
+        self.count = 0
+        self.outcomes = dict.fromkeys(outcomes, 0)
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = 0.0
+        self.output_bytes = 0
+        self.histogram = [0] * (len(latency_buckets) + 1)
+
+    def add(self, duration, outcome, output_size):
+        self.count += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.total_time += duration
+        self.min_time = duration if self.min_time is None else min(self.min_time, duration)
+        self.max_time = max(self.max_time, duration)
+        self.output_bytes += output_size
+
+        milliseconds = duration * 1000.0
+        bucket = 0
+
+        while bucket < len(latency_buckets) and milliseconds > latency_buckets[bucket]:
+            bucket += 1
+
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        """Return the upper bound in seconds of the bucket holding the
+        percentile, limited to the slowest recorded time"""
+
+        if self.count == 0:
+            return 0.0
+
+        target = fraction * self.count
+        total = 0
+
+        for bucket, count in enumerate(self.histogram):
+            total += count
+            if total >= target:
+                if bucket < len(latency_buckets):
+                    return min(latency_buckets[bucket] / 1000.0, self.max_time)
+                else:
+                    return self.max_time
+
+        return self.max_time
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "outcomes": dict(self.outcomes),
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.count if self.count > 0 else 0.0,
+            "min_time": self.min_time if self.min_time is not None else 0.0,
+            "max_time": self.max_time,
+            "p50_time": self.percentile(0.5),
+            "p95_time": self.percentile(0.95),
+            "output_bytes": self.output_bytes,
+            "histogram_ms": {("<=%d" % bound if bucket < len(latency_buckets) else ">%d" % latency_buckets[-1]): count
+                             for bucket, (bound, count) in enumerate(zip(latency_buckets + [None], self.histogram))
+                             if count > 0}
+        }
+
+
+class CommandStats(object):
+    """Statistics of all commands run by this process"""
+
+    __shared = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self):
+        """Class constructor"""
+        self.lock = threading.Lock()
+        self.classes = {}
+        self.start_time = time.time()
+        self.version = 0
+        self.stats_dir = os.path.join(os.path.expanduser("~"), ".lhpc", "stats")
+
+    @classmethod
+    def shared(cls):
+        """Return the statistics of this process
+
+        The statistics are dumped at exit if enabled in the configuration."""
+
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = CommandStats()
+                if config.GfxConfig.create().command_stats:
+                    atexit.register(cls.__shared.dump_quietly)
+
+        return cls.__shared
+
+    def record(self, args, duration, outcome="ok", output_size=0, name=None):
+        """Record a finished command
+
+        name overrides the class derived from args."""
+
+        if name is None:
+            name = command_class(args)
+
+        with self.lock:
+            if name not in self.classes:
+                self.classes[name] = ClassStats()
+            self.classes[name].add(duration, outcome, output_size)
+            self.version += 1
+
+    def summary(self):
+        """Return the statistics as a dict"""
+
+        program = os.path.basename(sys.argv[0]) if len(sys.argv) > 0 else ""
+
+        if program == "" or program.startswith("-"):
+            program = "python"
+
+        with self.lock:
+            return {
+                "program": program,
+                "pid": os.getpid(),
+                "start_time": self.start_time,
+                "end_time": time.time(),
+                "commands": {name: stats.to_dict() for name, stats in sorted(self.classes.items())}
+            }
+
+    def format_table(self):
+        """Return the statistics as a text table"""
+
+        lines = ["%-28s %6s %6s %9s %9s %9s %10s" % ("Command", "Calls", "Fail", "Mean [s]", "p95 [s]",
+                                                    "Max [s]", "Output")]
+
+        with self.lock:
+            for name, stats in sorted(self.classes.items()):
+                lines.append("%-28s %6d %6d %9.3f %9.3f %9.3f %10d" % (
+                    name[:28], stats.count, stats.count - stats.outcomes["ok"], stats.total_time / stats.count,
+                    stats.percentile(0.95), stats.max_time, stats.output_bytes))
+
+        return "\n".join(lines)
+
+    def dump(self, directory=""):
+        """Write the statistics as JSON and return the filename"""
+
+        if directory == "":
+            directory = self.stats_dir
+
+        summary = self.summary()
+
+        os.makedirs(directory, exist_ok=True)
+
+        filename = os.path.join(directory, "%s-%s-%d.json" % (
+            summary["program"], datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), summary["pid"]))
+
+        with open(filename, "w") as stats_file:
+            json.dump(summary, stats_file, indent=2)
+
+        return filename
+
+    def dump_quietly(self):
+        """Dump at exit if any commands were run, ignoring errors"""
+
+        if len(self.classes) == 0:
+            return
+
+        try:
+            self.dump()
+        except OSError as e:
+            print("Couldn't write command statistics: %s" % e)
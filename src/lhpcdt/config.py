@@ -93,6 +93,14 @@ class GfxConfig(object):
     def _default_props(self):
         """Assign default properties"""
         self.debug_mode = False
+        self.command_stats = True
+        self.command_stats_view = False
+        self.launch_traces = True
+        self.ssh_multiplexing = True
+        self.ssh_control_persist = 300
+        self.telemetry_interval = 2.0
+        self.telemetry_history = 300
+        self.node_resync_interval = 600
         self.script_dir = "/sw/pkg/rviz/sbin/run"
         self.default_part = "rviz"
         self.default_account = "rviz"
@@ -137,6 +145,17 @@ class GfxConfig(object):
         self.feature_ignore = ""
         self.part_ignore = ""
         self.use_sacctmgr = True
+        self.use_startup_cache = True
+        self.cache_ttls = {}
+        self.output_format = "auto"
+        self.backend = "cli"
+        self.rest_url = ""
+        self.rest_api_version = ""
+        self.command_timeout = 60.0
+        self.max_concurrent_commands = 8
+        self.warm_pool = False
+        self.warm_pool_idle_timeout = 600
+        self.warm_pool_min_time = 900
 
         self.module_json_file = "/sw/pkg/rviz/share/modules.json"
 
@@ -177,6 +196,14 @@ class GfxConfig(object):
         print("only_submit = %s" % str(self.only_submit))
         print("modules_json_file = %s" % (self.module_json_file))
         print("help_url = %s" % self.help_url)
+        print("command_stats = %s" % str(self.command_stats))
+        print("command_stats_view = %s" % str(self.command_stats_view))
+        print("launch_traces = %s" % str(self.launch_traces))
+        print("ssh_multiplexing = %s" % str(self.ssh_multiplexing))
+        print("ssh_control_persist = %d" % self.ssh_control_persist)
+        print("telemetry_interval = %g" % self.telemetry_interval)
+        print("telemetry_history = %d" % self.telemetry_history)
+        print("node_resync_interval = %d" % self.node_resync_interval)
 
         print("")
         print("SLURM settings")
@@ -196,6 +223,19 @@ class GfxConfig(object):
         print("feature_ignore = %s" % self.feature_ignore)
         print("part_ignore = %s" % self.part_ignore)
         print("use_sacctmgr = %s" % self.use_sacctmgr)
+        print("use_startup_cache = %s" % self.use_startup_cache)
+        print("output_format = %s" % self.output_format)
+        print("backend = %s" % self.backend)
+        print("rest_url = %s" % self.rest_url)
+        print("rest_api_version = %s" % self.rest_api_version)
+        print("command_timeout = %g" % self.command_timeout)
+        print("max_concurrent_commands = %d" % self.max_concurrent_commands)
+        print("warm_pool = %s" % self.warm_pool)
+        print("warm_pool_idle_timeout = %d" % self.warm_pool_idle_timeout)
+        print("warm_pool_min_time = %d" % self.warm_pool_min_time)
+
+        for source in self.cache_ttls:
+            print("cache_ttl_%s = %d" % (source, self.cache_ttls[source]))
 
         print("")
         print("Feature descriptions:")
@@ -341,6 +381,22 @@ class GfxConfig(object):
                 config, "general", "help_url").replace('"', '')
             self.browser_command = self._config_get(
                 config, "general", "browser_command")
+            self.command_stats = self._config_getboolean(
+                config, "general", "command_stats", True)
+            self.command_stats_view = self._config_getboolean(
+                config, "general", "command_stats_view", False)
+            self.launch_traces = self._config_getboolean(
+                config, "general", "launch_traces", True)
+            self.ssh_multiplexing = self._config_getboolean(
+                config, "general", "ssh_multiplexing", True)
+            self.ssh_control_persist = int(self._config_get(
+                config, "general", "ssh_control_persist", "300"))
+            self.telemetry_interval = float(self._config_get(
+                config, "general", "telemetry_interval", "2.0"))
+            self.telemetry_history = int(self._config_get(
+                config, "general", "telemetry_history", "300"))
+            self.node_resync_interval = int(self._config_get(
+                config, "general", "node_resync_interval", "600"))
 
             self.default_part = self._config_get(
                 config, "slurm", "default_part")
@@ -364,6 +420,16 @@ class GfxConfig(object):
             self.submit_only_slurm_template = self._config_get(
                 config, "slurm", "submit_only_slurm_template")
             self.use_sacctmgr = self._config_getboolean(config, "slurm", "use_sacctmgr", False)
+            self.use_startup_cache = self._config_getboolean(config, "slurm", "use_startup_cache", True)
+            self.output_format = self._config_get(config, "slurm", "output_format", "auto")
+            self.backend = self._config_get(config, "slurm", "backend", "cli")
+            self.rest_url = self._config_get(config, "slurm", "rest_url", "")
+            self.rest_api_version = self._config_get(config, "slurm", "rest_api_version", "")
+            self.command_timeout = float(self._config_get(config, "slurm", "command_timeout", "60"))
+            self.max_concurrent_commands = int(self._config_get(config, "slurm", "max_concurrent_commands", "8"))
+            self.warm_pool = self._config_getboolean(config, "slurm", "warm_pool", False)
+            self.warm_pool_idle_timeout = int(self._config_get(config, "slurm", "warm_pool_idle_timeout", "600"))
+            self.warm_pool_min_time = int(self._config_get(config, "slurm", "warm_pool_min_time", "900"))
 
             self.applications_dir = self._config_get(
                 config, "menus", "applications_dir")
@@ -478,6 +544,8 @@ class GfxConfig(object):
                             else:
                                 exclusive = False
                             self.part_groups_defaults[group]["exclusive"] = exclusive
+                        if directive == "speculative":
+                            self.part_groups_defaults[group]["speculative"] = parts.strip() == "yes"
                   
         except configparser.Error as e:
             self.print_error(e)
@@ -504,6 +572,20 @@ class GfxConfig(object):
             self.print_error(e)
             return False
         
+        # Check for startup cache time-to-live settings (seconds)
+
+        self.cache_ttls = {}
+
+        try:
+            slurm_options = config.options("slurm")
+            for option in slurm_options:
+                if option.find("cache_ttl_") != -1:
+                    source = option.split("cache_ttl_")[1]
+                    self.cache_ttls[source] = int(self._config_get(config, "slurm", option))
+        except (configparser.Error, ValueError) as e:
+            self.print_error(e)
+            return False
+
         self.walltime_limits = {}
         self.walltime_max = {}
 
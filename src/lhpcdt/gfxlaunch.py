@@ -41,14 +41,8 @@ tool_path = os.path.dirname(os.path.abspath(sys.argv[0]))
 sys.path.insert(0, tool_path)
 
 
-def main():
-
-    # Show version information
-
-    print((gfxlaunch_copyright % gfxlaunch_version))
-    print("")
-
-    # Parse command line arguments
+def create_parser():
+    """Return the command line parser of gfxlaunch"""
 
     parser = argparse.ArgumentParser(description="Graphical Job Launcher")
 
@@ -153,6 +147,31 @@ def main():
                         action="store_true",
                         default=False)
 
+    parser.add_argument("--speculative",
+                        dest="speculative",
+                        help="Submit a held job when the window opens and release it on start.",
+                        action="store_true",
+                        default=False)
+
+    parser.add_argument("--startup-trace",
+                        dest="startup_trace",
+                        help="Print a timeline of the startup queries.",
+                        action="store_true",
+                        default=False)
+
+    return parser
+
+
+def main():
+
+    # Show version information
+
+    print((gfxlaunch_copyright % gfxlaunch_version))
+    print("")
+
+    # Parse command line arguments
+
+    parser = create_parser()
     args = parser.parse_args()
 
     # Setup global settings singleton
@@ -47,6 +47,28 @@ def main():
     print(gfxlaunch_copyright % gfxlaunch_version)
     print("")
 
+    # Parse command line arguments
+
+    parser = argparse.ArgumentParser(description="Session usage display")
+
+    parser.add_argument("--latency-report", dest="latency_report", action="store_true", default=False,
+                        help="Summarise recorded launch traces and exit.")
+
+    parser.add_argument("--trace-dir", dest="trace_dir", action="store", default="",
+                        help="Directory with launch traces (default ~/.lhpc/traces).")
+
+    args = parser.parse_args()
+
+    if args.latency_report:
+        traces = launch_trace.load_traces(args.trace_dir)
+
+        if len(traces) == 0:
+            print("No launch traces found.")
+        else:
+            print(launch_trace.latency_report(traces))
+
+        return
+
     launchSettings = settings.LaunchSettings.create()
     launchSettings.tool_path = tool_path
     launchSettings.copyright_info = gfxlaunch_copyright
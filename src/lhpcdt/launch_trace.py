@@ -0,0 +1,219 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Launch trace module
+
+Records the phases of an application launch, from the start button being
+clicked until the application is running, and writes them as a JSON line
+to ~/.lhpc/traces/<date>.jsonl. The phases are
+
+    submit            start button clicked
+    attached          a compatible allocation was taken from the warm pool
+    queued            sbatch accepted the job
+    allocated         the job started running
+    node              the allocated node is known
+    ssh_started       the local ssh process for the application command or
+                      the notebook tunnel was started. The connection
+                      itself is only confirmed by app_alive, so connection
+                      time is counted in that phase.
+    app_alive         the first status check found the connection active
+    notebook_url      the notebook URL was found in the job output
+    browser_launched  the browser was started for the notebook
+    vm_available      a Windows session host was allocated
+    rdp_started       the RDP client was started
+
+Only the phases reached are recorded. Tracing can be disabled with
+launch_traces = no in the [general] section of the configuration.
+
+latency_report() summarises the traces with p50 and p95 per phase, per
+partition and per script. It is used by gfxusage --latency-report.
+"""
+
+import os
+import math
+import json
+import time
+import datetime
+import threading
+
+from lhpcdt import config
+
+phases = ["submit", "attached", "queued", "allocated", "node", "ssh_started", "app_alive",
+          "notebook_url", "browser_launched", "vm_available", "rdp_started"]
+
+
+def trace_dir():
+    """Return the directory where launch traces are written"""
+    return os.path.join(os.path.expanduser("~"), ".lhpc", "traces")
+
+
+class LaunchTrace(object):
+    """Timestamps of the phases of a single launch"""
+
+    def __init__(self, script="", job_type="", partition=""):
+        """Class constructor"""
+
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.script = script
+        self.job_type = job_type
+        self.partition = partition
+        self.job_id = -1
+        self.node = ""
+        self.phases = {"submit": 0.0}
+        self.outcome = ""
+        self.written = False
+        self.enabled = config.GfxConfig.create().launch_traces
+
+    def mark(self, phase):
+        """Record the time of a phase, unless it was already reached"""
+
+        with self.lock:
+            if phase not in self.phases:
+                self.phases[phase] = time.time() - self.start_time
+
+    def has(self, phase):
+        with self.lock:
+            return phase in self.phases
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "start_time": self.start_time,
+                "script": self.script,
+                "job_type": self.job_type,
+                "partition": self.partition,
+                "job_id": self.job_id,
+                "node": self.node,
+                "outcome": self.outcome,
+                "phases": dict(sorted(self.phases.items(), key=lambda item: item[1]))
+            }
+
+    def finish(self, outcome="ok", directory=""):
+        """Write the trace once. Returns the filename or "" if not written."""
+
+        with self.lock:
+            if self.written or not self.enabled:
+                return ""
+            self.written = True
+            self.outcome = outcome
+
+        if directory == "":
+            directory = trace_dir()
+
+        filename = os.path.join(directory, "%s.jsonl" % datetime.date.fromtimestamp(self.start_time).isoformat())
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(filename, "a") as trace_file:
+                trace_file.write(json.dumps(self.to_dict()) + "\n")
+        except OSError as e:
+            print("Couldn't write launch trace: %s" % e)
+            return ""
+
+        return filename
+
+
+def load_traces(directory=""):
+    """Return all traces found in directory"""
+
+    if directory == "":
+        directory = trace_dir()
+
+    traces = []
+
+    if not os.path.isdir(directory):
+        return traces
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".jsonl"):
+            continue
+
+        with open(os.path.join(directory, filename)) as trace_file:
+            for line in trace_file:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    pass
+
+    return traces
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of values"""
+
+    if len(values) == 0:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+
+    return ordered[rank]
+
+
+def phase_durations(trace):
+    """Return the time spent reaching each phase from the previous one and
+    the total time to the last phase"""
+
+    durations = {}
+    previous = 0.0
+
+    for phase, offset in sorted(trace["phases"].items(), key=lambda item: item[1]):
+        if phase != "submit":
+            durations[phase] = offset - previous
+        previous = offset
+
+    durations["total"] = previous
+
+    return durations
+
+
+def latency_report(traces):
+    """Return a text report with p50/p95 per phase, partition and script"""
+
+    lines = []
+
+    groups = [("All launches", lambda trace: "all"),
+              ("Per partition", lambda trace: trace.get("partition", "") or "-"),
+              ("Per script", lambda trace: trace.get("script", "") or trace.get("job_type", "") or "-")]
+
+    lines.append("%d launches, %d failed" % (len(traces), len([trace for trace in traces
+                                                               if trace.get("outcome", "ok") != "ok"])))
+
+    for title, key in groups:
+        samples = {}
+
+        for trace in traces:
+            group = key(trace)
+            for phase, duration in phase_durations(trace).items():
+                samples.setdefault(group, {}).setdefault(phase, []).append(duration)
+
+        lines.append("")
+        lines.append(title)
+        lines.append("%-24s %-18s %6s %9s %9s %9s" % ("", "Phase", "Count", "p50 [s]", "p95 [s]", "Max [s]"))
+
+        for group in sorted(samples.keys()):
+            for phase in phases[1:] + ["total"]:
+                if phase not in samples[group]:
+                    continue
+                values = samples[group][phase]
+                lines.append("%-24s %-18s %6d %9.1f %9.1f %9.1f" % (
+                    group[:24], phase, len(values), percentile(values, 0.5), percentile(values, 0.95), max(values)))
+
+    return "\n".join(lines)
@@ -24,6 +24,7 @@ launcher.
 """
 
 import os, sys, time, glob, getpass, shutil
+import concurrent.futures
 
 try:
     import grp
@@ -43,6 +44,10 @@ from . import config
 from . import resource_win
 from . import conda_utils as cu
 from . import user_config
+from . import startup_cache
+from . import command_stats
+from . import launch_trace
+from . import warm_pool
 from . import ui_main_window_simplified as ui
 
 from subprocess import Popen, PIPE, STDOUT
@@ -82,10 +87,17 @@ class SubmitThread(QtCore.QThread):
     NO_ERROR = 0
     SUBMIT_FAILED = 1
 
-    def __init__(self, job, cmd="xterm", opengl=False, vglrun=True, vgl_path=""):
+    def __init__(self, job, cmd="xterm", opengl=False, vglrun=True, vgl_path="", trace=None, pool=None,
+                 held=False, changes=None, connect=False, held_thread=None):
         QtCore.QThread.__init__(self)
 
         self.job = job
+        self.trace = trace
+        self.pool = pool
+        self.held = held
+        self.held_thread = held_thread
+        self.changes = changes
+        self.connect = connect
         self.cmd = cmd
         self.opengl = opengl
 
@@ -107,20 +119,114 @@ class SubmitThread(QtCore.QThread):
 
         print("Starting session...")
 
-        if not self.slurm.submit(self.job):
+        # A held submission still in progress when the session was started
+        # is waited for here instead of in the user interface
+
+        if self.held_thread is not None:
+            self.held_thread.wait()
+            if self.held_thread.submitted:
+                self.job.id = self.held_thread.job.id
+            else:
+                print("Held submission failed: %s" % self.held_thread.slurm.submit_error)
+
+        held_id = self.job.id if self.held else -1
+
+        # Attach to an idle allocation from the warm pool if possible
+
+        if self.pool is not None and self.pool.acquire(self.job, self.slurm):
+            print("Attached to session %d on node %s." % (self.job.id, self.job.nodes))
+
+            if held_id > 0:
+                self.slurm.cancel_job_with_id(held_id)
+
+            if self.trace is not None:
+                self.trace.job_id = self.job.id
+                self.trace.node = self.job.nodes
+                self.trace.mark("attached")
+                self.trace.mark("node")
+
+            self.open_connection()
+            return
+
+        # A job submitted held when the window opened is updated to the
+        # selected resources and released. If that fails a new job is
+        # submitted.
+
+        if held_id > 0 and not self.release_held():
+            print("Couldn't update held session %d, submitting a new session." % held_id)
+            self.slurm.cancel_job_with_id(held_id)
+            self.job.id = -1
+            held_id = -1
+
+        if held_id > 0:
+            print("Session %d released." % self.job.id)
+        elif not self.slurm.submit(self.job):
             print("Failed to start session.")
             self.error_status = SubmitThread.SUBMIT_FAILED
+            if self.trace is not None:
+                self.trace.finish("submit_failed")
             return
         else:
             print("Session %d submitted." % self.job.id)
 
+        if self.trace is not None:
+            self.trace.job_id = self.job.id
+            self.trace.mark("queued")
+
         print("Waiting for session to start...")
 
         self.slurm.wait_for_start(self.job)
+
+        if self.trace is not None:
+            self.trace.mark("allocated")
+
         self.slurm.job_status(self.job)
 
+        if self.trace is not None:
+            self.trace.node = self.job.nodes
+            self.trace.mark("node")
+
         print("Session has started on node %s." % self.job.nodes)
 
+        self.open_connection()
+
+    def open_connection(self):
+        """Open the master ssh connection to the session node, so that the
+        application, tunnels and probes started from the user interface
+        don't wait for the handshake"""
+
+        if self.connect:
+            remote.ConnectionManager.shared().open(self.job.nodes)
+
+    def release_held(self):
+        """Update held job to the selected resources and release it"""
+
+        if self.changes is None:
+            return False
+
+        if not self.slurm.update_job(self.job, self.changes):
+            print(self.slurm.submit_error)
+            return False
+
+        return self.slurm.release_job(self.job)
+
+
+class SpeculativeSubmitThread(QtCore.QThread):
+    """Submits a held job with the default resources while the user
+    is still selecting them"""
+
+    def __init__(self, job):
+        QtCore.QThread.__init__(self)
+
+        self.job = job
+        self.slurm = lrms.Slurm()
+        self.submitted = False
+
+    def run(self):
+        """Main thread method"""
+
+        self.submitted = self.slurm.submit(self.job, hold=True)
+
 
 class TunnelThread(QtCore.QThread):
     """Job submission thread"""
@@ -146,6 +252,71 @@ class TunnelThread(QtCore.QThread):
         while self.connected and self.ssh_tunnel.is_active():
             time.sleep(1)
 
+class StartupPipeline(QtCore.QObject):
+    """Concurrent execution of independent startup queries
+
+    Each query runs as a future on a thread pool. Results are delivered
+    to the user interface thread through signals as each query completes."""
+
+    query_finished = QtCore.pyqtSignal(str, object)
+    query_failed = QtCore.pyqtSignal(str, str)
+
+    def __init__(self, trace=False, parent=None):
+        QtCore.QObject.__init__(self, parent)
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        self.futures = {}
+        self.trace = trace
+        self.start_time = time.time()
+        self.timeline = []
+
+    def mark(self, event):
+        """Add event to startup timeline"""
+
+        elapsed = time.time() - self.start_time
+        self.timeline.append((elapsed, event))
+
+        if self.trace:
+            print("[startup] %8.3f s  %s" % (elapsed, event))
+
+    def submit(self, source, query):
+        """Run query for source in the thread pool"""
+
+        if self.is_running(source):
+            return
+
+        self.mark("%s query started" % source)
+
+        future = self.executor.submit(query)
+        self.futures[source] = future
+        future.add_done_callback(lambda f, source=source: self.__on_done(source, f))
+
+    def __on_done(self, source, future):
+        """Called in the worker thread when a query completes"""
+
+        try:
+            result = future.result()
+        except Exception as e:
+            self.mark("%s query failed" % source)
+            self.query_failed.emit(source, str(e))
+        else:
+            self.mark("%s query finished" % source)
+            self.query_finished.emit(source, result)
+
+    def is_running(self, source=None):
+        """Return True if source (or any source) is still being queried"""
+
+        if source is None:
+            return any([not future.done() for future in self.futures.values()])
+        else:
+            return (source in self.futures) and (not self.futures[source].done())
+
+    def shutdown(self):
+        """Shutdown thread pool without waiting for running queries"""
+
+        self.executor.shutdown(wait=False)
+
+
 class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
     """Main launch window user interface"""
 
@@ -172,6 +343,12 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.version_info = settings.LaunchSettings.create().version_info
         self.rdp = None
         self.job = None
+        self.launch_trace = None
+        self.warm_pool = None
+        self.speculative_thread = None
+        self.speculative_job = None
+        self.speculative_fields = None
+        self.closing = False
 
         # SSH/VGL handling
 
@@ -212,6 +389,30 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         print("Ignoring features   : "+','.join(list(self.feature_exclude_set)))
         print("Ignoring partitions : "+','.join(list(self.part_exclude_set)))
 
+        # Setup persistent startup cache. Cached values are used even if
+        # stale and revalidated in the background after the window is shown.
+
+        self.startup_cache = startup_cache.StartupCache(ttls=self.config.cache_ttls)
+        self.startup_keys = {}
+        self.loading = set()
+
+        if self.config.use_startup_cache:
+            self.startup_cache.load()
+
+        # Allocations idle for too long in the warm pool are cancelled by
+        # the detached reaper, so that startup doesn't wait for Slurm
+
+        self.warm_pool = warm_pool.WarmPool.create()
+
+        if self.warm_pool is not None and not self.warm_pool.is_empty():
+            self.warm_pool.start_reaper()
+
+        # Setup concurrent execution of startup queries
+
+        self.startup_pipeline = StartupPipeline(self.args.startup_trace, self)
+        self.startup_pipeline.query_finished.connect(self.on_startup_query_finished)
+        self.startup_pipeline.query_failed.connect(self.on_startup_query_failed)
+
         # Setup default launch properties
 
         self.init_defaults() 
@@ -227,10 +428,6 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 self, self.title, "SLURM not available. Please contact support.")
             sys.exit(1)
 
-        # Query partition features
-
-        self.slurm.query_partitions(exclude_set=self.part_exclude_set)
-
         available_parts = []
 
         if (self.group != ""):
@@ -248,19 +445,38 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             if not self.part in available_parts:
                 self.part = available_parts[0]
 
-        self.features = self.slurm.query_features(
-            self.part, self.feature_exclude_set)
-
         self.selected_part = self.part
 
         print("Selected part       : "+str(self.part))
-        print("With features       : "+','.join(self.features))
+
+        # Dispatch startup queries. Cached results are used directly. Missing
+        # or stale results are queried concurrently and the controls are
+        # updated as each query finishes.
+
+        self.slurm.partitions = self.cached_query(
+            "partitions", self.partition_cache_key(), self.query_partitions, [])
+
+        self.cluster_index = lrms.ClusterIndex.from_dict(self.cached_query(
+            "cluster_index", self.cluster_index_cache_key(), self.query_cluster_index, {}))
+
+        if not self.args.ignore_grantfile:
+            self.active_projects = self.cached_query(
+                "projects", self.project_cache_key(), self.query_active_projects, [])
+        else:
+            self.reservation_accounts = self.cached_query(
+                "reservation_accounts", str(self.user), self.query_reservation_accounts, [])
+
+        self.reservations = self.cached_query(
+            "reservations", "", self.query_reservations, [])
+
+        self.features = self.cluster_index.features(self.part)
 
         # Check for available project
 
-        if not self.has_project() and not self.args.ignore_grantfile:
-            QtWidgets.QMessageBox.information(
-                self, self.title, "No project allocation found. Please apply for a project in SUPR.")
+        if not self.args.ignore_grantfile and not "projects" in self.loading:
+            if not self.has_project():
+                QtWidgets.QMessageBox.information(
+                    self, self.title, "No project allocation found. Please apply for a project in SUPR.")
 
         # Check if the restrict is set and check for correct user group.
 
@@ -286,6 +502,8 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                     self.memory = self.config.part_groups_defaults[self.group]["memory"]
             if "exclusive" in self.config.part_groups_defaults[self.group]:
                 self.exclusive = self.config.part_groups_defaults[self.group]["exclusive"]
+            if "speculative" in self.config.part_groups_defaults[self.group]:
+                self.speculative = self.config.part_groups_defaults[self.group]["speculative"]
 
         # Walltime limits
 
@@ -303,6 +521,23 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.status_output.setText(
             self.copyright_short_info % self.version_info)
 
+        # Optional live view of the command statistics in the log tab
+
+        self.stats_text = None
+        self.stats_version = -1
+
+        if self.config.command_stats_view:
+            self.stats_text = QtWidgets.QPlainTextEdit(self.logTab)
+            self.stats_text.setReadOnly(True)
+            self.stats_text.setFont(self.statusText.font())
+            self.stats_text.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+            self.stats_text.setMaximumHeight(120)
+            self.verticalLayout_3.addWidget(self.stats_text)
+
+            self.stats_timer = QtCore.QTimer()
+            self.stats_timer.timeout.connect(self.on_stats_timeout)
+            self.stats_timer.start(2000)
+
         # Setup timer for autostart
 
         self.autostart_timer = QtCore.QTimer()
@@ -316,6 +551,16 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.launcherTabs.setHidden(True)
         self.adjustSize()
 
+        self.startup_pipeline.mark("window constructed")
+
+        self.start_speculative_submit()
+
+    def showEvent(self, event):
+        """Window show event"""
+
+        self.startup_pipeline.mark("window shown")
+        super(GfxLaunchWindow, self).showEvent(event)
+
     @property
     def console_output(self):
         return self.__console_output
@@ -394,6 +639,15 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         if self.args.ignore_grantfile:
             return False
 
+        if len(self.active_projects) > 0:
+            self.account = self.active_projects[0]
+            return True
+        else:
+            return False
+
+    def query_active_projects(self):
+        """Query active projects from SLURM or grantfiles"""
+
         if self.user == "":
             user = getpass.getuser()
         else:
@@ -404,13 +658,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             # Querying SLURM directly to find active projects as an alternative to grant files.
 
             acctmgr = lrms.AccountManager()
-            self.active_projects = acctmgr.query_active_projects(user)
-
-            if len(self.active_projects) > 0:
-                self.account = self.active_projects[0]
-                return True
-            else:
-                return False
+            return acctmgr.query_active_projects(user)
 
         else:
 
@@ -419,7 +667,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             # if self.config.grantfile_base != "":
             #    grant_filename = self.config.grantfile_base % self.part
 
-            self.grantfile_list = []
+            grantfile_list = []
 
             # --- If we have a explicit grantfile use that only.
 
@@ -428,7 +676,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 print("Explicit grantfile %s used." % self.grant_filename)
 
                 grant_filename = self.grant_filename
-                self.grantfile_list.append(lrms.GrantFile(grant_filename))
+                grantfile_list.append(lrms.GrantFile(grant_filename))
             else:
 
                 # --- No explicit grantfile given. Search for grantfiles
@@ -448,12 +696,12 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                             suffix = grant_filename.split('.')[1]
                             if self.config.grantfile_suffix == '':
                                 print("Parsing grantfile: %s" % grant_filename)
-                                self.grantfile_list.append(
+                                grantfile_list.append(
                                     lrms.GrantFile(grant_filename))
                             elif self.config.grantfile_suffix == suffix:
                                 print("Parsing grantfile (suffix match): %s" %
                                     grant_filename)
-                                self.grantfile_list.append(
+                                grantfile_list.append(
                                     lrms.GrantFile(grant_filename))
                 else:
 
@@ -461,22 +709,182 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
                     grant_filename = self.config.grantfile_base % self.part
                     if os.path.exists(grant_filename):
-                        self.grantfile_list.append(lrms.GrantFile(grant_filename))
+                        grantfile_list.append(lrms.GrantFile(grant_filename))
 
-            self.active_projects = []
+            active_projects = []
 
-            if len(self.grantfile_list) > 0:
+            for grant_file in grantfile_list:
+                active_projects += grant_file.query_active_projects(user)
 
-                for grant_file in self.grantfile_list:
-                    self.active_projects += grant_file.query_active_projects(user)
+            return active_projects
 
-                if len(self.active_projects) > 0:
-                    self.account = self.active_projects[0]
-                    return True
-                else:
-                    return False
-            else:
-                return False
+    def query_partitions(self):
+        """Query available partitions"""
+
+        slurm = lrms.Slurm()
+        slurm.query_partitions(exclude_set=self.part_exclude_set)
+
+        return sorted(slurm.partitions)
+
+    def query_cluster_index(self):
+        """Query partition/feature index"""
+
+        slurm = lrms.Slurm()
+        slurm.verbose = False
+
+        return slurm.query_cluster_index(self.part_exclude_set, self.feature_exclude_set).to_dict()
+
+    def query_reservations(self):
+        """Query reservation names and accounts"""
+
+        slurm = lrms.Slurm()
+
+        reservations = []
+
+        for reservation in slurm.query_reservations():
+            if "ReservationName" in reservation:
+                reservations.append([reservation["ReservationName"], reservation.get("Accounts", "")])
+
+        return reservations
+
+    def query_reservation_accounts(self):
+        """Query accounts of the user from sacctmgr associations"""
+
+        if self.user == "":
+            user = getpass.getuser()
+        else:
+            user = self.user
+
+        acctmgr = lrms.AccountManager(user)
+        return acctmgr.query_active_projects(user)
+
+    def active_reservations(self):
+        """Return reservations available to the active projects of the user
+
+        When the grantfile is ignored there are no active projects, so the
+        accounts of the user's sacctmgr associations are used instead."""
+
+        if self.args.ignore_grantfile:
+            user_accounts = self.reservation_accounts
+        else:
+            user_accounts = self.active_projects
+
+        active_reservations = []
+
+        for name, accounts in self.reservations:
+            for account in accounts.split(","):
+                if account in user_accounts:
+                    active_reservations.append(name)
+                    break
+
+        return active_reservations
+
+    def partition_cache_key(self):
+        return ",".join(sorted(self.part_exclude_set))
+
+    def cluster_index_cache_key(self):
+        return ",".join(sorted(self.part_exclude_set)) + ";" + ",".join(sorted(self.feature_exclude_set))
+
+    def project_cache_key(self):
+        return ";".join([str(self.user), str(self.part), str(self.config.use_sacctmgr), self.grant_filename,
+                         self.config.grantfile_dir, self.config.grantfile_suffix, self.config.grantfile_base])
+
+    def cached_query(self, source, key, query, default):
+        """Return cached result for source and dispatch query if needed.
+
+        Stale results are returned as is and revalidated in the background.
+        If there is no cached result, default is returned and the source is
+        marked as loading until the query finishes."""
+
+        self.startup_keys[source] = key
+
+        if self.config.use_startup_cache and self.startup_cache.has(source, key):
+            self.startup_pipeline.mark("%s from cache" % source)
+            if not self.startup_cache.is_fresh(source, key):
+                self.startup_pipeline.submit(source, query)
+            return self.startup_cache.get(source, key)
+
+        self.loading.add(source)
+        self.startup_pipeline.submit(source, query)
+
+        return default
+
+    def on_startup_query_finished(self, source, value):
+        """Update controls when a startup query has finished"""
+
+        was_loading = source in self.loading
+        self.loading.discard(source)
+
+        changed = True
+
+        if self.config.use_startup_cache:
+            changed = self.startup_cache.set(source, value, self.startup_keys[source])
+            self.startup_cache.save()
+
+        if changed or was_loading:
+
+            if source == "partitions":
+                self.slurm.partitions = value
+                self.update_partition_combo()
+            elif source == "cluster_index":
+                self.cluster_index = lrms.ClusterIndex.from_dict(value)
+                self.update_feature_combo()
+                self.select_feature()
+            elif source == "projects":
+                self.active_projects = value
+                if not self.has_project():
+                    QtWidgets.QMessageBox.information(
+                        self, self.title, "No project allocation found. Please apply for a project in SUPR.")
+                self.update_project_combo()
+            elif source == "reservations":
+                self.reservations = value
+            elif source == "reservation_accounts":
+                self.reservation_accounts = value
+
+            if source in ["projects", "reservations", "reservation_accounts"] and self.resource_window is not None:
+                self.resource_window.update_reservations(self.active_reservations())
+
+            self.startup_pipeline.mark("%s controls updated" % source)
+
+        self.update_loading_state()
+
+        if not self.startup_pipeline.is_running():
+            self.startup_pipeline.mark("all startup queries finished")
+
+        self.start_speculative_submit()
+
+    def on_startup_query_failed(self, source, error):
+        """Handle failed startup query"""
+
+        print("Failed to query %s: %s" % (source, error))
+
+        self.loading.discard(source)
+        self.update_loading_state()
+
+    def update_loading_state(self):
+        """Disable controls still waiting for startup queries"""
+
+        self.partCombo.setEnabled(not "partitions" in self.loading and not self.args.part_disable)
+        self.featureCombo.setEnabled(not "cluster_index" in self.loading and not self.args.feature_disable)
+        self.projectCombo.setEnabled(not "projects" in self.loading)
+
+        if not self.running and not self.locked:
+            self.startButton.setEnabled(not self.is_loading())
+
+    def is_loading(self):
+        """Return True if controls needed for submission are still loading"""
+
+        return len(self.loading & set(["partitions", "cluster_index", "projects"])) > 0
+
+    def invalidate_startup_cache(self, submit_error):
+        """Invalidate cached queries that made a job submission fail"""
+
+        if "Invalid partition" in submit_error:
+            self.startup_cache.invalidate("partitions")
+            self.startup_cache.invalidate("cluster_index")
+
+        if "Invalid account" in submit_error:
+            self.startup_cache.invalidate("projects")
 
 
     def init_defaults(self):
@@ -492,6 +900,10 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.account = self.config.default_account
         self.part = self.config.default_part
         self.reservation = ""
+        self.active_projects = []
+        self.reservations = []
+        self.reservation_accounts = []
+        self.resource_window = None
         self.grant_filename = ""
         self.cmd = "xterm"
         self.title = "Lunarc HPC Desktop Launcher"
@@ -570,6 +982,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.autostart = self.args.autostart
         self.locked = self.args.locked
         self.group = self.args.group
+        self.speculative = self.args.speculative
         self.silent = self.args.silent
 
         if self.silent:
@@ -640,14 +1053,17 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
     def update_feature_combo(self):
         """Update only feature combo box."""
 
-        self.features = self.slurm.query_features(
-            self.selected_part, self.feature_exclude_set)
+        self.features = self.cluster_index.features(self.selected_part)
 
         self.filtered_features = []
         self.filtered_features.append("")
 
         self.featureCombo.clear()
-        self.featureCombo.addItem("None")
+
+        if "cluster_index" in self.loading:
+            self.featureCombo.addItem("Loading...")
+        else:
+            self.featureCombo.addItem("None")
 
         for feature in self.features:
             if feature.lower() in self.config.feature_descriptions:
@@ -657,48 +1073,59 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 self.featureCombo.addItem(feature)
             self.filtered_features.append(feature)
 
-    def update_controls(self):
-        """Update user interface from properties"""
+    def update_partition_combo(self):
+        """Update only partition combo box."""
 
-        if self.job_type == "":
-            self.launcherTabs.removeTab(2)
+        selected_part = self.selected_part
 
-        if self.job_type != "notebook" and self.job_type!="jupyterlab":
-            self.show_job_settings_button.setVisible(False)
+        self.filtered_parts = []
+        self.filtered_parts.append("")
 
-        self.slurm.query_partitions(exclude_set=self.part_exclude_set)
+        self.partCombo.blockSignals(True)
+        self.partCombo.clear()
 
-        self.update_feature_combo()
+        if "partitions" in self.loading:
+            self.partCombo.addItem("Loading...")
+        else:
+            self.partCombo.addItem("None")
 
-        if self.partCombo.count() == 0:
+        for part in self.slurm.partitions:
+            descr = part
 
-            self.filtered_parts = []
-            self.filtered_parts.append("")
+            #print(part.lower())
+            #print(self.config.partition_descriptions)
 
-            self.partCombo.clear()
-            self.partCombo.addItem("None")
+            if part.lower() in self.config.partition_descriptions:
+                descr = self.config.partition_descriptions[part.lower()]
 
-            for part in self.slurm.partitions:
-                descr = part
+            if self.group == "" or (part in self.config.part_groups[self.group]):
+                self.partCombo.addItem(descr)
+                self.filtered_parts.append(part)
 
-                #print(part.lower())
-                #print(self.config.partition_descriptions)
+        self.partCombo.blockSignals(False)
 
-                if part.lower() in self.config.partition_descriptions:
-                    descr = self.config.partition_descriptions[part.lower()]
+        self.selected_part = selected_part
+        self.select_partition()
 
-                if self.group == "" or (part in self.config.part_groups[self.group]):
-                    self.partCombo.addItem(descr)
-                    self.filtered_parts.append(part)
+    def update_project_combo(self):
+        """Update only project combo box."""
 
-        if self.projectCombo.count() == 0:
+        self.projectCombo.clear()
 
-            self.projectCombo.clear()
-            for project in self.active_projects:
-                self.projectCombo.addItem(project)
+        if "projects" in self.loading:
+            self.projectCombo.addItem("Loading...")
 
+        for project in self.active_projects:
+            self.projectCombo.addItem(project)
+
+        if self.account in self.active_projects:
+            self.projectCombo.setCurrentIndex(self.active_projects.index(self.account))
+        else:
             self.projectCombo.setCurrentIndex(0)
 
+    def select_feature(self):
+        """Select current feature in feature combo box."""
+
         selected_index = -1
         selected_count = 0
 
@@ -712,6 +1139,9 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         else:
             self.featureCombo.setCurrentIndex(0)
 
+    def select_partition(self):
+        """Select current partition in partition combo box."""
+
         selected_index = -1
         selected_count = 0
 
@@ -725,6 +1155,26 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         else:
             self.partCombo.setCurrentIndex(0)
 
+    def update_controls(self):
+        """Update user interface from properties"""
+
+        if self.job_type == "":
+            self.launcherTabs.removeTab(2)
+
+        if self.job_type != "notebook" and self.job_type!="jupyterlab":
+            self.show_job_settings_button.setVisible(False)
+
+        self.update_feature_combo()
+
+        if self.partCombo.count() == 0:
+            self.update_partition_combo()
+
+        if self.projectCombo.count() == 0:
+            self.update_project_combo()
+
+        self.select_feature()
+        self.select_partition()
+
         if self.running:
             self.cancelButton.setEnabled(True)
             self.startButton.setEnabled(False)
@@ -783,6 +1233,8 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.node_usage_label.setText(plain_text_usage)
 
+        self.update_loading_state()
+
 
     def enable_extras_panel(self): 
         """Clear user interface components in extras panel"""
@@ -807,12 +1259,29 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
     def closeEvent(self, event):
         """Handle window close event"""
 
+        # Close when the held submission has finished, so that its job can
+        # be cancelled without waiting for it here
+
+        if self.speculative_thread is not None:
+            self.closing = True
+            self.hide()
+            event.ignore()
+            return
+
+        self.finish_launch_trace("closed")
+
+        self.cancel_speculative_job()
+
         if self.job is not None:
             self.slurm.cancel_job(self.job)
 
         if self.rdp != None:
             self.rdp.terminate()
 
+        remote.ConnectionManager.shared().close_all()
+
+        self.startup_pipeline.shutdown()
+
         event.accept()  # let the window close
 
     def submit_job(self):
@@ -824,11 +1293,28 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         # Note - This should be modularised
 
+        held = False
+        held_thread = None
+
         if self.job_type == "":
 
-            # Create a standard placeholder job
+            # Use the job submitted held when the window opened or create a
+            # standard placeholder job
+
+            self.job = self.take_speculative_job()
+
+            if self.job is not None:
+                held = True
+            else:
+                self.job = jobs.PlaceHolderJob()
 
-            self.job = jobs.PlaceHolderJob()
+                # The submit thread takes over a held submission still in
+                # progress
+
+                if self.speculative_thread is not None:
+                    held_thread = self.speculative_thread
+                    self.speculative_thread = None
+                    held = True
 
             self.only_submit = False
 
@@ -905,25 +1391,27 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         # Setup job parameters
 
-        self.job.name = self.job_name
-        self.job.account = str(self.projectCombo.currentText())
-        self.job.partition = str(self.selected_part)
-        self.job.time = str(self.time)
-        self.job.output = self.user_config.job_output_file_path
-        self.job.reservation = self.reservation
-        if self.job_type != "vm":
-            self.job.memory = int(self.memory)
-            self.job.nodeCount = int(self.count)
-            self.job.exclusive = self.exclusive
-            self.job.tasksPerNode = int(self.tasks_per_node)
-        if self.selected_feature != "":
-            self.job.add_constraint(self.selected_feature)
-        self.job.update()
+        self.setup_job(self.job)
+
+        # Trace the launch phases from here until the application is running
+
+        if self.launch_trace is not None:
+            self.launch_trace.finish("replaced")
+
+        self.launch_trace = launch_trace.LaunchTrace(
+            script=self.script_name(), job_type=self.job_type, partition=self.job.partition)
 
         # Create a job submission thread
 
+        # Only placeholder jobs can be reused for another application
+
+        pool = self.warm_pool if self.job_type == "" else None
+
+        connect = not self.only_submit or (self.job_type in ["notebook", "jupyterlab"] and self.jupyter_use_localhost)
+
         self.submit_thread = SubmitThread(
-            self.job, self.cmd, self.vgl, self.vglrun, self.vgl_path)
+            self.job, self.cmd, self.vgl, self.vglrun, self.vgl_path, self.launch_trace, pool,
+            held, self.speculative_changes(self.job) if held else None, connect, held_thread)
         self.submit_thread.finished.connect(self.on_submit_finished)
         self.submit_thread.start()
 
@@ -931,6 +1419,128 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.startButton.setEnabled(False)
 
+    def setup_job(self, job):
+        """Assign the selected resources to job"""
+
+        job.name = self.job_name
+        job.account = str(self.projectCombo.currentText())
+        job.partition = str(self.selected_part)
+        job.time = str(self.time)
+        job.output = self.user_config.job_output_file_path
+        job.reservation = self.reservation
+        if self.job_type != "vm":
+            job.memory = int(self.memory)
+            job.nodeCount = int(self.count)
+            job.exclusive = self.exclusive
+            job.tasksPerNode = int(self.tasks_per_node)
+        job.clear_constraints()
+        if self.selected_feature != "":
+            job.add_constraint(self.selected_feature)
+        job.update()
+
+    def start_speculative_submit(self):
+        """Submit a held placeholder job with the default resources
+
+        Queue registration and priority accrual then happen while the user
+        is selecting resources. The job is updated and released when the
+        session is started and cancelled if the window is closed."""
+
+        if not self.speculative or self.job_type != "" or self.autostart or self.silent:
+            return
+
+        # Only a single held job is submitted per window
+
+        if self.speculative_fields is not None or self.job is not None or self.is_loading():
+            return
+
+        if not self.args.ignore_grantfile and len(self.active_projects) == 0:
+            return
+
+        self.update_properties()
+
+        job = jobs.PlaceHolderJob()
+        self.setup_job(job)
+
+        self.speculative_fields = (lrms.update_fields(job), job.exclusive, job.gres, job.oversubscribe)
+
+        self.speculative_thread = SpeculativeSubmitThread(job)
+        self.speculative_thread.finished.connect(self.on_speculative_submit_finished)
+        self.speculative_thread.start()
+
+    def on_speculative_submit_finished(self):
+        """Keep the held job for when the session is started"""
+
+        if self.speculative_thread is None:
+            return
+
+        if self.speculative_thread.submitted:
+            self.speculative_job = self.speculative_thread.job
+            print("Session %d submitted held until started." % self.speculative_job.id)
+        else:
+            print("Held submission failed: %s" % self.speculative_thread.slurm.submit_error)
+
+        self.speculative_thread = None
+
+        if self.closing:
+            self.close()
+
+    def take_speculative_job(self):
+        """Return the held job, or None if there is none or its submission
+        hasn't finished"""
+
+        job = self.speculative_job
+        self.speculative_job = None
+
+        return job
+
+    def speculative_changes(self, job):
+        """Return the scontrol update fields changed since the held job was
+        submitted, or None if the job can't be updated to match"""
+
+        held_fields, exclusive, gres, oversubscribe = self.speculative_fields
+
+        if (job.exclusive, job.gres, job.oversubscribe) != (exclusive, gres, oversubscribe):
+            return None
+
+        changes = {}
+
+        for name, value in lrms.update_fields(job).items():
+            if value != held_fields[name]:
+                if value == "" and name not in ["Features", "Reservation"]:
+                    return None
+                changes[name] = value
+
+        return changes
+
+    def cancel_speculative_job(self):
+        """Cancel the held job if the session was never started"""
+
+        job = self.take_speculative_job()
+
+        if job is not None:
+            print("Cancelling held session %d." % job.id)
+            self.slurm.cancel_job(job)
+
+    def close_connection(self):
+        """Close the master ssh connection to the session node"""
+
+        if self.job is not None and self.job.nodes != "":
+            remote.ConnectionManager.shared().close(self.job.nodes)
+
+    def script_name(self):
+        """Return the script name used in launch traces"""
+
+        if self.cmd.strip() != "":
+            return os.path.basename(self.cmd.split()[0])
+        else:
+            return self.job_type
+
+    def finish_launch_trace(self, outcome):
+        """Write the trace of the current launch, if not already written"""
+
+        if self.launch_trace is not None:
+            self.launch_trace.finish(outcome)
+
     def launch_browser(self, url):
         """Open a configured browser for the url."""
 
@@ -953,6 +1563,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         # Handle submibssion failure
 
         if self.submit_thread.error_status == SubmitThread.SUBMIT_FAILED:
+            self.invalidate_startup_cache(self.submit_thread.slurm.submit_error)
             QtWidgets.QMessageBox.about(
                 self, self.title, "Session start failed.")
             self.running = False
@@ -976,6 +1587,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 self.active_connection.vgl_path = self.config.vgl_path
                 print("Command line:", self.cmd)
                 self.active_connection.execute(self.job.nodes, self.cmd)
+                self.launch_trace.mark("ssh_started")
 
                 print("Command completed...")
             else:
@@ -986,6 +1598,7 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 self.active_connection = remote.SSH()
                 print("Command line:", self.cmd)
                 self.active_connection.execute(self.job.nodes, self.cmd)
+                self.launch_trace.mark("ssh_started")
                 
                 print("Command completed...")
 
@@ -995,6 +1608,8 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.reset_status_panel()
 
+        self.launch_trace.mark("notebook_url")
+
         if self.jupyter_use_localhost:
 
             # Setup a tunnel to notebook server running on localhost on the node.
@@ -1004,19 +1619,22 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
             self.ssh_tunnel = remote.SSHForwardTunnel(dest_server="localhost", remote_port=self.job.notebook_port, server_hostname=self.job.nodes)
             self.ssh_tunnel.execute()
+            self.launch_trace.mark("ssh_started")
 
             # Update the job url to use the localhost port.
 
             fixed_url = url.replace("8888", str(self.ssh_tunnel.local_port))
             self.job.notebook_url = fixed_url
 
-            if not self.launch_browser(self.job.notebook_url):
-                QtWidgets.QMessageBox.information(
-                    self, self.title, "A suitable browser couldn't be found. The notebook instance can be found at:\n\n%s" % self.job.notebook_url )
+            url = fixed_url
+
+        if self.launch_browser(url):
+            self.launch_trace.mark("browser_launched")
+            self.finish_launch_trace("ok")
         else:
-            if not self.launch_browser(url):
-                QtWidgets.QMessageBox.information(
-                    self, self.title, "A suitable browser couldn't be found. The notebook instance can be found at:\n\n%s" % url )
+            self.finish_launch_trace("no_browser")
+            QtWidgets.QMessageBox.information(
+                self, self.title, "A suitable browser couldn't be found. The notebook instance can be found at:\n\n%s" % url )
 
         self.enable_extras_panel()
 
@@ -1025,6 +1643,8 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.reset_status_panel()
 
+        self.launch_trace.mark("vm_available")
+
         if (hostname != "0.0.0.0") and (hostname != "0.0.0.1"):
 
             print("Starting RDP: " + hostname)
@@ -1033,8 +1653,13 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             self.rdp.xfreerdp_path = self.config.xfreerdp_path
             self.rdp.execute()
 
+            self.launch_trace.mark("rdp_started")
+            self.finish_launch_trace("ok")
+
             self.enable_extras_panel()
         else:
+            self.finish_launch_trace("vm_unavailable")
+
             if hostname == "0.0.0.0":
                 QtWidgets.QMessageBox.information(
                     self, self.title, "An error occured when allocating the Windows session. Try launching the session again. If the problem persists contact support.")
@@ -1093,21 +1718,38 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                             else:
                                 print("Giving up reconnection.")
 
-                        print("Terminating job...")
+                        self.finish_launch_trace("connection_lost")
 
                         self.usageBar.setValue(0)
                         self.update_controls()
+                        self.close_connection()
                         if self.job is not None:
-                            self.slurm.cancel_job(self.job)
+                            if self.warm_pool is not None and self.job_type == "" and not self.retry_connection:
+
+                                # The application exited normally. Keep the
+                                # allocation for later launches.
+
+                                self.warm_pool.release(self.job)
+                                self.warm_pool.start_reaper()
+                                self.job = None
+                            else:
+                                print("Terminating job...")
+                                self.slurm.cancel_job(self.job)
                     else:
                         self.retry_connection = False
                         print("Connection is active.")
 
+                        if not self.launch_trace.has("app_alive"):
+                            self.launch_trace.mark("app_alive")
+                            self.finish_launch_trace("ok")
+
             else:
 
                 # Session has completed. Update UI
 
                 print("Session completed.")
+                self.finish_launch_trace("completed")
+                self.close_connection()
                 self.running = False
                 self.status_timer.stop()
                 self.usageBar.setValue(0)
@@ -1117,9 +1759,23 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
                 QtWidgets.QMessageBox.information(
                     self, self.title, "Your application was closed as the session time expired.")
 
+    def on_stats_timeout(self):
+        """Stats timer callback. Updates the command statistics view."""
+
+        stats = command_stats.CommandStats.shared()
+
+        if stats.version != self.stats_version:
+            self.stats_version = stats.version
+            self.stats_text.setPlainText(stats.format_table())
+
     def on_autostart_timeout(self):
         """Automatically submit jobn"""
         self.autostart_timer.stop()
+
+        if self.is_loading():
+            self.autostart_timer.start(500)
+            return
+
         self.submit_job()
 
     def on_reconnect_notebook(self):
@@ -1234,6 +1890,10 @@ class GfxLaunchWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
     def on_cancelButton_clicked(self):
         """Cancel running job"""
 
+        self.finish_launch_trace("cancelled")
+
+        self.close_connection()
+
         if self.job is not None:
             self.slurm.cancel_job(self.job)
 
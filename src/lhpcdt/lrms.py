@@ -19,27 +19,534 @@
 """Base classes for interacting with resource management systems."""
 
 import os
-import subprocess
 import time
 import datetime
 import getpass
 import sys
 import shutil
+import json
+import socket
+import random
+import threading
+import re
 
-from subprocess import Popen, PIPE, STDOUT
 
 from lhpcdt import hostlist
 from lhpcdt import config
 from lhpcdt import jobs
+from lhpcdt import queue_snapshot
+from lhpcdt import scontrol
+from lhpcdt import slurm_json
+from lhpcdt import slurm_rest
+from lhpcdt import runner
 
 
-def execute_cmd(cmd):
-    """Wrapper function for calling an external process"""
-    p = subprocess.Popen(
-        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-    output = p.stdout.read()
-    retval = p.wait()
-    return output
+def execute_cmd(cmd, merge_stderr=True, timeout=None):
+    """Wrapper function for calling an external process
+
+    cmd is run without a shell by the command runner. Returns the output
+    collected before a failure if the command times out or can't be run."""
+
+    try:
+        return runner.run(cmd, merge_stderr=merge_stderr, timeout=timeout).stdout
+    except runner.CommandError as e:
+        print(e)
+        return e.output
+
+
+class OutputFormat(object):
+    """Selects between JSON and text output of the SLURM tools
+
+    JSON support is detected once per process from the SLURM version and
+    can be forced with output_format = json|text in the [slurm] section
+    of the configuration. If a JSON query fails, the text output is used
+    for the rest of the process."""
+
+    json_min_version = (21, 8)
+
+    __use_json = None
+
+    @classmethod
+    def detect(cls):
+        """Return True if the SLURM tools support --json"""
+
+        output_format = config.GfxConfig.create().output_format
+
+        if output_format == "json":
+            return True
+        elif output_format == "text":
+            return False
+
+        # sinfo --version prints e.g. "slurm 23.02.7"
+
+        match = re.search(r"(\d+)\.(\d+)", execute_cmd("sinfo --version"))
+
+        if match is None:
+            return False
+
+        return (int(match.group(1)), int(match.group(2))) >= OutputFormat.json_min_version
+
+    @classmethod
+    def use_json(cls):
+        """Return True if JSON output should be used"""
+
+        if cls.__use_json is None:
+            cls.__use_json = cls.detect()
+
+        return cls.__use_json
+
+    @classmethod
+    def disable_json(cls, cmd, error):
+        """Fall back to text output after a failed JSON query"""
+
+        print("JSON output of %s failed (%s), using text output." % (cmd, error))
+        cls.__use_json = False
+
+    @classmethod
+    def query(cls, cmd, key):
+        """Run cmd with --json and return the elements of the top-level array key
+
+        The output is decoded while it is read from the pipe."""
+
+        with runner.open_output(cmd + " --json") as stream:
+            return list(slurm_json.iter_array(stream, key))
+
+    @classmethod
+    def iter_query(cls, cmd, key):
+        """Generator version of query() for large outputs. Elements are
+        yielded while the output is read, so callers must be prepared to
+        discard partial results if an exception is raised."""
+
+        with runner.open_output(cmd + " --json") as stream:
+            for element in slurm_json.iter_array(stream, key):
+                yield element
+
+
+def query_json(path, cmd, key):
+    """Return the elements of array key from slurmrestd or the --json output of cmd
+
+    path is the slurmrestd endpoint, e.g. "nodes". Returns None if
+    neither is available and the text output should be parsed."""
+
+    client = slurm_rest.RestClient.shared()
+
+    if client is not None:
+        try:
+            return client.query(path, key)
+        except slurm_rest.errors as e:
+            client.failed(path, e)
+
+    if OutputFormat.use_json():
+        try:
+            return OutputFormat.query(cmd, key)
+        except (ValueError, OSError, runner.CommandError) as e:
+            OutputFormat.disable_json(cmd, e)
+
+    return None
+
+
+def update_fields(job):
+    """Return the scontrol update fields describing the resources of job
+
+    Only resources that scontrol update can change for a pending job are
+    included. Removed values are given as empty strings."""
+
+    return {
+        "Partition": job.partition,
+        "Account": job.account,
+        "Reservation": job.reservation,
+        "TimeLimit": job.time,
+        "NumNodes": str(job.nodeCount),
+        "NumTasks": str(job.nodeCount * job.tasksPerNode) if job.tasksPerNode >= 0 else "",
+        "MinMemoryNode": str(job.memory) if job.memory > 0 else "",
+        "Features": "&".join(job.constraints)
+    }
+
+
+class StateClient(object):
+    """Client for the shared per-host SLURM state daemon (lhpcdt-stated)
+
+    The daemon polls SLURM once per interval and serves the results to
+    all local clients over a Unix socket. If the daemon isn't running
+    all queries return None and callers query SLURM directly."""
+
+    default_socket = "/run/lhpcdt/stated.sock"
+
+    def __init__(self, socket_path="", timeout=2.0, max_age=60.0):
+        """Class constructor"""
+
+        if socket_path == "":
+            socket_path = os.environ.get("LHPCDT_STATE_SOCKET", StateClient.default_socket)
+
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_age = max_age
+
+    def is_available(self):
+        """Return True if a daemon socket exists"""
+        return (self.socket_path != "") and os.path.exists(self.socket_path)
+
+    def request(self, query, **kwargs):
+        """Send a request to the daemon. Returns the reply or None on failure."""
+
+        if not self.is_available():
+            return None
+
+        request = dict(kwargs)
+        request["query"] = query
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(self.socket_path)
+                s.sendall((json.dumps(request) + "\n").encode("utf-8"))
+
+                with s.makefile("r", encoding="utf-8") as f:
+                    reply = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+        if not reply.get("ok", False):
+            return None
+
+        # Don't use snapshots from a daemon that has stopped polling
+
+        if time.time() - reply.get("time", 0) > self.max_age:
+            return None
+
+        return reply
+
+    def query_output(self, query, **kwargs):
+        """Return cached command output from the daemon or None"""
+
+        reply = self.request(query, **kwargs)
+
+        if reply is None:
+            return None
+        else:
+            return reply.get("output", None)
+
+
+class JobStatusService(object):
+    """Batched status polling for a set of SLURM jobs
+
+    All job ids of interest are resolved with a single squeue call per
+    tick. Jobs that have left the queue are resolved with a single sacct
+    call. Subscribers are called with (jobid, status) whenever the status
+    of a job changes. The poll interval is short while any job is pending
+    and long once all jobs are running. A random jitter is applied so that
+    many clients don't poll SLURM in lockstep."""
+
+    squeue_format = "%i;%t;%T;%N;%L;%M;%l"
+
+    active_states = ["PENDING", "RUNNING", "CONFIGURING", "COMPLETING", "REQUEUED", "RESIZING", "SUSPENDED"]
+
+    # Compact states (%t) of the long states reported by slurmrestd
+
+    state_codes = {
+        "PENDING": "PD", "RUNNING": "R", "CONFIGURING": "CF", "COMPLETING": "CG", "REQUEUED": "RQ",
+        "RESIZING": "RS", "SUSPENDED": "S", "COMPLETED": "CD", "CANCELLED": "CA", "FAILED": "F",
+        "TIMEOUT": "TO", "PREEMPTED": "PR", "NODE_FAIL": "NF", "BOOT_FAIL": "BF", "DEADLINE": "DL",
+        "OUT_OF_MEMORY": "OOM", "REQUEUE_HOLD": "RH", "REQUEUE_FED": "RF", "SPECIAL_EXIT": "SE",
+        "STOPPED": "ST", "SIGNALING": "SI", "RESV_DEL_HOLD": "RD", "REVOKED": "RV", "STAGE_OUT": "SO"
+    }
+
+    __shared = None
+
+    def __init__(self, fast_interval=2.0, slow_interval=15.0, jitter=0.25, max_age=1.0):
+        """Class constructor"""
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.jitter = jitter
+        self.max_age = max_age
+        self.jobids = set()
+        self.subscribers = {}
+        self.statuses = {}
+        self.poll_count = 0
+        self.state_client = StateClient()
+        self.verbose = False
+        self.lock = threading.Lock()
+        self.__poll_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+
+    @classmethod
+    def shared(cls):
+        """Return the service shared by all Slurm instances in this process"""
+
+        if cls.__shared is None:
+            cls.__shared = JobStatusService()
+
+        return cls.__shared
+
+    def add(self, jobid):
+        """Start tracking jobid"""
+        with self.lock:
+            self.jobids.add(str(jobid))
+
+    def remove(self, jobid):
+        """Stop tracking jobid"""
+
+        jobid = str(jobid)
+
+        with self.lock:
+            self.jobids.discard(jobid)
+            self.subscribers.pop(jobid, None)
+            self.statuses.pop(jobid, None)
+
+    def subscribe(self, jobid, callback):
+        """Call callback(jobid, status) when the status of jobid changes"""
+
+        jobid = str(jobid)
+
+        with self.lock:
+            self.jobids.add(jobid)
+            self.subscribers.setdefault(jobid, []).append(callback)
+
+    def unsubscribe(self, jobid, callback=None):
+        """Remove callback (or all callbacks) for jobid"""
+
+        jobid = str(jobid)
+
+        with self.lock:
+            if callback is None:
+                self.subscribers.pop(jobid, None)
+            elif callback in self.subscribers.get(jobid, []):
+                self.subscribers[jobid].remove(callback)
+
+    def is_finished(self, status):
+        """Return True if status is a final state reported by sacct or slurmrestd"""
+        return status["source"] in ["sacct", "slurmrestd"] and status["state"] not in JobStatusService.active_states
+
+    def last_status(self, jobid):
+        """Return the last polled status of jobid without polling SLURM"""
+
+        with self.lock:
+            return self.statuses.get(str(jobid), None)
+
+    def status(self, jobid, max_age=None):
+        """Return status of jobid, polling SLURM if the last status is too old
+
+        Concurrent callers share a single poll of all tracked jobs."""
+
+        jobid = str(jobid)
+
+        if max_age is None:
+            max_age = self.max_age
+
+        self.add(jobid)
+
+        with self.__poll_lock:
+            with self.lock:
+                status = self.statuses.get(jobid, None)
+
+            if status is None or (not self.is_finished(status) and time.time() - status["time"] > max_age):
+                self.poll()
+
+        with self.lock:
+            return self.statuses.get(jobid, None)
+
+    def query_squeue(self, jobids):
+        """Return status of queued jobs using a single squeue call"""
+
+        statuses = {}
+        remaining = list(jobids)
+
+        # Use the shared daemon snapshot for jobs it knows about
+
+        output = self.state_client.query_output("jobs", jobids=remaining)
+
+        if output:
+            for jobid, line in output.items():
+                statuses[jobid] = self.__parse_squeue_line("%s;%s" % (jobid, line))
+            remaining = [jobid for jobid in remaining if jobid not in statuses]
+
+        if len(remaining) == 0:
+            return statuses
+
+        # Query each job on a pooled slurmrestd connection. Jobs unknown
+        # to slurmctld are left to sacct.
+
+        client = slurm_rest.RestClient.shared()
+
+        if client is not None:
+            try:
+                now = time.time()
+                for jobid in remaining:
+                    try:
+                        for job in client.job(jobid):
+                            status = self.__rest_status(job, now)
+                            if status["jobid"] == jobid:
+                                statuses[jobid] = status
+                    except slurm_rest.RestError:
+                        pass
+                return statuses
+            except slurm_rest.errors as e:
+                client.failed("job", e)
+                remaining = [jobid for jobid in remaining if jobid not in statuses]
+
+        output = execute_cmd(["squeue", "-j", ",".join(remaining), "-h", "-o", JobStatusService.squeue_format],
+                             merge_stderr=False)
+
+        for line in output.split("\n"):
+            status = self.__parse_squeue_line(line)
+            if status is not None and status["jobid"] in jobids:
+                statuses[status["jobid"]] = status
+
+        return statuses
+
+    def query_sacct(self, jobids):
+        """Return final state of jobs no longer in the queue using a single sacct call"""
+
+        statuses = {}
+
+        client = slurm_rest.RestClient.shared()
+
+        if client is not None:
+            try:
+                for jobid in jobids:
+                    try:
+                        for job in client.accounting_job(jobid):
+                            job_id, job_step, job_state, job_exit_code = slurm_json.accounting_entries(job)[0]
+                            if job_id == jobid:
+                                statuses[jobid] = self.__new_status(jobid, "sacct", state=job_state)
+                    except slurm_rest.RestError:
+                        pass
+                return statuses
+            except slurm_rest.errors as e:
+                client.failed("slurmdb job", e)
+
+        output = execute_cmd(["sacct", "-n", "-P", "-X", "-o", "JobID,State", "-j", ",".join(jobids)],
+                             merge_stderr=False)
+
+        for line in output.split("\n"):
+            items = line.strip().split("|")
+            if len(items) == 2 and items[0] in jobids:
+                state = items[1].split(" ")[0]
+                statuses[items[0]] = self.__new_status(items[0], "sacct", state=state)
+
+        return statuses
+
+    def __new_status(self, jobid, source, status="", state="", nodes="", time_left="", time_running="", time_limit=""):
+        return {
+            "jobid": jobid,
+            "source": source,
+            "time": time.time(),
+            "status": status,
+            "state": state,
+            "nodes": nodes,
+            "time_left": time_left,
+            "time_running": time_running,
+            "time_limit": time_limit
+        }
+
+    def __rest_status(self, job, now):
+        fields = slurm_json.queue_fields(job, now)
+        state = fields[4]
+
+        return self.__new_status(fields[0], "slurmrestd", status=JobStatusService.state_codes.get(state, state),
+                                 state=state, nodes=job.get("nodes", "") if state != "PENDING" else "",
+                                 time_left=fields[9], time_running=fields[5], time_limit=fields[6])
+
+    def __parse_squeue_line(self, line):
+        items = line.strip().split(";")
+
+        if len(items) != 7:
+            return None
+
+        return self.__new_status(items[0], "squeue", status=items[1], state=items[2], nodes=items[3],
+                                 time_left=items[4], time_running=items[5], time_limit=items[6])
+
+    def poll(self):
+        """Resolve all tracked, unfinished jobs and notify subscribers"""
+
+        with self.lock:
+            jobids = sorted([jobid for jobid in self.jobids
+                             if jobid not in self.statuses or not self.is_finished(self.statuses[jobid])])
+
+        if len(jobids) == 0:
+            return {}
+
+        statuses = self.query_squeue(jobids)
+
+        missing = [jobid for jobid in jobids if jobid not in statuses]
+
+        if len(missing) > 0:
+            statuses.update(self.query_sacct(missing))
+
+        # Jobs unknown to both squeue and sacct are reported with an empty state
+
+        for jobid in missing:
+            if jobid not in statuses:
+                statuses[jobid] = self.__new_status(jobid, "none")
+
+        notify = []
+
+        with self.lock:
+            self.poll_count += 1
+            for jobid, status in statuses.items():
+                if jobid not in self.jobids:
+                    continue
+                previous = self.statuses.get(jobid, None)
+                self.statuses[jobid] = status
+                if previous is None or previous["status"] != status["status"] or previous["state"] != status["state"] or previous["nodes"] != status["nodes"]:
+                    for callback in self.subscribers.get(jobid, []):
+                        notify.append((callback, jobid, status))
+
+        if self.verbose:
+            print("Polled %d jobs (%d not in queue)" % (len(jobids), len(missing)))
+
+        for callback, jobid, status in notify:
+            try:
+                callback(jobid, status)
+            except Exception as e:
+                print("Job status callback failed for %s: %s" % (jobid, e))
+
+        return statuses
+
+    def next_interval(self):
+        """Return jittered delay until the next poll"""
+
+        with self.lock:
+            pending = False
+            for jobid in self.jobids:
+                status = self.statuses.get(jobid, None)
+                if status is None or status["status"] not in ["R", ""]:
+                    pending = True
+                    break
+
+        interval = self.fast_interval if pending else self.slow_interval
+
+        return interval * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def __poll_loop(self):
+        while not self.__stop_event.is_set():
+            try:
+                with self.__poll_lock:
+                    self.poll()
+            except Exception as e:
+                print("Failed to poll job status: %s" % e)
+
+            self.__stop_event.wait(self.next_interval())
+
+    def start(self):
+        """Poll in a background thread until stop() is called"""
+
+        if self.__thread is not None:
+            return
+
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__poll_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop background polling"""
+
+        self.__stop_event.set()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
 
 
 class GrantFile:
@@ -109,6 +616,24 @@ class GrantFile:
 class Queue(object):
     """Class for encapsuling a SLURM queue"""
 
+    state_names = {
+        "PD": "PENDING",
+        "R": "RUNNING",
+        "CG": "COMPLETING",
+        "CF": "CONFIGURING",
+        "S": "SUSPENDED",
+        "RQ": "REQUEUED",
+        "RS": "RESIZING",
+        "RH": "REQUEUE_HOLD",
+        "RF": "REQUEUE_FED",
+        "SE": "SPECIAL_EXIT",
+        "ST": "STOPPED",
+        "SI": "SIGNALING",
+        "RD": "RESV_DEL_HOLD",
+        "RV": "REVOKED",
+        "SO": "STAGE_OUT"
+    }
+
     def __init__(self):
         """
         JOBID PARTITION		NAME	 USER	 STATE		 TIME TIMELIMIT	 NODES NODELIST(REASON)
@@ -121,62 +646,287 @@ class Queue(object):
         # jobinfo squeue format  - %.7i %.9P %.25j %.8u %14a %.2t %.19S %.10L %.8Q %.4C %.16R %.12f %E
         #                             x    x     x    x         x     x                     x
         self.squeueFormat = "%.7i;%.9P;%.20j;%.12u;%.8T;%.10M;%.9l;%.6D;%R;%L;%E;%14a;%4C;%.12f;%S"
-        self.jobList = []
-        self.jobs = {}
-        self.userJobs = {}
-        self.running_jobs = {}
-        self.pending_jobs = {}
-        self.max_nodes = -1
-        self.max_cpus = -1
+        self.snapshot = queue_snapshot.QueueSnapshot()
+        self.added_jobs = []
+        self.removed_jobs = []
+        self.changed_jobs = []
+        self.state_client = StateClient()
+
+    @property
+    def jobs(self):
+        """Jobs as a mapping of job id -> dict-like job view"""
+        return queue_snapshot.JobMapping(self.snapshot)
+
+    @property
+    def jobList(self):
+        return [queue_snapshot.JobView(self.snapshot, row) for row in range(len(self.snapshot))]
+
+    @property
+    def userJobs(self):
+        return {user: queue_snapshot.JobMapping(self.snapshot, rows) for user, rows in self.snapshot.rows_by_user().items()}
+
+    @property
+    def running_jobs(self):
+        return queue_snapshot.JobMapping(self.snapshot, self.snapshot.rows_with_state("RUNNING"))
+
+    @property
+    def pending_jobs(self):
+        return queue_snapshot.JobMapping(self.snapshot, self.snapshot.rows_with_state("PENDING"))
+
+    @property
+    def max_nodes(self):
+        return self.snapshot.max_nodes
+
+    @property
+    def max_cpus(self):
+        return self.snapshot.max_cpus
 
     def job_info(self, jobid):
         """Return information on job jobid"""
-        return execute_cmd('scontrol show job %s' % jobid)
+        return execute_cmd(["scontrol", "show", "job", str(jobid)])
 
-    def update(self):
-        """Update queue information"""
-        output = execute_cmd(
-            'squeue --noheader --format="%s"' % self.squeueFormat)
-        lines = output.split("\n")
+    def filter_options(self, user="", state="", partition="", account=""):
+        """Return squeue options for server-side filtering"""
 
-        self.max_nodes = -1
-        self.max_cpus = -1
+        options = ""
 
-        self.jobs = {}
-        self.jobList = []
-        self.userJobs = {}
+        if user != "":
+            options += " --user=%s" % user
+        if state != "":
+            options += " --states=%s" % state
+        if partition != "":
+            options += " --partition=%s" % partition
+        if account != "":
+            options += " --account=%s" % account
 
-        for line in lines:
+        return options
+
+    def filters(self, user="", state="", partition="", account=""):
+        """Return list of (field index, accepted values) for squeue filters"""
+
+        filters = []
+
+        if user != "":
+            filters.append((3, user.split(",")))
+        if state != "":
+            filters.append((4, [Queue.state_names.get(value.upper(), value.upper()) for value in state.split(",")]))
+        if partition != "":
+            filters.append((1, partition.split(",")))
+        if account != "":
+            filters.append((11, account.split(",")))
+
+        return filters
+
+    def filter_output(self, output, user="", state="", partition="", account=""):
+        """Apply squeue filters to unfiltered squeue output
+
+        Used when the output comes from a shared snapshot of the full
+        queue. Filters are comma separated lists as in squeue."""
+
+        filters = self.filters(user, state, partition, account)
+
+        if len(filters) == 0:
+            return output
+
+        lines = []
+
+        for line in output.split("\n"):
             parts = line.split(";")
-            if len(parts) > 2:
-                id = parts[0].strip()
-                if not (id in self.jobs):
-                    self.jobs[id] = {}
-                    job = {"jobid": id}
-                for i in range(1, 15):
-                    self.jobs[id][self.squeueParams[i]] = parts[i].strip()
-                    job[self.squeueParams[i]] = parts[i].strip()
+            if len(parts) > 11 and all(parts[i].strip() in values for i, values in filters):
+                lines.append(line)
+
+        return "\n".join(lines)
+
+    def query_output(self, user="", state="", partition="", account=""):
+        """Query squeue output, from the state daemon if available"""
+
+        # The daemon applies the filters to its snapshot of the full queue
+
+        output = self.state_client.query_output(
+            "queue", user=user, state=state, partition=partition, account=account)
+
+        if output is None:
+            output = execute_cmd(
+                'squeue --noheader --format="%s"%s' % (self.squeueFormat,
+                                                       self.filter_options(user, state, partition, account)))
+
+        return output
+
+    def update(self, user="", state="", partition="", account=""):
+        """Update queue information
+
+        The optional filters are applied by SLURM (squeue -u/-t/-p/-A) so
+        that only matching jobs are transferred and parsed."""
+        self.set_snapshot(self.query_snapshot(user, state, partition, account))
+
+    def query_snapshot(self, user="", state="", partition="", account=""):
+        """Query and parse a new snapshot without modifying the queue
+
+        Safe to call from a worker thread."""
+
+        # The shared daemon snapshot is preferred over slurmrestd and JSON queries
+
+        if not self.state_client.is_available():
+            client = slurm_rest.RestClient.shared()
+
+            if client is not None:
+                try:
+                    return self.query_snapshot_json(user, state, partition, account,
+                                                    client.iter_query("jobs", "jobs"))
+                except slurm_rest.errors as e:
+                    client.failed("jobs", e)
+
+            if OutputFormat.use_json():
+                try:
+                    return self.query_snapshot_json(user, state, partition, account)
+                except (ValueError, OSError, runner.CommandError) as e:
+                    OutputFormat.disable_json("squeue", e)
+
+        return queue_snapshot.QueueSnapshot.from_output(self.query_output(user, state, partition, account))
+
+    def query_snapshot_json(self, user="", state="", partition="", account="", jobs=None):
+        """Query snapshot using squeue --json, or build it from decoded jobs
+
+        squeue ignores filter options together with --json, so the
+        filters are applied while the jobs are decoded."""
+
+        if jobs is None:
+            jobs = OutputFormat.iter_query("squeue", "jobs")
+
+        filters = self.filters(user, state, partition, account)
+
+        snapshot = queue_snapshot.QueueSnapshot()
+        now = time.time()
+
+        for job in jobs:
+            parts = slurm_json.queue_fields(job, now)
+            if all(parts[i] in values for i, values in filters):
+                snapshot.append(parts)
+
+        snapshot.finalize()
+
+        return snapshot
+
+    def set_snapshot(self, snapshot):
+        """Make snapshot current and compute the changes since the previous one"""
+
+        previous_snapshot = self.snapshot
+
+        self.snapshot = snapshot
+
+        self.added_jobs, self.removed_jobs, self.changed_jobs = self.snapshot.diff(previous_snapshot)
+
+
+class ClusterIndex(object):
+    """Partition, feature and GRES index built from a single node query.
+
+    The index is built once from the output of Slurm.query_nodes() and
+    answers the common launcher queries from precomputed dicts and sets
+    instead of querying SLURM again for every partition.
+    """
+
+    def __init__(self, node_info={}, part_exclude_set={}, feature_exclude_set={}):
+        """Class constructor"""
+        self.part_exclude_set = set(part_exclude_set)
+        self.feature_exclude_set = set(feature_exclude_set)
+
+        self.partition_nodes = {}
+        self.partition_features = {}
+        self.partition_gres = {}
+        self.feature_nodes = {}
+        self.node_partitions = {}
 
-                if job["state"] == "RUNNING":
-                    self.running_jobs[id] = job
+        self.build(node_info)
 
-                if job["state"] == "PENDING":
-                    self.pending_jobs[id] = job
+    def __excluded(self, value, exclude_set):
+        for exclude_pattern in exclude_set:
+            if exclude_pattern in value:
+                return True
+
+        return False
+
+    def __split(self, value):
+        """Split a comma separated SLURM value, ignoring empty items."""
+
+        if value in ["", "(null)", "N/A"]:
+            return []
+
+        return [item for item in value.split(",") if item != ""]
+
+    def build(self, node_info):
+        """Build index from node dictionary returned by query_nodes()"""
+
+        self.partition_nodes = {}
+        self.partition_features = {}
+        self.partition_gres = {}
+        self.feature_nodes = {}
+        self.node_partitions = {}
+
+        for node, props in node_info.items():
+
+            partitions = [part for part in self.__split(props.get("Partitions", ""))
+                          if not self.__excluded(part, self.part_exclude_set)]
+
+            features = [feature for feature in self.__split(props.get("ActiveFeatures", ""))
+                        if not self.__excluded(feature, self.feature_exclude_set)]
+
+            gres = self.__split(props.get("Gres", ""))
+
+            self.node_partitions[node] = set(partitions)
+
+            for feature in features:
+                self.feature_nodes.setdefault(feature, set()).add(node)
+
+            for part in partitions:
+                self.partition_nodes.setdefault(part, set()).add(node)
+                self.partition_features.setdefault(part, set()).update(features)
+                self.partition_gres.setdefault(part, set()).update(gres)
+
+    def partitions(self):
+        """Return indexed partitions"""
+        return list(self.partition_nodes.keys())
+
+    def nodes(self, part):
+        """Return nodes in partition"""
+        return list(self.partition_nodes.get(part, set()))
+
+    def features(self, part, exclude_set={}):
+        """Return features available in partition"""
+        return [feature for feature in self.partition_features.get(part, set())
+                if not self.__excluded(feature, exclude_set)]
 
-                if int(job["nodes"]) > self.max_nodes:
-                    self.max_nodes = int(job["nodes"])
+    def gres(self, part):
+        """Return generic resources (GRES) available in partition"""
+        return list(self.partition_gres.get(part, set()))
 
-                if int(job["cpus"]) > self.max_cpus:
-                    self.max_cpus = int(job["cpus"])
+    def nodes_with_feature(self, feature):
+        """Return nodes with feature"""
+        return list(self.feature_nodes.get(feature, set()))
 
-                self.jobList.append(job)
+    def partitions_of_node(self, node):
+        """Return partitions node belongs to"""
+        return list(self.node_partitions.get(node, set()))
 
-                # if not self.userJobs.has_key(self.jobs[id]["user"]):
+    def to_dict(self):
+        """Return index as a JSON serialisable dictionary"""
 
-                if not (self.jobs[id]["user"] in self.userJobs):
-                    self.userJobs[self.jobs[id]["user"]] = {}
+        index_dict = {}
 
-                self.userJobs[self.jobs[id]["user"]][id] = self.jobs[id]
+        for name in ["partition_nodes", "partition_features", "partition_gres", "feature_nodes", "node_partitions"]:
+            index_dict[name] = {key: sorted(value) for key, value in getattr(self, name).items()}
+
+        return index_dict
+
+    @classmethod
+    def from_dict(cls, index_dict, part_exclude_set={}, feature_exclude_set={}):
+        """Create index from a dictionary created by to_dict()"""
+
+        index = cls({}, part_exclude_set, feature_exclude_set)
+
+        for name, values in index_dict.items():
+            setattr(index, name, {key: set(value) for key, value in values.items()})
+
+        return index
 
 
 class Slurm(object):
@@ -186,6 +936,10 @@ class Slurm(object):
         """Slurm constructor"""
         self.partitions = []
         self.node_lists = {}
+        self.cluster_index = None
+        self.submit_error = ""
+        self.state_client = StateClient()
+        self.status_service = JobStatusService.shared()
         self.verbose = True
         self.job_output_dir = os.path.join(os.path.expanduser("~"), ".lhpc")
 
@@ -217,15 +971,35 @@ class Slurm(object):
 
         return include
 
+    def __add_partition(self, part_name, node_list, exclude_set):
+        if self.__include_part(part_name, exclude_set):
+            self.partitions.append(part_name)
+            if part_name in self.node_lists:
+                self.node_lists[part_name] = self.node_lists[part_name] + \
+                    hostlist.expand_hostlist(node_list)
+            else:
+                self.node_lists[part_name] = hostlist.expand_hostlist(
+                    node_list)
+
     def query_partitions(self, exclude_set={}):
         """Query partitions in slurm."""
-        p = Popen("sinfo", stdout=PIPE, stderr=PIPE,
-                  shell=True, universal_newlines=True)
-        squeue_output = p.communicate()[0].split("\n")
 
         self.partitions = []
         self.node_lists = {}
 
+        partitions = query_json("partitions", "scontrol show partitions", "partitions")
+
+        if partitions is not None:
+            for partition in partitions:
+                part_name, node_list = slurm_json.partition_nodes(partition)
+                if node_list != "":
+                    self.__add_partition(part_name, node_list, exclude_set)
+
+            self.partitions = list(set(self.partitions))
+            return
+
+        squeue_output = execute_cmd(["sinfo"], merge_stderr=False).split("\n")
+
         part_lines = squeue_output[1:]
 
         for line in part_lines:
@@ -234,14 +1008,7 @@ class Slurm(object):
                 node_list = line.split()[5]
                 if part_name.find("*") != -1:
                     part_name = part_name[:-1]
-                if self.__include_part(part_name, exclude_set):
-                    self.partitions.append(part_name)
-                    if part_name in self.node_lists:
-                        self.node_lists[part_name] = self.node_lists[part_name] + \
-                            hostlist.expand_hostlist(node_list)
-                    else:
-                        self.node_lists[part_name] = hostlist.expand_hostlist(
-                            node_list)
+                self.__add_partition(part_name, node_list, exclude_set)
 
         self.partitions = list(set(self.partitions))
 
@@ -266,50 +1033,113 @@ class Slurm(object):
 
     def query_node(self, node):
         """Query information on node"""
-        p = Popen("scontrol show node %s" % node, stdout=PIPE,
-                  stderr=PIPE, shell=True, universal_newlines=True)
-        scontrol_output = p.communicate()[0].split("\n")
+        nodes = query_json("node/%s" % node, "scontrol show node %s" % node, "nodes")
+
+        if nodes is not None:
+            for node_info in nodes:
+                return slurm_json.node_record(node_info)[1]
+            return {}
+
+        scontrol_output = execute_cmd(["scontrol", "show", "node", node], merge_stderr=False)
+
+        node_dict = {}
+
+        for record in scontrol.iter_records(scontrol_output, multiline=True):
+            node_dict.update(record)
+
+        return node_dict
 
+    def __node_dict(self, nodes):
         node_dict = {}
 
-        for line in scontrol_output:
-            var_pairs = line.strip().split(" ")
-            if len(var_pairs) >= 1:
-                for var_pair in var_pairs:
-                    if len(var_pair) > 0:
-                        if var_pair.find("=") != -1:
-                            var_name = var_pair.split("=")[0]
-                            var_value = var_pair.split("=")[1]
-                            node_dict[var_name] = var_value
+        for node_info in nodes:
+            name, record = slurm_json.node_record(node_info)
+            node_dict[name] = record
 
         return node_dict
 
     def query_nodes(self):
         """Query information on node"""
-        p = Popen("scontrol show nodes -o", stdout=PIPE,
-                  stderr=PIPE, shell=True, universal_newlines=True)
-        scontrol_output = p.communicate()[0].split("\n")
 
-        node_dict = {}
+        output = self.state_client.query_output("nodes")
 
-        current_node_name = ""
+        client = slurm_rest.RestClient.shared()
 
-        for line in scontrol_output:
-            var_pairs = line.strip().split(" ")
-            if len(var_pairs) >= 1:
-                for var_pair in var_pairs:
-                    if len(var_pair) > 0:
-                        if var_pair.find("=") != -1:
-                            var_name = var_pair.split("=")[0]
-                            var_value = var_pair.split("=")[1]
+        if output is None and client is not None:
+            try:
+                return self.__node_dict(client.iter_query("nodes", "nodes"))
+            except slurm_rest.errors as e:
+                client.failed("nodes", e)
 
-                            if var_name == "NodeName":
-                                current_node_name = var_value
-                                node_dict[var_value] = {}
-                            else:
-                                node_dict[current_node_name][var_name] = var_value
+        if output is None and OutputFormat.use_json():
+            try:
+                return self.__node_dict(OutputFormat.iter_query("scontrol show nodes", "nodes"))
+            except (ValueError, OSError, runner.CommandError) as e:
+                OutputFormat.disable_json("scontrol show nodes", e)
 
-        return node_dict
+        if output is None:
+            output = execute_cmd(["scontrol", "show", "nodes", "-o"], merge_stderr=False)
+
+        return scontrol.records_by_key(output, "NodeName")
+
+    def query_node_states(self):
+        """Query a cheap state and load summary of all nodes
+
+        Returns a dict of node name -> (State, CPULoad, FreeMem) from
+        sinfo, or from the node snapshot of the state daemon if it is
+        running. Nodes in several partitions are only listed once. Empty if
+        sinfo failed."""
+
+        nodes = self.__state_daemon_nodes()
+
+        if nodes is not None:
+            return dict([(name, (record.get("State", ""), record.get("CPULoad", ""), record.get("FreeMem", "")))
+                         for name, record in nodes.items()])
+
+        output = execute_cmd(["sinfo", "-N", "-h", "-o", "%N %T %O %e"], merge_stderr=False)
+
+        states = {}
+
+        for line in output.split("\n"):
+            items = line.split()
+            if len(items) == 4:
+                states[items[0]] = (items[1], items[2], items[3])
+
+        return states
+
+    def query_node_details(self, names):
+        """Query full information on the given nodes only, as query_nodes()"""
+
+        if len(names) == 0:
+            return {}
+
+        nodes = self.__state_daemon_nodes()
+
+        if nodes is not None:
+            return dict([(name, nodes[name]) for name in names if name in nodes])
+
+        node_list = hostlist.collect_hostlist(names)
+
+        if OutputFormat.use_json():
+            cmd = "scontrol show node %s" % node_list
+            try:
+                return self.__node_dict(OutputFormat.iter_query(cmd, "nodes"))
+            except (ValueError, OSError, runner.CommandError) as e:
+                OutputFormat.disable_json(cmd, e)
+
+        output = execute_cmd(["scontrol", "show", "node", "-o", node_list], merge_stderr=False)
+
+        return scontrol.records_by_key(output, "NodeName")
+
+    def __state_daemon_nodes(self):
+        """Return node records from the state daemon snapshot or None"""
+
+        output = self.state_client.query_output("nodes")
+
+        if output is None:
+            return None
+
+        return scontrol.records_by_key(output, "NodeName")
     
     def query_reservations(self):
         """Query SLURM reservations"""
@@ -340,49 +1170,27 @@ class Slurm(object):
         MaxStartDelay=(null)        
         """
 
-        p = Popen("scontrol show res", stdout=PIPE,
-                  stderr=PIPE, shell=True, universal_newlines=True)
-        scontrol_output = p.communicate()[0].split("\n")
+        reservations = query_json("reservations", "scontrol show res", "reservations")
+
+        if reservations is not None:
+            return [slurm_json.reservation_record(reservation) for reservation in reservations]
+
+        scontrol_output = execute_cmd(["scontrol", "show", "res"], merge_stderr=False)
 
         reservations = []
 
-        for line in scontrol_output:
-            if line.find("ReservationName") != -1:
-                reservation = {}
-                parts = line.split(" ")
-                for part in parts:
-                    if part.find("=") != -1:
-                        key = part.split("=")[0]
-                        value = part.split("=")[1]
-                        reservation[key] = value
-
-            elif line.find("Nodes") != -1:
-                parts = line.split(" ")
-                for part in parts:
-                    if part.find("=") != -1:
-                        key = part.split("=")[0]
-                        value = part.split("=")[1]
-                        reservation[key] = value
-
-            elif line.find("Users") != -1:
-                parts = line.split(" ")
-                for part in parts:
-                    if part.find("=") != -1:
-                        key = part.split("=")[0]
-                        value = part.split("=")[1]
-                        reservation[key] = value
-
-                reservations.append(reservation)
+        for record in scontrol.iter_records(scontrol_output, multiline=True):
+            if "ReservationName" in record:
+                reservations.append(record)
 
         return reservations
 
-    def __include_feature(self, feature, exclude_set):
-        include = True
-        for exclude_pattern in exclude_set:
-            if exclude_pattern in feature:
-                include = False
+    def query_cluster_index(self, part_exclude_set={}, feature_exclude_set={}):
+        """Build a cluster index from a single node query."""
 
-        return include
+        self.cluster_index = ClusterIndex(self.query_nodes(), part_exclude_set, feature_exclude_set)
+
+        return self.cluster_index
 
     def query_features(self, part, exclude_set={}):
         """Query features of partition"""
@@ -390,37 +1198,21 @@ class Slurm(object):
         if self.verbose:
             print(f"Querying {part} for features ...")
 
-        node_info = self.query_nodes()
-
-        feature_list = []
+        if self.cluster_index is None:
+            self.query_cluster_index()
 
-        for node in list(node_info.keys()):
-            if "Partitions" in node_info[node]:
-                if node_info[node]["Partitions"] == part:
-                    features = node_info[node]["ActiveFeatures"].split(",")
-                    for feature in features:
-                        if self.__include_feature(feature, exclude_set):
-                            feature_list.append(feature)
-
-        return list(set(feature_list))
+        return self.cluster_index.features(part, exclude_set)
 
     def query_gres(self, part):
-        """Query features of partition"""
+        """Query generic resources (GRES) of partition"""
 
-        node_list = self.node_lists[part]
+        if self.cluster_index is None:
+            self.query_cluster_index()
 
-        gres_list = []
+        return self.cluster_index.gres(part)
 
-        for node in node_list:
-            node_info = self.query_node(node)
-
-            gres = node_info["Gres"].split(",")
-            gres_list.extend(gres)
-
-        return list(set(gres_list))
-
-    def submit(self, job):
-        """Submit job to SLURM"""
+    def submit(self, job, hold=False):
+        """Submit job to SLURM. With hold the job stays pending until released."""
 
         # Write job script to file (Debugging)
 
@@ -439,11 +1231,37 @@ class Slurm(object):
 
         os.chdir(home_dir)
 
+        # Submit through slurmrestd if configured. sbatch is only used if
+        # slurmrestd can't be reached, so that a job is never submitted twice.
+
+        client = slurm_rest.RestClient.shared()
+
+        if client is not None:
+            try:
+                properties = client.job_properties(job, home_dir, dict(os.environ))
+                if hold:
+                    properties["hold"] = True
+                job.id = client.submit(job.script, properties)
+                self.submit_error = ""
+                return True
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                client.failed("job/submit", e)
+            except slurm_rest.errors as e:
+                self.submit_error = str(e)
+                job.id = -1
+                return False
+
         # Start a sbatch process for job submission
 
-        p = Popen("sbatch", stdout=PIPE, stdin=PIPE, stderr=PIPE,
-                  shell=True, universal_newlines=True)
-        sbatch_output = p.communicate(input=job.script)[0].strip()
+        try:
+            result = runner.run(["sbatch", "--hold"] if hold else ["sbatch"], input=job.script)
+        except runner.CommandError as e:
+            self.submit_error = str(e)
+            job.id = -1
+            return False
+
+        sbatch_output = result.stdout.strip()
+        self.submit_error = result.stderr.strip()
 
         if sbatch_output.find("Submitted batch") != -1:
             job.id = int(sbatch_output.split()[3])
@@ -452,20 +1270,53 @@ class Slurm(object):
             job.id = -1
             return False
 
+    def update_job(self, job, fields):
+        """Change a pending job with scontrol update
+
+        fields maps scontrol job fields (Partition, TimeLimit, ...) to their
+        new values, see update_fields()."""
+
+        if len(fields) == 0:
+            return True
+
+        try:
+            result = runner.run(["scontrol", "update", "JobId=%d" % job.id] +
+                                ["%s=%s" % (name, value) for name, value in sorted(fields.items())])
+        except runner.CommandError as e:
+            self.submit_error = str(e)
+            return False
+
+        self.submit_error = result.stderr.strip()
+
+        return result.returncode == 0
+
+    def release_job(self, job):
+        """Release a held job"""
+
+        try:
+            result = runner.run(["scontrol", "release", str(job.id)])
+        except runner.CommandError as e:
+            self.submit_error = str(e)
+            return False
+
+        self.submit_error = result.stderr.strip()
+
+        return result.returncode == 0
+
     def job_status(self, job):
         """Query status of job"""
-        p = Popen("squeue -j " + str(job.id) + " -t PD,R -h -o '%t;%N;%L;%M;%l'",
-                  stdout=PIPE, stderr=PIPE, shell=True, universal_newlines=True)
-        squeue_output = p.communicate()[0].strip().split(";")
-
-        #print(squeue_output)
-
-        if len(squeue_output) > 1:
-            job.status = squeue_output[0]
-            job.nodes = squeue_output[1]
-            job.timeLeft = squeue_output[2]
-            job.timeRunning = squeue_output[3]
-            job.timeLimit = squeue_output[4]
+
+        # Status is resolved by the shared job status service together
+        # with all other tracked jobs.
+
+        status = self.status_service.status(job.id)
+
+        if status is not None and status["status"] in ["PD", "R"]:
+            job.status = status["status"]
+            job.nodes = status["nodes"]
+            job.timeLeft = status["time_left"]
+            job.timeRunning = status["time_running"]
+            job.timeLimit = status["time_limit"]
         else:
             job.status = ""
             job.nodes = ""
@@ -473,15 +1324,32 @@ class Slurm(object):
             job.timeRunning = ""
             job.timeLimit = ""
 
+    def __cancel(self, jobid):
+        client = slurm_rest.RestClient.shared()
+
+        if client is not None:
+            try:
+                client.cancel(jobid)
+                return 0
+            except slurm_rest.errors as e:
+                client.failed("job/%d" % jobid, e)
+
+        try:
+            return runner.run(["scancel", str(jobid)]).returncode
+        except runner.CommandError as e:
+            print(e)
+            return -1
+
     def cancel_job_with_id(self, jobid):
         """Cancel job"""
-        result = subprocess.call("scancel %d" % (jobid), shell=True)
+        result = self.__cancel(jobid)
         return result
 
     def cancel_job(self, job):
         """Cancel job"""
         try:
-            result = subprocess.call("scancel %d" % (job.id), shell=True)
+            result = self.__cancel(job.id)
+            self.status_service.remove(job.id)
             job.id = -1
             job.status = ""
         except:
@@ -513,8 +1381,13 @@ class Slurm(object):
         self.job_status(job)
 
         while job.status != "R":
+            time.sleep(self.status_service.next_interval())
             self.job_status(job)
-            time.sleep(1)
+
+            status = self.status_service.status(job.id)
+
+            if status is not None and self.status_service.is_finished(status):
+                break
 
     def is_running(self, job):
         self.job_status(job)
@@ -539,7 +1412,29 @@ class Accounting:
         self.job_status = {}
         self.query_job_accouting()
 
+    def __add_status(self, job_id, job_step, job_state, job_exit_code):
+        if not job_id in self.job_status:
+            self.job_status[job_id] = {}
+            self.job_status[job_id][job_step] = []
+
+        if not job_step in self.job_status[job_id]:
+            self.job_status[job_id][job_step] = []
+
+        self.job_status[job_id][job_step].append(job_state)
+        self.job_status[job_id][job_step].append(job_exit_code)
+
     def query_job_accouting(self):
+
+        if OutputFormat.use_json():
+            try:
+                for job in OutputFormat.iter_query("sacct", "jobs"):
+                    for job_id, job_step, job_state, job_exit_code in slurm_json.accounting_entries(job):
+                        self.__add_status(job_id, job_step, job_state, job_exit_code)
+                return
+            except (ValueError, OSError, runner.CommandError) as e:
+                OutputFormat.disable_json("sacct", e)
+                self.job_status = {}
+
         output = execute_cmd("sacct -p -n -b")
         lines = output.split("\n")
 
@@ -560,15 +1455,7 @@ class Accounting:
             job_state = items[1]
             job_exit_code = items[2]
 
-            if not job_id in self.job_status:
-                self.job_status[job_id] = {}
-                self.job_status[job_id][job_step] = []
-
-            if not job_step in self.job_status[job_id]:
-                self.job_status[job_id][job_step] = []
-
-            self.job_status[job_id][job_step].append(job_state)
-            self.job_status[job_id][job_step].append(job_exit_code)
+            self.__add_status(job_id, job_step, job_state, job_exit_code)
 
 class AccountManager:
     def __init__(self, user=""):
@@ -25,10 +25,15 @@ from PyQt5 import Qt, QtCore, QtGui, QtWidgets, uic
 
 from . import jobs
 from . import lrms
+from . import queue_snapshot
+from . import queue_search
+from . import scontrol
 from . import remote
 from . import settings
 from . import config
 from . import resources
+from . import hostlist
+from . import telemetry
 from . import ui_session_manager as ui
 
 from subprocess import Popen, PIPE, STDOUT
@@ -93,6 +98,149 @@ class QueueTableDelegate(QtWidgets.QStyledItemDelegate):
             QtWidgets.QStyledItemDelegate.paint(self, painter, option, index)
 
 
+class RefreshThread(QtCore.QThread):
+    """Runs a SLURM query and parses its output outside the GUI thread"""
+
+    refresh_finished = QtCore.pyqtSignal(object, object)
+    refresh_failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, query, context=None):
+        QtCore.QThread.__init__(self)
+
+        self.query = query
+        self.context = context
+
+    def run(self):
+        """Main thread method"""
+
+        try:
+            result = self.query()
+        except Exception as e:
+            self.refresh_failed.emit(str(e))
+            return
+
+        self.refresh_finished.emit(result, self.context)
+
+
+class TelemetryThread(QtCore.QThread):
+    """Reads the samples of a telemetry agent outside the GUI thread"""
+
+    sample_received = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, stream, index):
+        QtCore.QThread.__init__(self)
+
+        self.stream = stream
+        self.index = index
+
+    def run(self):
+        """Main thread method"""
+
+        if not self.stream.start():
+            return
+
+        for sample in self.stream.samples():
+            self.sample_received.emit(self.index, sample)
+
+
+class Sparkline(QtWidgets.QWidget):
+    """Plots the values of a telemetry.RingBuffer as a line"""
+
+    def __init__(self, buffer, maximum=100.0, parent=None):
+        super(Sparkline, self).__init__(parent)
+
+        self.buffer = buffer
+        self.maximum = maximum
+        self.setMinimumHeight(32)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        values = self.buffer.values()
+
+        if len(values) > 1:
+            width = self.width() - 1
+            height = self.height() - 1
+            step = width / (self.buffer.size - 1)
+            offset = width - step * (len(values) - 1)
+
+            points = [QtCore.QPointF(offset + i * step, height - height * min(value, self.maximum) / self.maximum)
+                      for i, value in enumerate(values)]
+
+            painter.setPen(QtGui.QPen(self.palette().highlight().color(), 1.5))
+            painter.drawPolyline(QtGui.QPolygonF(points))
+
+        painter.end()
+
+
+class Refresher(QtCore.QObject):
+    """Runs refreshes in a RefreshThread, one at a time
+
+    Timer ticks arriving while a refresh is running are skipped. Explicit
+    refresh requests made during a refresh are merged into a single
+    follow-up refresh."""
+
+    def __init__(self, parent, progress, query, on_finished):
+        super().__init__(parent)
+
+        self.progress = progress
+        self.query = query
+        self.on_finished = on_finished
+        self.thread = None
+        self.pending = False
+        self.skipped_ticks = 0
+
+    def is_running(self):
+        return self.thread is not None
+
+    def refresh(self, force=True):
+        """Start a refresh. If one is running, schedule another (force) or skip."""
+
+        if self.is_running():
+            if force:
+                self.pending = True
+            else:
+                self.skipped_ticks += 1
+            return False
+
+        query, context = self.query()
+
+        self.thread = RefreshThread(query, context)
+        self.thread.refresh_finished.connect(self.on_refresh_finished)
+        self.thread.refresh_failed.connect(self.on_refresh_failed)
+        self.thread.finished.connect(self.on_thread_finished)
+
+        self.progress.setRange(0, 0)
+        self.progress.setVisible(True)
+
+        self.thread.start()
+
+        return True
+
+    def on_refresh_finished(self, result, context):
+        self.on_finished(result, context)
+
+    def on_refresh_failed(self, error):
+        print("Refresh failed: %s" % error)
+
+    def on_thread_finished(self):
+
+        # finished is emitted before the thread has stopped running. Wait
+        # for it before dropping the last reference, which deletes the
+        # QThread.
+
+        self.thread.wait()
+        self.thread = None
+        self.progress.setVisible(False)
+
+        if self.pending:
+            self.pending = False
+            self.refresh()
+
+
 class QueueSortFilterProxyModel(QtCore.QSortFilterProxyModel):
     """Proxy model class for enabling queue sorting."""
     def __init__(self, parent, state_filter="", user_filter="", show_progress=True):
@@ -101,6 +249,7 @@ class QueueSortFilterProxyModel(QtCore.QSortFilterProxyModel):
         self.user_filter = user_filter
         self.show_progress = show_progress
         self.search_text = ""
+        self.search_ids = None
 
     def lessThan(self, left, right):
         """Sorting comparison function."""
@@ -109,37 +258,26 @@ class QueueSortFilterProxyModel(QtCore.QSortFilterProxyModel):
         return left_data < right_data
 
     def search_filter(self, job_id, flag):
-        if self.search_text == "":
+        """Apply search result from the QueueSearchIndex (None = no search)"""
+        if self.search_ids is None or not flag:
             return flag
         else:
-            if flag:
-                model = self.sourceModel()
-                values = model.job_dict[job_id]
-                for key, value in values.items():
-                    if self.search_text in str(value):
-                        return True
-                return False
-            else:
-                return flag
+            return job_id in self.search_ids
 
     def filterAcceptsRow(self, source_row, source_parent):
         """Filter function."""
         model = self.sourceModel()
+        snapshot = model.snapshot
         job_id = model.job_keys[source_row]
-        if self.state_filter == "" and self.user_filter == "":
-            return self.search_filter(job_id, True)
-        else:
-            if self.state_filter == "" and self.user_filter != "":
-                return self.search_filter(job_id, (model.job_dict[job_id]["user"] == self.user_filter))
-            elif self.state_filter != "" and self.user_filter == "":
-                return self.search_filter(job_id, (model.job_dict[job_id]["state"] == self.state_filter))
-            elif self.state_filter != "" and self.user_filter != "":
-                if model.job_dict[job_id]["state"] == self.state_filter:
-                    return self.search_filter(job_id, model.job_dict[job_id]["user"] == self.user_filter)
-                else:
-                    return False
-            else:
-                return False
+        row = snapshot.index[job_id]
+
+        if self.state_filter != "" and snapshot.state_name(row) != self.state_filter:
+            return False
+
+        if self.user_filter != "" and snapshot.user[row] != self.user_filter:
+            return False
+
+        return self.search_filter(job_id, True)
 
     def filterAcceptsColumn(self, source_column, source_parent):
         if not self.show_progress and source_column == 5:
@@ -149,15 +287,16 @@ class QueueSortFilterProxyModel(QtCore.QSortFilterProxyModel):
 
 class QueueTableModel(QtCore.QAbstractTableModel):
     """Queue table model for use with QTableView"""
-    def __init__(self, data, max_nodes=-1, max_cpus=-1):
+    def __init__(self, snapshot, max_nodes=-1, max_cpus=-1):
         super(QueueTableModel, self).__init__()
 
-        self.__data = data
+        self.__data = snapshot
         self.__headers = ["Id", "Partition", "Name", "User", "Account",
                           "Progress", "Start", "Left", "Nodes", "CPUs", "Nodelist/Reason"]
         self.__column_keys = ["", "state, partition", "name", "user",
                               "account", "timestart", "timeleft", "nodes", "cpus", "nodelist"]
-        self.__job_keys = list(self.__data.keys())
+        self.__job_keys = list(self.__data.ids)
+        self.__job_rows = {job_key: row for row, job_key in enumerate(self.__job_keys)}
 
         self.colors = ["#FFF878", "#FEED73", "#FDE16D", "#FCD668", "#FBCA62", "#FABF5D", "#F9B458", "#F8A852", "#F79D4D", "#F69147", "#F58642"]
 
@@ -171,6 +310,10 @@ class QueueTableModel(QtCore.QAbstractTableModel):
 
     @property
     def job_dict(self):
+        return queue_snapshot.JobMapping(self.__data)
+
+    @property
+    def snapshot(self):
         return self.__data
 
     @property
@@ -189,6 +332,67 @@ class QueueTableModel(QtCore.QAbstractTableModel):
     def max_cpus(self, cpus):
         self.__max_cpus = cpus
 
+    def __row_ranges(self, rows):
+        """Group sorted rows into (first, last) ranges of consecutive rows"""
+
+        ranges = []
+
+        for row in rows:
+            if len(ranges) > 0 and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+
+        return ranges
+
+    def update_jobs(self, snapshot, added=[], removed=[], changed=[], max_nodes=-1, max_cpus=-1):
+        """Apply a queue diff to the model.
+
+        Removed rows are deleted, added jobs are appended and changed
+        rows are repainted. Unchanged rows, selection and scroll position
+        are left untouched."""
+
+        # Remove rows from the bottom up so that row numbers stay valid
+
+        removed_rows = sorted([self.__job_rows[job_key] for job_key in removed if job_key in self.__job_rows])
+
+        for first, last in reversed(self.__row_ranges(removed_rows)):
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+            del self.__job_keys[first:last + 1]
+            self.endRemoveRows()
+
+        if len(removed_rows) > 0:
+            self.__job_rows = {job_key: row for row, job_key in enumerate(self.__job_keys)}
+
+        self.__data = snapshot
+
+        # Append new jobs
+
+        added = [job_key for job_key in added if job_key not in self.__job_rows]
+
+        if len(added) > 0:
+            first = len(self.__job_keys)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(added) - 1)
+            for job_key in added:
+                self.__job_rows[job_key] = len(self.__job_keys)
+                self.__job_keys.append(job_key)
+            self.endInsertRows()
+
+        # Repaint changed rows. Node and CPU colors depend on the maximum
+        # values, so these columns are repainted if the maximum changes.
+
+        last_column = self.columnCount(QtCore.QModelIndex()) - 1
+
+        changed_rows = sorted([self.__job_rows[job_key] for job_key in changed if job_key in self.__job_rows])
+
+        for first, last in self.__row_ranges(changed_rows):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+
+        if (max_nodes != self.__max_nodes or max_cpus != self.__max_cpus) and len(self.__job_keys) > 0:
+            self.__max_nodes = max_nodes
+            self.__max_cpus = max_cpus
+            self.dataChanged.emit(self.index(0, 8), self.index(len(self.__job_keys) - 1, 9))
+
     def headerData(self, section, orientation, role):
         """Return table headers"""
         if role == QtCore.Qt.DisplayRole:
@@ -236,72 +440,68 @@ class QueueTableModel(QtCore.QAbstractTableModel):
 
             job_key = self.__job_keys[index.row()]
 
-            job_values = self.__data[job_key]
+            # Columns are read directly from the typed snapshot. Numeric
+            # values and progress are parsed once per refresh.
 
-            value = ""
+            snapshot = self.__data
+            row = snapshot.index[job_key]
 
             if index.column() == 0:
                 return str(job_key)
 
             if index.column() == 1:
-                return str(job_values["partition"])
+                return snapshot.partition[row]
 
             if index.column() == 2:
-                return str(job_values["name"])
+                return snapshot.name[row]
 
             if index.column() == 3:
-                return str(job_values["user"])
+                return snapshot.user[row]
 
             if index.column() == 4:
-                return str(job_values["account"])
+                return snapshot.account[row]
 
             if index.column() == 5:
-                time_str = job_values["time"]
-                timelimit_str = job_values["timelimit"]
-
-                time_value = time_to_decimal(time_str)
-                timelimit_value = time_to_decimal(timelimit_str)
-
-                percent_value = int(100*time_value/timelimit_value)            
-
-                return float(percent_value)
+                return float(snapshot.progress[row])
 
             if index.column() == 6:
-                return str(job_values["timestart"])
+                return snapshot.timestart[row]
 
             if index.column() == 7:
-                return str(job_values["timeleft"])
+                return queue_snapshot.format_duration(snapshot.timeleft[row])
 
             if index.column() == 8:
-                return int(job_values["nodes"])
+                return snapshot.nodes[row]
 
             if index.column() == 9:
-                return int(job_values["cpus"])
+                return snapshot.cpus[row]
 
             if index.column() == 10:
-                return self.reason_to_string(str(job_values["nodelist"]))
+                return self.reason_to_string(snapshot.field(row, "nodelist"))
 
             return ""
 
         if role == QtCore.Qt.BackgroundColorRole:
             
             job_key = self.__job_keys[index.row()]
-            job_values = self.__data[job_key]
+            snapshot = self.__data
+            row = snapshot.index[job_key]
 
             if index.column() == 8:
-                nodes = int(job_values["nodes"])
+                nodes = snapshot.nodes[row]
                 return QtGui.QColor(self.colors[int(math.floor((len(self.colors)-1)*nodes/self.max_nodes))])
             elif index.column() == 9:
-                cpus = int(job_values["cpus"])
+                cpus = snapshot.cpus[row]
                 return QtGui.QColor(self.colors[int(math.floor((len(self.colors)-1)*cpus/self.max_cpus))])
             elif index.column() == 10:
-                if "(Priority)" in job_values["nodelist"]:
+                reason = snapshot.reason_name(row)
+                if "(Priority)" in reason:
                     return QtGui.QColor(50, 200, 50)
-                elif "(Resources)" in job_values["nodelist"]:
+                elif "(Resources)" in reason:
                     return QtGui.QColor(50, 230, 50)
-                elif "(AssocGrpCpuLimit)" in job_values["nodelist"]:
+                elif "(AssocGrpCpuLimit)" in reason:
                     return QtGui.QColor(220, 220, 50)
-                elif "(DependencyNeverSatisfied)" in job_values["nodelist"]:
+                elif "(DependencyNeverSatisfied)" in reason:
                     return QtGui.QColor(220, 50, 50)
                 else:
                     return None
@@ -347,7 +547,7 @@ class QueueTableModel(QtCore.QAbstractTableModel):
 
     def rowCount(self, index):
         """Return table rows"""
-        return len(self.__data.keys())
+        return len(self.__job_keys)
 
     def columnCount(self, index):
         """Return table columns"""
@@ -382,8 +582,21 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.search_panel.setVisible(False)
 
-        self.update_table()
+        # Searching is deferred until typing pauses
+
+        self.search_index = queue_search.QueueSearchIndex()
+        self.search_timer = QtCore.QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.on_search_timer_timeout)
+
+        # Refreshes run in a worker thread and never overlap
+
+        self.refresher = Refresher(self, self.processing_progress, self.refresh_query, self.on_refresh_finished)
+
+        self.create_models()
         self.processing_progress.setVisible(False)
+        self.update_table()
 
     def state_bg_color(self, state_str):
         """Return a color depending on the SLURM state."""
@@ -397,48 +610,74 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         else:
             return QtGui.QColor("white")
 
-    def update_table(self):
-        """Update session table"""
+    def create_models(self):
+        """Create long-lived queue model and views"""
+
+        self.queue_model = QueueTableModel(self.queue.snapshot)
+
+        self.running_model = QueueSortFilterProxyModel(self, "RUNNING")
+        self.running_model.setSourceModel(self.queue_model)
+        self.waiting_model = QueueSortFilterProxyModel(self, "PENDING", show_progress=False)
+        self.waiting_model.setSourceModel(self.queue_model)
+
+        self.running_table_view.setModel(self.running_model)
+        self.running_table_view.setItemDelegate(QueueTableDelegate())
+        self.running_table_view.setSortingEnabled(True)
+
+        self.waiting_table_view.setModel(self.waiting_model)
+        self.waiting_table_view.setSortingEnabled(True)
+
+        self.user_filter = None
+
+    def update_table(self, force=True):
+        """Start a background refresh of the session table"""
+        self.refresher.refresh(force)
+
+    def refresh_query(self):
+        """Return the query to run in the refresh thread and its user filter"""
+
+        # Only the user's own jobs are fetched unless all jobs are shown.
+
+        if self.action_show_all_jobs.isChecked():
+            user_filter = ""
+        else:
+            user_filter = getpass.getuser()
+
+        return (lambda: self.queue.query_snapshot(user=user_filter)), user_filter
 
-        # Query the queue
+    def on_refresh_finished(self, snapshot, user_filter):
+        """Update session table from a snapshot queried in the refresh thread"""
 
-        self.queue.update()
+        self.queue.set_snapshot(snapshot)
 
         #print(self.queue.jobs)
         #print(self.queue.max_nodes)
         #print(self.queue.max_cpus)
 
-        # Get user information
+        # Search results must refer to the new snapshot before the
+        # model is updated.
 
-        user = getpass.getuser()
+        self.search_index.set_snapshot(self.queue.snapshot)
+        self.apply_search(invalidate=False)
 
-        # Test tableview
+        # Apply changes since the last update to the model
 
-        self.queue_model = QueueTableModel(self.queue.jobs, self.queue.max_nodes, self.queue.max_cpus)
+        self.queue_model.update_jobs(self.queue.snapshot, self.queue.added_jobs, self.queue.removed_jobs,
+                                     self.queue.changed_jobs, self.queue.max_nodes, self.queue.max_cpus)
 
-        if self.action_show_all_jobs.isChecked():
-            self.running_model = QueueSortFilterProxyModel(self, "RUNNING")
-            self.running_model.setSourceModel(self.queue_model)
-            self.waiting_model = QueueSortFilterProxyModel(self, "PENDING", show_progress=False)
-            self.waiting_model.setSourceModel(self.queue_model)
-        else:
-            self.running_model = QueueSortFilterProxyModel(
-                self, "RUNNING", user)
-            self.running_model.setSourceModel(self.queue_model)
-            self.waiting_model = QueueSortFilterProxyModel(
-                self, "PENDING", user, show_progress=False)
-            self.waiting_model.setSourceModel(self.queue_model)
+        # Columns are only resized when the view content changes
+        # completely, not on every refresh.
 
-        self.running_table_view.setModel(self.running_model)
-        self.running_table_view.setItemDelegate(QueueTableDelegate())
-        self.running_table_view.setSortingEnabled(True)
-        self.running_table_view.resizeColumnsToContents()
+        if user_filter != self.user_filter:
+            self.user_filter = user_filter
 
-        self.waiting_table_view.setModel(self.waiting_model)
-        self.waiting_table_view.setSortingEnabled(True)
-        self.waiting_table_view.resizeColumnsToContents()
+            self.running_model.user_filter = user_filter
+            self.waiting_model.user_filter = user_filter
+            self.running_model.invalidateFilter()
+            self.waiting_model.invalidateFilter()
 
-        return
+            self.running_table_view.resizeColumnsToContents()
+            self.waiting_table_view.resizeColumnsToContents()
 
     def get_selected_job_list(self):
         """Get selected job list from table selection."""
@@ -474,15 +713,26 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         """Toggle showing all jobs event method."""
 
         self.update_table()
-        self.processing_progress.setVisible(False)
+
+    def apply_search(self, invalidate=True):
+        """Search the current snapshot and filter both views on the result"""
+
+        search_ids = self.search_index.search(self.running_model.search_text)
+
+        self.running_model.search_ids = search_ids
+        self.waiting_model.search_ids = search_ids
+
+        if invalidate:
+            self.running_model.invalidateFilter()
+            self.waiting_model.invalidateFilter()
 
     @QtCore.pyqtSlot()
     def on_action_search_triggered(self):
         if not self.action_search.isChecked():
+            self.search_timer.stop()
             self.running_model.search_text = ""
             self.waiting_model.search_text = ""
-            self.running_model.invalidateFilter()
-            self.waiting_model.invalidateFilter()
+            self.apply_search()
             self.search_combo.setCurrentText("")
 
         self.search_panel.setVisible(self.action_search.isChecked())
@@ -491,8 +741,11 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
     def on_search_combo_currentTextChanged(self, text):
         self.running_model.search_text = text
         self.waiting_model.search_text = text
-        self.running_model.invalidateFilter()
-        self.waiting_model.invalidateFilter()
+        self.search_timer.start()
+
+    def on_search_timer_timeout(self):
+        """Search when typing has paused"""
+        self.apply_search()
 
     @QtCore.pyqtSlot()
     def on_action_cancel_job_triggered(self):
@@ -504,7 +757,6 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             self.slurm.cancel_job_with_id(job_id)
 
         self.update_table()
-        self.processing_progress.setVisible(False)
 
     @QtCore.pyqtSlot()
     def on_action_job_info_triggered(self):
@@ -532,7 +784,6 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         """Refresh button event method."""
 
         self.update_table()
-        self.processing_progress.setVisible(False)
 
     @QtCore.pyqtSlot()
     def on_action_auto_refresh_triggered(self):
@@ -548,10 +799,9 @@ class SessionWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.on_action_job_info_triggered()
 
     def on_refresh_timer_timeout(self):
-        """Refresh timer event method."""
+        """Refresh timer event method. Skipped if a refresh is still running."""
 
-        self.update_table()
-        self.processing_progress.setVisible(False)
+        self.update_table(force=False)
 
 
 class JobInfoWindow(QtWidgets.QMainWindow):
@@ -577,8 +827,6 @@ class JobInfoWindow(QtWidgets.QMainWindow):
     def update_table(self):
         """Update job property table"""
 
-        self.queue.update()
-
         self.job_properties.clear()
 
         self.job_properties.setColumnCount(2)
@@ -606,17 +854,11 @@ class JobInfoWindow(QtWidgets.QMainWindow):
         """Query SLURM for job information"""
 
         job_info = self.queue.job_info(self.__job_id)
-        job_lines = job_info.split("\n")
 
         self.job_info_dict = {}
 
-        for line in job_lines:
-            value_pairs = line.split()
-
-            for value_pair in value_pairs:
-                if len(value_pair.split("=")) == 2:
-                    prop, value = value_pair.split("=")
-                    self.job_info_dict[prop.strip()] = value.strip()
+        for record in scontrol.iter_records(job_info, multiline=True):
+            self.job_info_dict.update(record)
 
     def on_action_refresh_view_triggered(self):
         """Update job info and property table when refresh button is clicked."""
@@ -655,7 +897,95 @@ class MonitorWindow(QtWidgets.QWidget):
         self.remote_probe = remote.StatusProbe(local_exec=self.local_exec)
         self.remote_probe.check_all(self.hostname)
 
+        # Multi-node sessions show the aggregate figures in the bars and
+        # the figures of each node in a table
+
+        self.node_table = QtWidgets.QTableWidget(self)
+        self.node_table.setColumnCount(4)
+        self.node_table.setHorizontalHeaderLabels(["Node", "CPU [%]", "Memory [%s]" % self.remote_probe.memory_unit, "GPU [%]"])
+        self.node_table.horizontalHeader().setStretchLastSection(True)
+        self.node_table.verticalHeader().setVisible(False)
+        self.node_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.layout().addWidget(self.node_table)
+
         self.update_controls()
+        self.update_node_table()
+
+        # Continuous usage graphs from a telemetry agent on each node
+
+        cfg = config.GfxConfig.create()
+
+        self.history = {
+            "CPU": telemetry.RingBuffer(cfg.telemetry_history),
+            "Memory": telemetry.RingBuffer(cfg.telemetry_history),
+            "GPU": telemetry.RingBuffer(cfg.telemetry_history)
+        }
+
+        graph_layout = QtWidgets.QGridLayout()
+
+        for row, name in enumerate(["CPU", "Memory", "GPU"]):
+            graph_layout.addWidget(QtWidgets.QLabel("%s [%%]" % name, self), row, 0)
+            graph_layout.addWidget(Sparkline(self.history[name], parent=self), row, 1)
+
+        self.layout().addLayout(graph_layout)
+
+        if self.hostname == "":
+            nodes = [""]
+        else:
+            nodes = hostlist.expand_hostlist(self.hostname)
+
+        self.telemetry_threads = []
+
+        for index, node in enumerate(nodes):
+            stream = telemetry.TelemetryStream(node, cfg.telemetry_interval, self.local_exec)
+            thread = TelemetryThread(stream, index)
+            thread.sample_received.connect(self.on_telemetry_sample)
+            thread.start()
+            self.telemetry_threads.append(thread)
+
+    def on_telemetry_sample(self, index, sample):
+        """Update figures and graphs with a sample from a node"""
+
+        records = self.remote_probe.records
+
+        if index >= len(records):
+            return
+
+        records[index] = telemetry.sample_record(sample, records[index]["hostname"])
+
+        if len(records) == 1:
+            status = records[0]
+        else:
+            status = remote.aggregate_status(records)
+
+        self.remote_probe.cpu_usage = status["cpu_usage"]
+        self.remote_probe.total_mem = status["total_mem"]
+        self.remote_probe.free_mem = status["free_mem"]
+        self.remote_probe.used_mem = status["used_mem"]
+        self.remote_probe.gpu_usage = status["gpu_usage"]
+
+        self.history["CPU"].append(status["cpu_usage"])
+
+        if status["total_mem"] > 0:
+            self.history["Memory"].append(100.0 * status["used_mem"] / status["total_mem"])
+
+        if len(status["gpu_usage"]) > 0:
+            self.history["GPU"].append(sum(status["gpu_usage"]) / len(status["gpu_usage"]))
+
+        self.update_controls()
+        self.update_node_table()
+        self.update()
+
+    def closeEvent(self, event):
+        """Stop the telemetry agents"""
+
+        for thread in self.telemetry_threads:
+            thread.stream.stop()
+
+        for thread in self.telemetry_threads:
+            thread.wait(2000)
+
+        event.accept()
 
     def update_controls(self):
         self.progressMemory.setMaximum(self.remote_probe.total_mem)
@@ -664,36 +994,37 @@ class MonitorWindow(QtWidgets.QWidget):
         self.progressCPU.setValue(self.remote_probe.cpu_usage)
         self.hostnameEdit.setText(self.hostname)
 
-        self.progressGPU1.setEnabled(False)
-        self.progressGPU2.setEnabled(False)
-        self.progressGPU3.setEnabled(False)
-        self.progressGPU4.setEnabled(False)
-        self.progressGPU5.setEnabled(False)
-        self.progressGPU6.setEnabled(False)
-        self.progressGPU7.setEnabled(False)
-        self.progressGPU8.setEnabled(False)
-
-        if len(self.remote_probe.gpu_usage) >= 1:
-            self.progressGPU1.setEnabled(True)
-            self.progressGPU1.setValue(self.remote_probe.gpu_usage[0])
-        if len(self.remote_probe.gpu_usage) >= 2:
-            self.progressGPU2.setEnabled(True)
-            self.progressGPU2.setValue(self.remote_probe.gpu_usage[1])
-        if len(self.remote_probe.gpu_usage) >= 3:
-            self.progressGPU3.setEnabled(True)
-            self.progressGPU3.setValue(self.remote_probe.gpu_usage[2])
-        if len(self.remote_probe.gpu_usage) >= 4:
-            self.progressGPU4.setEnabled(True)
-            self.progressGPU4.setValue(self.remote_probe.gpu_usage[3])
-        if len(self.remote_probe.gpu_usage) >= 5:
-            self.progressGPU5.setEnabled(True)
-            self.progressGPU5.setValue(self.remote_probe.gpu_usage[4])
-        if len(self.remote_probe.gpu_usage) >= 6:
-            self.progressGPU6.setEnabled(True)
-            self.progressGPU6.setValue(self.remote_probe.gpu_usage[4])
-        if len(self.remote_probe.gpu_usage) >= 7:
-            self.progressGPU7.setEnabled(True)
-            self.progressGPU7.setValue(self.remote_probe.gpu_usage[7])
-        if len(self.remote_probe.gpu_usage) >= 8:
-            self.progressGPU8.setEnabled(True)
-            self.progressGPU8.setValue(self.remote_probe.gpu_usage[8])
+        # The window has bars for 8 GPUs, further GPUs are only shown in
+        # the node table
+
+        for index in range(8):
+            bar = getattr(self, "progressGPU%d" % (index + 1))
+
+            if index < len(self.remote_probe.gpu_usage):
+                bar.setEnabled(True)
+                bar.setValue(max(self.remote_probe.gpu_usage[index], 0))
+            else:
+                bar.setEnabled(False)
+                bar.setValue(0)
+
+    def update_node_table(self):
+        """Show the figures of each node of a multi-node session"""
+
+        records = self.remote_probe.records
+
+        self.node_table.setVisible(len(records) > 1)
+        self.node_table.setRowCount(len(records))
+
+        for row, record in enumerate(records):
+            if record["error"] != "":
+                values = [record["hostname"], "-", "-", record["error"]]
+            else:
+                values = [record["hostname"],
+                          str(record["cpu_usage"]),
+                          "%d/%d" % (record["used_mem"], record["total_mem"]),
+                          " ".join([str(usage) for usage in record["gpu_usage"]])]
+
+            for column, value in enumerate(values):
+                self.node_table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+
+        self.node_table.resizeColumnsToContents()
@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 import cmd
-import subprocess
 import json
 import re
 from dataclasses import dataclass
@@ -10,6 +9,8 @@ import sys
 from pathlib import Path
 
 from lhpcdt import local_queue
+from lhpcdt import lrms
+from lhpcdt import runner
 
 
 @dataclass
@@ -152,6 +153,7 @@ class NotebookSlurmController(cmd.Cmd):
     def __init__(self):
         super().__init__()
         self.active_jobs: Dict[str, NotebookJob] = {}
+        self.status_service = lrms.JobStatusService.shared()
         # Load any existing jobs from state file
         self.load_state()
 
@@ -221,8 +223,7 @@ class NotebookSlurmController(cmd.Cmd):
         
         try:
             # Submit job to SLURM
-            result = subprocess.run(['sbatch'], input=submit_script,
-                                 capture_output=True, text=True)
+            result = runner.run(['sbatch'], input=submit_script)
             
             if result.returncode == 0:
                 # Extract job ID from sbatch output
@@ -331,61 +332,67 @@ sleep infinity
         for job in self.active_jobs.values():
             print(f"{job.job_id};{job.port};{job.status};{job.hostname};{job.url};{job.runtime}")
 
+    def _apply_job_status(self, job_id: str, status: dict):
+        """Update a job from a JobStatusService status."""
+        job = self.active_jobs[job_id]
+
+        if status['state'] in lrms.JobStatusService.active_states:
+            job.status = status['state']
+            job.runtime = status['time_running']
+
+            # Update hostname and URL if the job is running and we don't have them yet
+            if job.status == 'RUNNING':
+                if not job.hostname:
+                    hostname_file = Path.home() / f'.notebook_{job_id}_hostname'
+                    if hostname_file.exists():
+                        job.hostname = hostname_file.read_text().strip()
+
+                # Try to get token if we don't have it yet
+                if not job.token:
+                    job.token = self._get_jupyter_token(job_id)
+
+                # Update URL with token if we have all the information
+                if job.hostname and job.token:
+                    job.url = f'http://{job.hostname}:{job.port}/?token={job.token}'
+        elif self.status_service.is_finished(status):
+            # Job has left the queue, check if it completed
+            if status['state'] == 'COMPLETED':
+                job.status = 'COMPLETED'
+            else:
+                job.status = 'FAILED'
+
+            job.url = ''
+            job.token = ''
+
     def _update_job_status(self, job_id: str):
         """Update status for a specific job."""
         try:
-            result = subprocess.run(['squeue', '-j', job_id, '-o', '%T %M %N'],
-                                 capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                # Parse squeue output
-                lines = result.stdout.strip().split('\n')
-                if len(lines) > 1:  # Skip header line
-                    status, runtime, node = lines[1].split()
-                    job = self.active_jobs[job_id]
-                    job.status = status
-                    job.runtime = runtime
-
-                    # Update hostname and URL if the job is running and we don't have them yet
-                    if status == 'RUNNING':
-                        if not job.hostname:
-                            hostname_file = Path.home() / f'.notebook_{job_id}_hostname'
-                            if hostname_file.exists():
-                                job.hostname = hostname_file.read_text().strip()
-                        
-                        # Try to get token if we don't have it yet
-                        if not job.token:
-                            job.token = self._get_jupyter_token(job_id)
-                            
-                        # Update URL with token if we have all the information
-                        if job.hostname and job.token:
-                            job.url = f'http://{job.hostname}:{job.port}/?token={job.token}'
+            status = self.status_service.status(job_id, max_age=0)
+            if status is not None:
+                self._apply_job_status(job_id, status)
 
-                else:
-                    # Job not in queue, check if it completed
-                    sacct_result = subprocess.run(
-                        ['sacct', '-j', job_id, '-o', 'State', '-n'],
-                        capture_output=True, text=True
-                    )
-                    if sacct_result.returncode == 0:
-                        status = sacct_result.stdout.strip()
-                        if 'COMPLETED' in status:
-                            self.active_jobs[job_id].status = 'COMPLETED'
-                        else:
-                            self.active_jobs[job_id].status = 'FAILED'
-
-                        self.active_jobs[job_id].url = ''
-                        self.active_jobs[job_id].token = ''
-            
             self.save_state()
-            
+
         except Exception as e:
             print(f"Error updating job status: {e}")
 
     def _update_all_job_statuses(self):
-        """Update status for all tracked jobs."""
-        for job_id in list(self.active_jobs.keys()):
-            self._update_job_status(job_id)
+        """Update status for all tracked jobs with a single squeue/sacct call."""
+        try:
+            for job_id in self.active_jobs.keys():
+                self.status_service.add(job_id)
+
+            self.status_service.poll()
+
+            for job_id in list(self.active_jobs.keys()):
+                status = self.status_service.last_status(job_id)
+                if status is not None:
+                    self._apply_job_status(job_id, status)
+
+            self.save_state()
+
+        except Exception as e:
+            print(f"Error updating job status: {e}")
 
     def do_cancel(self, arg):
         """
@@ -402,7 +409,7 @@ sleep infinity
             return
 
         try:
-            result = subprocess.run(['scancel', job_id], capture_output=True, text=True)
+            result = runner.run(['scancel', job_id])
             
             if result.returncode == 0:
                 print(f"Cancelled job {job_id}")
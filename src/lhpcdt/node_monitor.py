@@ -17,7 +17,7 @@
 #
 """LUNARC HPC Desktop Monitor Module"""
 
-import os, math, sys
+import os, math, sys, time
 import getpass
 from datetime import datetime
 
@@ -30,6 +30,7 @@ from . import settings
 from . import config
 from . import resources
 from . import ui_node_window as ui  
+from .monitor import Refresher
 
 from subprocess import Popen, PIPE, STDOUT
 
@@ -183,6 +184,27 @@ class NodeTableModel(QtCore.QAbstractTableModel):
     def max_values(self):
         return self.__max_values
 
+    def update_nodes(self, details, states):
+        """Update the table in place
+
+        details holds full records of nodes whose state changed, states
+        the (State, CPULoad, FreeMem) summary of all nodes. The rows are
+        not changed, new or removed nodes need a new model."""
+
+        for node_key, record in details.items():
+            if node_key in self.__data:
+                self.__data[node_key] = record
+
+        for node_key, (state, cpu_load, free_mem) in states.items():
+            if node_key in self.__data:
+                self.__data[node_key]["CPULoad"] = cpu_load
+                self.__data[node_key]["FreeMem"] = free_mem
+
+        self.update_max_values()
+
+        if len(self.__node_keys) > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.__node_keys) - 1, len(self.__headers) - 1))
+
 
     def headerData(self, section, orientation, role):
         """Return table headers"""
@@ -309,8 +331,21 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
 
         self.search_panel.setVisible(False)
 
-        self.update_table()
+        # Each refresh queries a cheap sinfo state summary and fetches full
+        # node information only for nodes whose state changed. All nodes
+        # are fetched at startup and every node_resync_interval seconds.
+
+        self.node_states = {}
+        self.last_full_refresh = 0.0
+        self.resync_interval = config.GfxConfig.create().node_resync_interval
+
+        # Refreshes run in a worker thread and never overlap
+
+        self.refresher = Refresher(self, self.processing_progress, self.refresh_query, self.on_refresh_finished)
+
+        self.on_refresh_finished({}, None)
         self.processing_progress.setVisible(False)
+        self.update_table()
 
     def state_bg_color(self, state_str):
         """Return a color depending on the SLURM state."""
@@ -324,12 +359,55 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         else:
             return QtGui.QColor("white")
 
-    def update_table(self):
-        """Update session table"""
+    def update_table(self, force=True):
+        """Start a background refresh of the node table"""
+        self.refresher.refresh(force)
+
+    def refresh_query(self):
+        """Return the query to run in the refresh thread"""
+
+        full = len(self.node_states) == 0 or time.time() - self.last_full_refresh >= self.resync_interval
+        previous_states = self.node_states
+
+        return (lambda: self.query_nodes(previous_states, full)), "refresh"
+
+    def query_nodes(self, previous_states, full):
+        """Query node states and the details of changed nodes
+
+        Runs in the refresh thread. Returns (states, nodes, full), where
+        nodes holds all nodes for a full refresh and the changed nodes
+        otherwise."""
 
-        # Query the queue
+        states = self.slurm.query_node_states()
 
-        nodes = self.slurm.query_nodes()
+        if not full and (len(states) == 0 or states.keys() != previous_states.keys()):
+
+            # sinfo failed or nodes were added or removed
+
+            full = True
+
+        if full:
+            return states, self.slurm.query_nodes(), True
+
+        changed = [name for name, state in states.items() if state[0] != previous_states[name][0]]
+
+        return states, self.slurm.query_node_details(changed), False
+
+    def on_refresh_finished(self, result, context):
+        """Update node table from nodes queried in the refresh thread"""
+
+        if context is None:
+            nodes = result
+        else:
+            states, nodes, full = result
+
+            self.node_states = states
+
+            if not full:
+                self.node_model.update_nodes(nodes, states)
+                return
+
+            self.last_full_refresh = time.time()
 
         #print(self.queue.jobs)
         #print(self.queue.max_nodes)
@@ -342,6 +420,9 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.node_proxy_model.setSourceModel(self.node_model)
         self.node_proxy_model.setFilterKeyColumn(1)
 
+        if self.action_search.isChecked():
+            self.node_proxy_model.search_text = self.search_combo.currentText()
+
         self.node_view_table.setModel(self.node_proxy_model)
         #self.node_view_table.setItemDelegate(NodeTableDelegate())
         self.node_view_table.setSortingEnabled(True)
@@ -356,7 +437,6 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         """Toggle showing all jobs event method."""
 
         self.update_table()
-        self.processing_progress.setVisible(False)
 
     @QtCore.pyqtSlot()
     def on_action_search_triggered(self):
@@ -382,7 +462,6 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
             self.slurm.cancel_job_with_id(job_id)
 
         self.update_table()
-        self.processing_progress.setVisible(False)
 
     @QtCore.pyqtSlot()
     def on_action_job_info_triggered(self):
@@ -410,7 +489,6 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         """Refresh button event method."""
 
         self.update_table()
-        self.processing_progress.setVisible(False)
 
     @QtCore.pyqtSlot()
     def on_action_auto_refresh_triggered(self):
@@ -426,9 +504,8 @@ class NodeWindow(QtWidgets.QMainWindow, ui.Ui_MainWindow):
         self.on_action_job_info_triggered()
 
     def on_refresh_timer_timeout(self):
-        """Refresh timer event method."""
+        """Refresh timer event method. Skipped if a refresh is still running."""
 
-        self.update_table()
-        self.processing_progress.setVisible(False)
+        self.update_table(force=False)
 
 
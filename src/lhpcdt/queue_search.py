@@ -0,0 +1,166 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Queue search module
+
+Implements a per-snapshot search index for the queue monitor. Each job
+gets a lowercased row key with all its fields, built once per snapshot.
+An optional trigram index narrows free-text terms to candidate rows
+before substring matching. It is slower to build than a scan of the
+row keys and only pays off when a snapshot is searched many times.
+
+Queries are whitespace separated terms. Terms of the form field:value
+only match the given field:
+
+    user:alice state:PENDING part:gpu lu-2024
+"""
+
+from lhpcdt import queue_snapshot
+
+
+class QueueSearchIndex(object):
+    """Search index for a queue_snapshot.QueueSnapshot"""
+
+    field_aliases = {
+        "id": "jobid",
+        "jobid": "jobid",
+        "part": "partition",
+        "partition": "partition",
+        "name": "name",
+        "user": "user",
+        "state": "state",
+        "account": "account",
+        "acct": "account",
+        "node": "nodelist",
+        "nodes": "nodelist",
+        "reason": "nodelist",
+        "feature": "features",
+        "features": "features"
+    }
+
+    def __init__(self, snapshot=None, use_trigrams=False):
+        """Class constructor"""
+        self.use_trigrams = use_trigrams
+        self.snapshot = None
+        self.row_keys = None
+        self.trigrams = None
+
+        if snapshot is not None:
+            self.set_snapshot(snapshot)
+
+    def set_snapshot(self, snapshot):
+        """Use a new snapshot. The index is rebuilt on the next search."""
+
+        if snapshot is not self.snapshot:
+            self.snapshot = snapshot
+            self.row_keys = None
+            self.trigrams = None
+
+    def __build_row_keys(self):
+        snapshot = self.snapshot
+        state_names = snapshot.state_names
+        reason_names = snapshot.reason_names
+        duration = queue_snapshot.format_duration
+
+        self.row_keys = ["\x1f".join((jobid, partition, name, user, state_names[state], duration(time),
+                                      duration(timelimit), str(nodes), reason_names[reason] if reason >= 0 else nodelist,
+                                      duration(timeleft), deps, account, str(cpus), features, timestart)).lower()
+                         for jobid, partition, name, user, state, time, timelimit, nodes, nodelist, reason,
+                             timeleft, deps, account, cpus, features, timestart
+                         in zip(snapshot.ids, snapshot.partition, snapshot.name, snapshot.user, snapshot.state,
+                                snapshot.time, snapshot.timelimit, snapshot.nodes, snapshot.nodelist, snapshot.reason,
+                                snapshot.timeleft, snapshot.deps, snapshot.account, snapshot.cpus, snapshot.features,
+                                snapshot.timestart)]
+
+    def __build_trigrams(self):
+        self.trigrams = {}
+
+        for row, row_key in enumerate(self.row_keys):
+            for trigram in {row_key[i:i + 3] for i in range(len(row_key) - 2)}:
+                self.trigrams.setdefault(trigram, []).append(row)
+
+    def parse_query(self, text):
+        """Split query text into free terms and (field, value) terms"""
+
+        terms = []
+        field_terms = []
+
+        for term in text.lower().split():
+            if ":" in term:
+                field, value = term.split(":", 1)
+                if field in QueueSearchIndex.field_aliases and value != "":
+                    field_terms.append((QueueSearchIndex.field_aliases[field], value))
+                    continue
+
+            terms.append(term)
+
+        return terms, field_terms
+
+    def __candidates(self, term):
+        """Return candidate rows for a free term using the trigram index"""
+
+        if not self.use_trigrams or len(term) < 3:
+            return None
+
+        if self.trigrams is None:
+            self.__build_trigrams()
+
+        candidates = None
+
+        for i in range(len(term) - 2):
+            rows = self.trigrams.get(term[i:i + 3], [])
+            candidates = set(rows) if candidates is None else candidates.intersection(rows)
+            if len(candidates) == 0:
+                break
+
+        return candidates
+
+    def search(self, text):
+        """Return set of job ids matching query text, or None if the query is empty"""
+
+        terms, field_terms = self.parse_query(text)
+
+        if len(terms) == 0 and len(field_terms) == 0:
+            return None
+
+        snapshot = self.snapshot
+
+        if snapshot is None:
+            return set()
+
+        if self.row_keys is None:
+            self.__build_row_keys()
+
+        rows = None
+
+        for term in terms:
+            candidates = self.__candidates(term)
+
+            if candidates is None:
+                candidates = range(len(self.row_keys)) if rows is None else rows
+            elif rows is not None:
+                candidates = candidates.intersection(rows)
+
+            rows = {row for row in candidates if term in self.row_keys[row]}
+
+        for field, value in field_terms:
+            candidates = range(len(snapshot)) if rows is None else rows
+            rows = {row for row in candidates if value in snapshot.field(row, field).lower()}
+
+        return {snapshot.ids[row] for row in rows}
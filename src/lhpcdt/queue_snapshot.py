@@ -0,0 +1,367 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Queue snapshot module
+
+Implements a compact, columnar snapshot of the SLURM queue. Numeric
+fields are parsed once per refresh and stored in typed arrays, states
+and pending reasons are stored as small integer codes and repeated
+strings (users, accounts, partitions) are interned. JobView and
+JobMapping provide the old dict-style access, job["field"], on top of
+the columns without storing a dict per job.
+"""
+
+import sys
+
+from array import array
+from functools import lru_cache
+from collections.abc import Mapping
+
+
+special_durations = ["UNLIMITED", "INVALID", "NOT_SET", "N/A"]
+
+
+@lru_cache(maxsize=8192)
+def parse_duration(duration_str):
+    """Convert a SLURM duration, [days-][hours:]minutes:seconds, to seconds
+
+    Special values (UNLIMITED, INVALID, ...) are returned as negative codes."""
+
+    if duration_str in special_durations:
+        return -1 - special_durations.index(duration_str)
+
+    d = "0"
+    h = "0"
+    m = "0"
+    s = "0"
+
+    try:
+        if "-" in duration_str:
+            (d, time_rest) = duration_str.split("-")
+        else:
+            time_rest = duration_str
+
+        if len(time_rest.split(':')) == 2:
+            (m, s) = time_rest.split(':')
+        elif len(time_rest.split(':')) == 3:
+            (h, m, s) = time_rest.split(':')
+
+        return int(d) * 86400 + int(h) * 3600 + int(m) * 60 + int(s)
+    except ValueError:
+        return -2
+
+
+@lru_cache(maxsize=8192)
+def format_duration(seconds):
+    """Convert seconds to a SLURM duration string as printed by squeue"""
+
+    if seconds < 0:
+        return special_durations[-1 - seconds]
+
+    d, rest = divmod(seconds, 86400)
+    h, rest = divmod(rest, 3600)
+    m, s = divmod(rest, 60)
+
+    if d > 0:
+        return "%d-%02d:%02d:%02d" % (d, h, m, s)
+    elif h > 0:
+        return "%d:%02d:%02d" % (h, m, s)
+    else:
+        return "%d:%02d" % (m, s)
+
+
+def parse_count(count_str):
+    """Convert a squeue count to int (-1 if not available)"""
+    try:
+        return int(count_str)
+    except ValueError:
+        return -1
+
+
+class JobView(object):
+    """Dict-like read-only view of a single job in a QueueSnapshot"""
+
+    __slots__ = ("snapshot", "row")
+
+    def __init__(self, snapshot, row):
+        self.snapshot = snapshot
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.snapshot.field(self.row, key)
+
+    def __contains__(self, key):
+        return key in QueueSnapshot.fields
+
+    def __iter__(self):
+        return iter(QueueSnapshot.fields)
+
+    def __len__(self):
+        return len(QueueSnapshot.fields)
+
+    def __eq__(self, other):
+        if isinstance(other, JobView):
+            return self.snapshot.row_key(self.row) == other.snapshot.row_key(other.row)
+        else:
+            return dict(self.items()) == other
+
+    def get(self, key, default=None):
+        if key in QueueSnapshot.fields:
+            return self.snapshot.field(self.row, key)
+        else:
+            return default
+
+    def keys(self):
+        return list(QueueSnapshot.fields)
+
+    def values(self):
+        return [self.snapshot.field(self.row, key) for key in QueueSnapshot.fields]
+
+    def items(self):
+        return [(key, self.snapshot.field(self.row, key)) for key in QueueSnapshot.fields]
+
+
+class JobMapping(Mapping):
+    """Read-only mapping from job id to JobView for (a subset of) a snapshot"""
+
+    def __init__(self, snapshot, rows=None):
+        self.snapshot = snapshot
+        self.rows = rows
+
+    def __getitem__(self, jobid):
+        row = self.snapshot.index[jobid]
+
+        if self.rows is not None and row not in self.rows:
+            raise KeyError(jobid)
+
+        return JobView(self.snapshot, row)
+
+    def __iter__(self):
+        if self.rows is None:
+            return iter(self.snapshot.ids)
+        else:
+            return iter([self.snapshot.ids[row] for row in sorted(self.rows)])
+
+    def __len__(self):
+        if self.rows is None:
+            return len(self.snapshot.ids)
+        else:
+            return len(self.rows)
+
+
+class QueueSnapshot(object):
+    """Columnar, typed snapshot of the SLURM queue"""
+
+    fields = ["jobid", "partition", "name", "user", "state", "time", "timelimit", "nodes",
+              "nodelist", "timeleft", "deps", "account", "cpus", "features", "timestart"]
+
+    states = ["PENDING", "RUNNING", "SUSPENDED", "COMPLETING", "CONFIGURING", "COMPLETED",
+              "CANCELLED", "FAILED", "TIMEOUT", "PREEMPTED", "NODE_FAIL", "BOOT_FAIL",
+              "DEADLINE", "OUT_OF_MEMORY", "REQUEUED", "REQUEUE_HOLD", "REQUEUE_FED",
+              "RESIZING", "RESV_DEL_HOLD", "REVOKED", "SIGNALING", "SPECIAL_EXIT",
+              "STAGE_OUT", "STOPPED"]
+
+    def __init__(self):
+        """Class constructor"""
+
+        self.ids = []
+        self.index = {}
+
+        self.partition = []
+        self.name = []
+        self.user = []
+        self.account = []
+        self.nodelist = []
+        self.deps = []
+        self.features = []
+        self.timestart = []
+
+        self.state = array("b")
+        self.reason = array("h")
+        self.time = array("l")
+        self.timelimit = array("l")
+        self.timeleft = array("l")
+        self.nodes = array("l")
+        self.cpus = array("l")
+        self.progress = array("f")
+
+        # Interned state and pending reason codes
+
+        self.state_names = list(QueueSnapshot.states)
+        self.state_codes = {state: code for code, state in enumerate(self.state_names)}
+        self.reason_names = []
+        self.reason_codes = {}
+
+        self.max_nodes = -1
+        self.max_cpus = -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def state_code(self, state):
+        """Return code for state, adding unknown states"""
+
+        if state not in self.state_codes:
+            self.state_codes[state] = len(self.state_names)
+            self.state_names.append(state)
+
+        return self.state_codes[state]
+
+    def reason_code(self, reason):
+        """Return code for a pending reason, adding new reasons"""
+
+        if reason not in self.reason_codes:
+            self.reason_codes[reason] = len(self.reason_names)
+            self.reason_names.append(reason)
+
+        return self.reason_codes[reason]
+
+    def append(self, parts):
+        """Add a job from the split fields of a squeue line"""
+
+        jobid = parts[0].strip()
+
+        if jobid in self.index:
+            return
+
+        intern = sys.intern
+
+        self.index[jobid] = len(self.ids)
+        self.ids.append(jobid)
+
+        self.partition.append(intern(parts[1].strip()))
+        self.name.append(parts[2].strip())
+        self.user.append(intern(parts[3].strip()))
+        self.state.append(self.state_code(parts[4].strip()))
+        self.time.append(parse_duration(parts[5].strip()))
+        self.timelimit.append(parse_duration(parts[6].strip()))
+        self.nodes.append(parse_count(parts[7].strip()))
+
+        # %R is either a node list or a pending reason in parentheses
+
+        nodelist = parts[8].strip()
+
+        if nodelist.startswith("("):
+            self.reason.append(self.reason_code(nodelist))
+            self.nodelist.append("")
+        else:
+            self.reason.append(-1)
+            self.nodelist.append(nodelist)
+
+        self.timeleft.append(parse_duration(parts[9].strip()))
+        self.deps.append(intern(parts[10].strip()))
+        self.account.append(intern(parts[11].strip()))
+        self.cpus.append(parse_count(parts[12].strip()))
+        self.features.append(intern(parts[13].strip()))
+        self.timestart.append(parts[14].strip())
+
+    def finalize(self):
+        """Compute derived columns once after all jobs have been added"""
+
+        self.progress = array("f", [int(100 * t / tl) if t >= 0 and tl > 0 else 0
+                                    for t, tl in zip(self.time, self.timelimit)])
+
+        self.max_nodes = max(self.nodes) if len(self.nodes) > 0 else -1
+        self.max_cpus = max(self.cpus) if len(self.cpus) > 0 else -1
+
+    @classmethod
+    def from_output(cls, output):
+        """Build snapshot from squeue output in lrms.Queue format"""
+
+        snapshot = cls()
+
+        for line in output.split("\n"):
+            parts = line.split(";")
+            if len(parts) >= 15:
+                snapshot.append(parts)
+
+        snapshot.finalize()
+
+        return snapshot
+
+    def state_name(self, row):
+        """Return state string of row"""
+        return self.state_names[self.state[row]]
+
+    def reason_name(self, row):
+        """Return pending reason of row or an empty string"""
+
+        code = self.reason[row]
+
+        if code < 0:
+            return ""
+        else:
+            return self.reason_names[code]
+
+    def field(self, row, key):
+        """Return field of row as the string printed by squeue"""
+
+        if key == "jobid":
+            return self.ids[row]
+        elif key == "state":
+            return self.state_name(row)
+        elif key == "nodelist":
+            if self.reason[row] >= 0:
+                return self.reason_names[self.reason[row]]
+            else:
+                return self.nodelist[row]
+        elif key in ["time", "timelimit", "timeleft"]:
+            return format_duration(getattr(self, key)[row])
+        elif key in ["nodes", "cpus"]:
+            return str(getattr(self, key)[row])
+        else:
+            return getattr(self, key)[row]
+
+    def row_key(self, row):
+        """Return a tuple of all raw values in row, used for diffing"""
+
+        return (self.partition[row], self.name[row], self.user[row], self.state_name(row),
+                self.time[row], self.timelimit[row], self.nodes[row], self.nodelist[row],
+                self.reason_name(row), self.timeleft[row], self.deps[row], self.account[row],
+                self.cpus[row], self.features[row], self.timestart[row])
+
+    def rows_with_state(self, state):
+        """Return set of rows with the given state"""
+
+        if state not in self.state_codes:
+            return set()
+
+        code = self.state_codes[state]
+
+        return {row for row, value in enumerate(self.state) if value == code}
+
+    def rows_by_user(self):
+        """Return dict of user -> set of rows"""
+
+        users = {}
+
+        for row, user in enumerate(self.user):
+            users.setdefault(user, set()).add(row)
+
+        return users
+
+    def diff(self, previous):
+        """Return added, removed and changed job ids relative to a previous snapshot"""
+
+        added = [jobid for jobid in self.ids if jobid not in previous.index]
+        removed = [jobid for jobid in previous.ids if jobid not in self.index]
+        changed = [jobid for row, jobid in enumerate(self.ids)
+                   if jobid in previous.index and self.row_key(row) != previous.row_key(previous.index[jobid])]
+
+        return added, removed, changed
@@ -20,12 +20,29 @@
 Remote launch module
 
 This module implements different classes for remote launch methods.
+
+Connections to a node are multiplexed over a single SSH master connection
+managed by ConnectionManager, so that only the first connection to a node
+pays for the handshake and authentication.
 """
 
-import os, sys, subprocess, socketserver
+import os, sys, json, time, threading, subprocess, socketserver, concurrent.futures
 
 from subprocess import Popen, PIPE, STDOUT
 
+from lhpcdt import config
+from lhpcdt import hostlist
+from lhpcdt import runner
+from lhpcdt import command_stats
+
+def record_session(name):
+    """Count a started interactive session in the command statistics
+
+    Sessions run until the user closes them, so only the number of
+    started sessions is recorded, not their duration."""
+    command_stats.CommandStats.shared().record([], 0.0, name="%s session" % name)
+
+
 def find_available_port():
     """Find an available tcp port."""
 
@@ -35,6 +52,193 @@ def find_available_port():
     return free_port
 
 
+class ConnectionManager(object):
+    """Multiplexed SSH connections, one master connection per node
+
+    Masters are started in the background with ControlMaster and their
+    sockets are kept in a private runtime directory. Clients are given
+    ControlPath options and fall back to a direct connection if no master
+    is running. Masters exit when closed or after being unused for
+    ssh_control_persist seconds."""
+
+    __shared = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, control_dir="", persist=300, enabled=True, timeout=30):
+        """Class constructor"""
+
+        if control_dir == "":
+            if "XDG_RUNTIME_DIR" in os.environ:
+                control_dir = os.path.join(os.environ["XDG_RUNTIME_DIR"], "lhpcdt", "ssh")
+            else:
+                control_dir = os.path.join(os.path.expanduser("~"), ".lhpc", "ssh")
+
+        self.control_dir = control_dir
+        self.persist = persist
+        self.enabled = enabled
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.node_locks = {}
+        self.nodes = set()
+        self.failed = {}
+
+    @classmethod
+    def shared(cls):
+        """Return the connection manager of this process"""
+
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cfg = config.GfxConfig.create()
+                cls.__shared = ConnectionManager(persist=cfg.ssh_control_persist, enabled=cfg.ssh_multiplexing)
+
+        return cls.__shared
+
+    def control_path(self):
+        """Return the ControlPath pattern, creating the directory if needed"""
+
+        if not os.path.isdir(self.control_dir):
+            os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+
+        # %C is a hash of the host, port and user, short enough for the
+        # socket path limit
+
+        return os.path.join(self.control_dir, "%C")
+
+    def options(self, node):
+        """Return the ssh options routing a connection to node through its
+        master, or an empty list if multiplexing is disabled"""
+
+        if not self.enabled or node == "":
+            return []
+
+        try:
+            control_path = self.control_path()
+        except OSError as e:
+            print("Couldn't create ssh control directory: %s" % e)
+            return []
+
+        return ["-o", "ControlMaster=no", "-o", "ControlPath=%s" % control_path]
+
+    def option_string(self, node):
+        """Return options() as a string for shell command lines"""
+
+        return " ".join(self.options(node))
+
+    def _control(self, node, command, forward=None):
+        """Send a control command (check, exit, forward, cancel) to the
+        master of node. Returns True on success."""
+
+        args = ["ssh"] + self.options(node) + ["-O", command]
+
+        if forward is not None:
+            args += ["-L", forward]
+
+        args.append(node)
+
+        try:
+            return runner.run(args, timeout=self.timeout).ok
+        except runner.CommandError:
+            return False
+
+    def is_open(self, node):
+        """Return True if a master connection to node is running"""
+
+        if not self.enabled or node == "":
+            return False
+
+        return self._control(node, "check")
+
+    def open(self, node):
+        """Start a master connection to node unless one is running
+
+        Blocks until the connection is authenticated, so it should not be
+        called from the GUI thread. Returns True if a master is running."""
+
+        if not self.enabled or node == "":
+            return False
+
+        with self.lock:
+            node_lock = self.node_locks.setdefault(node, threading.Lock())
+
+        with node_lock:
+
+            # Don't retry a node that failed recently, clients connect
+            # directly instead
+
+            if time.time() - self.failed.get(node, 0.0) < 60.0:
+                return False
+
+            if self.is_open(node):
+                return True
+
+            # The master forks into the background once authenticated. Its
+            # output is not captured, as the pipes would be held open for
+            # the lifetime of the master.
+
+            args = ["ssh", "-M", "-N", "-f", "-o", "ControlPath=%s" % self.control_path(),
+                    "-o", "ControlPersist=%d" % self.persist, "-o", "BatchMode=yes",
+                    "-o", "StrictHostKeyChecking=no", node]
+
+            start_time = time.time()
+
+            try:
+                returncode = subprocess.run(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL, timeout=self.timeout).returncode
+                outcome = "ok" if returncode == 0 else "failed"
+            except subprocess.TimeoutExpired:
+                outcome = "timeout"
+            except OSError:
+                outcome = "error"
+
+            command_stats.CommandStats.shared().record(args, time.time() - start_time, outcome, name="ssh master")
+
+            if outcome != "ok":
+                print("Couldn't open ssh master connection to %s, connecting directly." % node)
+                self.failed[node] = time.time()
+                return False
+
+            with self.lock:
+                self.nodes.add(node)
+
+            return True
+
+    def forward(self, node, forward):
+        """Add a port forward (local_port:host:remote_port) to the master"""
+
+        return self._control(node, "forward", forward)
+
+    def cancel_forward(self, node, forward):
+        """Remove a port forward added with forward()"""
+
+        return self._control(node, "cancel", forward)
+
+    def close(self, node):
+        """Close the master connection to node and the sessions using it
+
+        Only masters started by this process are closed. Masters found
+        running by open() belong to another process of the user sharing
+        the control socket."""
+
+        with self.lock:
+            if node not in self.nodes:
+                return
+            self.nodes.discard(node)
+
+        if not self.enabled or node == "":
+            return
+
+        self._control(node, "exit")
+
+    def close_all(self):
+        """Close all master connections opened by this process"""
+
+        with self.lock:
+            nodes = list(self.nodes)
+
+        for node in nodes:
+            self.close(node)
+
+
 class SSH(object):
     """Implements a SSH connection"""
 
@@ -96,12 +300,15 @@ class SSH(object):
         self.cmd = command
 
         if not self.local_exec:
-            print("ssh %s %s '%s'" % (self._options, node, command))
+            options = ("%s %s" % (self._options, ConnectionManager.shared().option_string(node))).strip()
+            print("ssh %s %s '%s'" % (options, node, command))
             self.process = Popen("ssh %s %s '%s'" %
-                                 (self._options, node, command), shell=self.shell)
+                                 (options, node, command), shell=self.shell)
+            record_session("ssh")
         else:
             self.process = Popen("%s" %
                                  (command), shell=self.shell)
+            record_session("local")
 
     def execute_again(self):
         """Execute again with the same command and node"""
@@ -113,25 +320,34 @@ class SSH(object):
             
         self.execute(self.node, self.cmd, re_count=self.re_execute_count)
 
-    def execute_with_output(self, node, command, re_count=0):
-        """Execute command node, capturing output."""
+    def execute_with_output(self, node, command, re_count=0, timeout=None, input=None):
+        """Execute command node, capturing output.
+
+        The command is run by the command runner with a timeout, through
+        the master connection to the node if one is running. No master is
+        opened here, as this may be called from the GUI thread. Output is
+        returned as bytes, empty if the command could not be run."""
 
         self.re_execute_count = re_count
         self._update_options()
 
         if not self.local_exec:
-            self.process = Popen("ssh %s %s '%s'" %
-                                 (self._options, node, command), shell=self.shell, stdout=PIPE)
+            args = ["ssh"] + self._options.split() + ConnectionManager.shared().options(node) + [node, command]
+        elif self.shell:
+            args = ["/bin/sh", "-c", command]
         else:
-            self.process = Popen("%s" %
-                                 (command), shell=self.shell, stdout=PIPE)
-
+            args = command
 
-        output, error = self.process.communicate()
-        self.std_output = output
-        self.std_error = error
+        try:
+            result = runner.run(args, input=input, timeout=timeout)
+            self.std_output = result.stdout
+            self.std_error = result.stderr
+        except runner.CommandError as e:
+            print(e)
+            self.std_output = e.output
+            self.std_error = str(e)
 
-        return output
+        return self.std_output.encode("utf-8")
 
 class SSHForwardTunnel(object):
     def __init__(self, local_port=-1, dest_server="", remote_port=-1, server_hostname=""):
@@ -142,6 +358,7 @@ class SSHForwardTunnel(object):
         self.strict_host_key_check = False
         self.__options = ""
         self.__process = None
+        self.__forward = ""
 
     def __update_options(self):
         """Update SSH options"""
@@ -149,7 +366,8 @@ class SSHForwardTunnel(object):
         if self.local_port<0:
             self.local_port = find_available_port()
 
-        self.__options = "-N -L %d:%s:%d %s" % (self.local_port, self.dest_server, self.remote_port, self.server_hostname)
+        self.__forward = "%d:%s:%d" % (self.local_port, self.dest_server, self.remote_port)
+        self.__options = "-N -L %s %s" % (self.__forward, self.server_hostname)
         if not self.strict_host_key_check:
             self.__options += " -oStrictHostKeyChecking=no"
 
@@ -157,19 +375,41 @@ class SSHForwardTunnel(object):
         """Terminate SSH connection process"""
         if self.__process != None:
             self.__process.terminate()
+        elif self.__forward != "":
+            ConnectionManager.shared().cancel_forward(self.server_hostname, self.__forward)
+            self.__forward = ""
 
     def is_active(self):
         """Return SSH connection status"""
+        if self.__process is None:
+            return self.__forward != "" and ConnectionManager.shared().is_open(self.server_hostname)
         self.__process.poll()
         return self.__process.returncode == None
 
     def wait(self):
-        self.__process.wait()        
+        if self.__process is None:
+            while self.is_active():
+                time.sleep(1)
+        else:
+            self.__process.wait()        
 
     def execute(self):
         self.__update_options()
-        print("Tunnel cmdline: %s" % ("ssh %s" % (self.__options)))
-        self.__process = Popen("ssh %s" % (self.__options), shell=True)
+
+        # Add the forward to a running master connection to the node,
+        # otherwise start a separate tunnel process
+
+        connections = ConnectionManager.shared()
+
+        if connections.is_open(self.server_hostname) and connections.forward(self.server_hostname, self.__forward):
+            print("Tunnel forward: %s through master connection to %s" % (self.__forward, self.server_hostname))
+            self.__process = None
+        else:
+            self.__forward = ""
+            print("Tunnel cmdline: %s" % ("ssh %s" % (self.__options)))
+            self.__process = Popen("ssh %s" % (self.__options), shell=True)
+
+        record_session("ssh tunnel")
     
 
 class VGLConnect(object):
@@ -252,17 +492,192 @@ class VGLConnect(object):
         if self.vgl_path != "":
             self._vgl_cmd = os.path.join(self.vgl_path, 'vglconnect')
 
+        # vglconnect passes options given after the hostname to ssh
+
+        ssh_options = ConnectionManager.shared().option_string(node)
+
         if self.vglrun:
             #print("vglconnect %s %s '%s'" % (self._options, node, "vglrun %s" % (command)))
-            self.process = Popen("%s %s %s '%s'" %
-                                (self._vgl_cmd, self._options, node, "vglrun %s" % (command)), shell=self.shell)
+            self.process = Popen("%s %s %s %s '%s'" %
+                                (self._vgl_cmd, self._options, node, ssh_options, "vglrun %s" % (command)), shell=self.shell)
         else:
             #print("vglconnect %s %s '%s'" % (self._options, node, command))
-            self.process = Popen("%s %s %s '%s'" %
-                                (self._vgl_cmd, self._options, node, command), shell=self.shell)
+            self.process = Popen("%s %s %s %s '%s'" %
+                                (self._vgl_cmd, self._options, node, ssh_options, command), shell=self.shell)
+
+        record_session("vglconnect")
+
+# Fields queried with nvidia-smi --query-gpu, in the order of the GPUStatus
+# constructor arguments
+
+gpu_query_fields = ["index", "utilization.gpu", "utilization.memory", "memory.used", "memory.total"]
+
+
+class GPUStatus(object):
+    """Utilisation and memory use of a GPU. Memory is in MiB, values that
+    nvidia-smi doesn't report are -1."""
+
+    def __init__(self, index=0, utilization=-1, memory_utilization=-1, memory_used=-1, memory_total=-1):
+        self.index = index
+        self.utilization = utilization
+        self.memory_utilization = memory_utilization
+        self.memory_used = memory_used
+        self.memory_total = memory_total
+
+    def __repr__(self):
+        return "GPUStatus(%d, %d%%, %d%%, %d/%d MiB)" % (self.index, self.utilization, self.memory_utilization,
+                                                         self.memory_used, self.memory_total)
+
+
+def parse_gpu_query(output):
+    """Parse the CSV output of nvidia-smi --query-gpu with gpu_query_fields
+    and --format=csv,noheader,nounits into a list of GPUStatus"""
+
+    gpus = []
+
+    for line in output.split("\n"):
+        fields = [field.strip() for field in line.split(",")]
+
+        if len(fields) != len(gpu_query_fields):
+            continue
+
+        values = []
+
+        for field in fields:
+            try:
+                values.append(int(float(field)))
+            except ValueError:
+                values.append(-1)   # [N/A] or [Not Supported]
+
+        if values[0] < 0:
+            continue
+
+        gpus.append(GPUStatus(*values))
+
+    return gpus
+
+
+class GPUSampler(object):
+    """Samples GPU usage with nvidia-smi in query mode, on the local node
+    or over ssh"""
+
+    def __init__(self, local_exec=False, nvidia_smi="nvidia-smi"):
+        self.local_exec = local_exec
+        self.nvidia_smi = nvidia_smi
+        self.process = None
+
+    def command(self, interval_ms=0):
+        """Return the nvidia-smi command line, sampling every interval_ms
+        milliseconds if given"""
+
+        cmd = "%s --query-gpu=%s --format=csv,noheader,nounits" % (self.nvidia_smi, ",".join(gpu_query_fields))
+
+        if interval_ms > 0:
+            cmd += " -lms %d" % interval_ms
+
+        return cmd
+
+    def sample(self, node="", timeout=None):
+        """Return a list of GPUStatus, empty if the node has no GPUs"""
+
+        output = SSH(self.local_exec).execute_with_output(node, self.command(), timeout=timeout).decode("utf-8")
+
+        return parse_gpu_query(output)
+
+    def stream(self, node="", interval_ms=1000):
+        """Yield a list of GPUStatus every interval_ms milliseconds from a
+        single nvidia-smi process in loop mode, until stop() is called"""
+
+        if self.local_exec:
+            args = ["/bin/sh", "-c", self.command(interval_ms)]
+        else:
+            connections = ConnectionManager.shared()
+            connections.open(node)
+            args = ["ssh", "-T"] + connections.options(node) + [node, self.command(interval_ms)]
+
+        self.process = Popen(args, stdin=subprocess.DEVNULL, stdout=PIPE, stderr=subprocess.DEVNULL,
+                             universal_newlines=True)
+        record_session("nvidia-smi")
+
+        # Every sampling round lists the GPUs in index order
+
+        gpus = []
+
+        for line in self.process.stdout:
+            for gpu in parse_gpu_query(line):
+                if len(gpus) > 0 and gpu.index <= gpus[-1].index:
+                    yield gpus
+                    gpus = []
+                gpus.append(gpu)
+
+        if len(gpus) > 0:
+            yield gpus
+
+        self.process.wait()
+
+    def stop(self):
+        """Stop a stream() started by this sampler"""
+
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+
+# Probe script run by sh on the node. Prints the figures of the check_*
+# methods of StatusProbe as a single JSON record, -1 if unavailable.
+
+probe_script = r"""
+cpu=$(vmstat -w 2>/dev/null | awk 'NR==3 {print $13+$14}')
+total=$(free -g 2>/dev/null | awk '/^Mem:/ {print $2}')
+free=$(free -g 2>/dev/null | awk '/^Mem:/ {print $4}')
+gpus=$(nvidia-smi --query-gpu=%s --format=csv,noheader,nounits 2>/dev/null | awk '{printf "%%s\"%%s\"", (n++ ? ", " : ""), $0}')
+printf '{"hostname": "%%s", "cpu_usage": %%s, "total_mem": %%s, "free_mem": %%s, "gpus": [%%s]}\n' \
+    "$(hostname -s)" "${cpu:--1}" "${total:--1}" "${free:--1}" "$gpus"
+""" % ",".join(gpu_query_fields)
+
+
+def aggregate_status(records):
+    """Combine the probe records of several nodes
+
+    Memory is summed, CPU usage is the mean over the nodes that reported
+    it and GPU usage lists the GPUs of all nodes in node order."""
+
+    valid = [record for record in records if record["error"] == ""]
+
+    total = {
+        "hostname": ",".join([record["hostname"] for record in records]),
+        "cpu_usage": -1,
+        "total_mem": -1,
+        "free_mem": -1,
+        "used_mem": -1,
+        "gpus": [],
+        "gpu_usage": [],
+        "error": ""
+    }
+
+    cpu = [record["cpu_usage"] for record in valid if record["cpu_usage"] >= 0]
+
+    if len(cpu) > 0:
+        total["cpu_usage"] = int(round(sum(cpu) / len(cpu)))
+
+    memory = [record for record in valid if record["total_mem"] >= 0]
+
+    if len(memory) > 0:
+        total["total_mem"] = sum([record["total_mem"] for record in memory])
+        total["free_mem"] = sum([record["free_mem"] for record in memory])
+        total["used_mem"] = total["total_mem"] - total["free_mem"]
+
+    for record in valid:
+        total["gpus"] += record.get("gpus", [])
+        total["gpu_usage"] += record["gpu_usage"]
+
+    if len(valid) == 0 and len(records) > 0:
+        total["error"] = "No node could be probed"
+
+    return total
+
 
 class StatusProbe(SSH):
-    def __init__(self, local_exec=False):
+    def __init__(self, local_exec=False, max_workers=8):
         super(StatusProbe, self).__init__(local_exec)
         self.total_mem = -1
         self.free_mem = -1
@@ -270,6 +685,10 @@ class StatusProbe(SSH):
         self.memory_unit = "G" 
         self.cpu_usage = -1
         self.cpu_unit = "%"
+        self.gpus = []
+        self.gpu_usage = []
+        self.max_workers = max_workers
+        self.records = []
 
     def print_summary(self):
         """Print probe summary"""
@@ -312,154 +731,95 @@ class StatusProbe(SSH):
         self.cpu_usage = int(vmstat_items[12]) + int(vmstat_items[13])
 
     def check_gpu_usage(self, node):
-        pass
+        """Check gpu usage of node
 
-        """
-        ==============NVSMI LOG==============
-        
-        Timestamp                           : Fri Jun  8 15:59:16 2018
-        Driver Version                      : 390.12
-        
-        Attached GPUs                       : 4
-        GPU 00000000:0A:00.0
-            Utilization
-                Gpu                         : 0 %
-                Memory                      : 0 %
-                Encoder                     : 0 %
-                Decoder                     : 0 %
-            GPU Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            Memory Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            ENC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            DEC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-        
-        GPU 00000000:0D:00.0
-            Utilization
-                Gpu                         : 0 %
-                Memory                      : 0 %
-                Encoder                     : 0 %
-                Decoder                     : 0 %
-            GPU Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            Memory Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            ENC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            DEC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-        
-        GPU 00000000:2B:00.0
-            Utilization
-                Gpu                         : 0 %
-                Memory                      : 0 %
-                Encoder                     : 0 %
-                Decoder                     : 0 %
-            GPU Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            Memory Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            ENC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            DEC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-        
-        GPU 00000000:30:00.0
-            Utilization
-                Gpu                         : 0 %
-                Memory                      : 0 %
-                Encoder                     : 0 %
-                Decoder                     : 0 %
-            GPU Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            Memory Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            ENC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-            DEC Utilization Samples
-                Duration                    : 18446744073709.21 sec
-                Number of Samples           : 99
-                Max                         : 0 %
-                Min                         : 0 %
-                Avg                         : 0 %
-        """
+        The per-GPU records are kept in gpus, the utilisation of each GPU
+        in gpu_usage."""
 
-        output = self.execute_with_output(node, "nvidia-smi -q  -d UTILIZATION").decode('ascii')
-        lines = output.split("\n")
+        self.gpus = GPUSampler(self.local_exec).sample(node)
+        self.gpu_usage = [gpu.utilization for gpu in self.gpus]
 
-        self.gpu_usage = []
+    def probe(self, node, timeout=None):
+        """Run the probe script on node in a single round trip
+
+        Returns a dict with hostname, cpu_usage, total_mem, free_mem,
+        used_mem, gpu_usage and error, which is empty on success."""
 
-        for line in lines:
-            if line.find("Gpu")!=-1:
-                usage = int(line.split(":")[1].split("%")[0])
-                self.gpu_usage.append(usage)
+        output = self.execute_with_output(node, "sh -s", timeout=timeout, input=probe_script).decode("utf-8")
+
+        record = {
+            "hostname": node,
+            "cpu_usage": -1,
+            "total_mem": -1,
+            "free_mem": -1,
+            "used_mem": -1,
+            "gpus": [],
+            "gpu_usage": [],
+            "error": ""
+        }
+
+        try:
+            record.update(json.loads(output.strip().split("\n")[-1]))
+        except (ValueError, IndexError):
+            record["error"] = "Couldn't probe %s" % (node if node != "" else "local node")
+            return record
+
+        record["gpus"] = parse_gpu_query("\n".join(record["gpus"]))
+        record["gpu_usage"] = [gpu.utilization for gpu in record["gpus"]]
+
+        if node != "":
+            record["hostname"] = node
+
+        if record["total_mem"] >= 0:
+            record["used_mem"] = record["total_mem"] - record["free_mem"]
+
+        return record
+
+    def probe_nodes(self, nodes, timeout=None):
+        """Probe the nodes of a hostlist expression concurrently
+
+        At most max_workers probes run at the same time. Returns the
+        records in hostlist order."""
+
+        if nodes == "":
+            node_list = [""]
+        else:
+            node_list = hostlist.expand_hostlist(nodes)
+
+        if len(node_list) == 1:
+            return [self.probe(node_list[0], timeout)]
+
+        # Each worker uses its own probe, as execute_with_output keeps
+        # state in the instance
+
+        def probe_node(node):
+            return StatusProbe(self.local_exec).probe(node, timeout)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(node_list))) as executor:
+            return list(executor.map(probe_node, node_list))
 
     def check_all(self, node):
-        self.check_cpu_usage(node)
-        self.check_memory(node)
-        self.check_gpu_usage(node)
+        """Check cpu, memory and gpu usage of node, or of all nodes of a
+        hostlist expression. For several nodes the figures are aggregated
+        with aggregate_status() and the per-node records are kept in
+        records."""
+
+        self.records = self.probe_nodes(node)
+
+        if len(self.records) == 1:
+            status = self.records[0]
+        else:
+            status = aggregate_status(self.records)
+
+        if status["error"] != "":
+            print(status["error"])
+
+        self.cpu_usage = status["cpu_usage"]
+        self.total_mem = status["total_mem"]
+        self.free_mem = status["free_mem"]
+        self.used_mem = status["used_mem"]
+        self.gpus = status.get("gpus", [])
+        self.gpu_usage = status["gpu_usage"]
 
 class XFreeRDP(object):
     """Implements a RDP connection"""
@@ -505,14 +865,19 @@ class XFreeRDP(object):
 
         #cmd_line = '/sw/pkg/freerdp/2.0.0-rc4/bin/xfreerdp /v:%s /audio-mode:1 /gfx +gfx-progressive -bitmap-cache -offscreen-cache -glyph-cache +clipboard -themes -wallpaper /size:1280x1024 /dynamic-resolution /t:"LUNARC HPC Desktop Windows 10 (NVIDA V100)"'
         self.process = Popen(cmd_line % (self.xfreerdp_binary, self.hostname), shell=True)
+        record_session("xfreerdp")
 
-    def execute_with_output(self, node, command):
-        self.process = Popen("ssh %s %s '%s'" %
-                             (self._options, node, command), shell=self.shell, stdout=PIPE)
+    def execute_with_output(self, node, command, timeout=None):
+        """Execute command on node, through a running master connection"""
 
-        output, error = self.process.communicate()
+        try:
+            output = runner.run(["ssh"] + ConnectionManager.shared().options(node) + [node, command],
+                                timeout=timeout).stdout
+        except runner.CommandError as e:
+            print(e)
+            output = e.output
 
-        return output
+        return output.encode("utf-8")
 
     def set_xfreerdp_path(self, p):
         """Set method for xfreerdp_path property"""
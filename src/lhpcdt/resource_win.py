@@ -59,6 +59,17 @@ class ResourceSpecWindow(QtWidgets.QWidget, ui.Ui_resourceWindow):
 
         self.set_data()
 
+    def update_reservations(self, reservations):
+        """Update reservation combo box"""
+
+        current_reservation = self.reservationCombo.currentText()
+
+        self.reservationCombo.clear()
+        self.reservationCombo.addItems(reservations)
+
+        if current_reservation in reservations:
+            self.reservationCombo.setCurrentText(current_reservation)
+
     def set_data(self, check_boxes=True):
         """Assign values to controls"""
 
@@ -72,9 +83,7 @@ class ResourceSpecWindow(QtWidgets.QWidget, ui.Ui_resourceWindow):
             self.specifyTasksPerNodeCheck.setVisible(True)
             self.specifyMemoryCheck.setVisible(True)
 
-        account_mgr = lrms.AccountManager()
-        self.reservationCombo.clear()
-        self.reservationCombo.addItems(account_mgr.query_active_reservations())
+        self.update_reservations(self.parent.active_reservations())
 
         if self.parent.reservation!="":
             self.reservationCombo.setVisible(True)
@@ -0,0 +1,493 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Command runner module
+
+Central execution of external commands (SLURM tools, ssh). Commands are
+given as argument lists and run without a shell. Every command has a
+timeout, so a hung slurmctld or host can't block the caller forever,
+and the number of concurrently running commands is limited process-wide.
+
+run() blocks the calling thread, run_async() is a coroutine for use in
+an asyncio event loop. Cancelling the task of run_async(), or setting
+the cancel_event passed to run(), kills the process. run_concurrently()
+runs independent commands in parallel from synchronous code.
+
+Failures to start a command, timeouts and cancellation raise
+CommandError (or the subclasses CommandTimeout and CommandCancelled).
+A non-zero exit status only raises CommandError when check is set.
+
+The default timeout and concurrency limit can be set with
+command_timeout and max_concurrent_commands in the [slurm] section of
+the configuration. Every command is recorded in command_stats.
+"""
+
+import os
+import time
+import shlex
+import asyncio
+import threading
+import contextlib
+import subprocess
+
+from lhpcdt import config
+from lhpcdt import command_stats
+
+default_timeout = 60.0
+default_max_concurrent = 8
+
+# Interval used to check cancel events while waiting for a process
+
+poll_interval = 0.1
+
+
+class CommandResult(object):
+    """Result of a finished command"""
+
+    def __init__(self, args, returncode, stdout="", stderr="", duration=0.0):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def check(self):
+        """Raise CommandError if the command failed, else return self"""
+
+        if self.returncode != 0:
+            raise CommandError("%s exited with status %d" % (command_line(self.args), self.returncode), self)
+
+        return self
+
+    def __repr__(self):
+        return "CommandResult(%s, returncode=%s, duration=%.3f)" % (command_line(self.args), self.returncode,
+                                                                   self.duration)
+
+
+class CommandError(Exception):
+    """Command could not be started, failed, timed out or was cancelled
+
+    result is the CommandResult with any output collected before the
+    failure, or None if the command never started."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+    @property
+    def output(self):
+        return self.result.stdout if self.result is not None else ""
+
+
+class CommandTimeout(CommandError):
+    """Command was killed after its timeout"""
+    pass
+
+
+class CommandCancelled(CommandError):
+    """Command was killed because it was cancelled"""
+    pass
+
+
+class _Limiter(object):
+    """Process-wide limit on concurrently running commands
+
+    Usable from threads (acquire) and coroutines (acquire_async)."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self.condition = threading.Condition()
+
+    def try_acquire(self):
+        with self.condition:
+            if self.running < self.limit:
+                self.running += 1
+                return True
+            return False
+
+    def acquire(self, cancel_event=None):
+        with self.condition:
+            while self.running >= self.limit:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                self.condition.wait(poll_interval if cancel_event is not None else None)
+            self.running += 1
+            return True
+
+    async def acquire_async(self):
+        while not self.try_acquire():
+            await asyncio.sleep(poll_interval)
+
+    def release(self):
+        with self.condition:
+            self.running -= 1
+            self.condition.notify()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def _settings():
+    cfg = config.GfxConfig.create()
+    return cfg.command_timeout, cfg.max_concurrent_commands
+
+
+def limiter():
+    """Return the process-wide concurrency limiter"""
+
+    global _limiter
+
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = _Limiter(max(1, _settings()[1]))
+
+    return _limiter
+
+
+def set_max_concurrent(limit):
+    """Change the process-wide concurrency limit"""
+    limiter().limit = max(1, limit)
+
+
+def command_args(args):
+    """Return args as an argument list. Strings are split as by a shell,
+    but no shell is started, so pipes, redirects and variables are not
+    interpreted."""
+
+    if isinstance(args, str):
+        return shlex.split(args)
+    else:
+        return [str(arg) for arg in args]
+
+
+def command_line(args):
+    """Return args as a printable command line"""
+
+    if isinstance(args, str):
+        return args
+    else:
+        return " ".join([shlex.quote(str(arg)) for arg in args])
+
+
+def _timeout(timeout):
+    if timeout is None:
+        return _settings()[0]
+    else:
+        return timeout
+
+
+def _environment(env):
+    if env is None:
+        return None
+
+    environment = dict(os.environ)
+    environment.update(env)
+
+    return environment
+
+
+def _record(args, start_time, result=None, error=None):
+    """Add a finished command to the command statistics"""
+
+    if error is not None:
+        result = error.result
+        if isinstance(error, CommandTimeout):
+            outcome = "timeout"
+        elif isinstance(error, CommandCancelled):
+            outcome = "cancelled"
+        elif result is None:
+            outcome = "error"
+        else:
+            outcome = "failed"
+    else:
+        outcome = "ok" if result.ok else "failed"
+
+    duration = result.duration if result is not None else time.time() - start_time
+    output_size = len(result.stdout) if result is not None and result.stdout is not None else 0
+
+    command_stats.CommandStats.shared().record(args, duration, outcome, output_size)
+
+
+def run(args, input=None, timeout=None, check=False, merge_stderr=False, env=None, cwd=None, cancel_event=None):
+    """Run a command and return its CommandResult
+
+    timeout is in seconds, None uses the configured default and 0
+    disables it. env entries are added to the current environment."""
+
+    args = command_args(args)
+    start_time = time.time()
+
+    try:
+        result = _run(args, input, _timeout(timeout), merge_stderr, env, cwd, cancel_event)
+    except CommandError as e:
+        _record(args, start_time, error=e)
+        raise
+
+    _record(args, start_time, result)
+
+    if check:
+        result.check()
+
+    return result
+
+
+def _run(args, input, timeout, merge_stderr, env, cwd, cancel_event):
+    if not limiter().acquire(cancel_event):
+        raise CommandCancelled("%s cancelled" % command_line(args))
+
+    try:
+        start_time = time.time()
+
+        try:
+            process = subprocess.Popen(args, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+                                       env=_environment(env), cwd=cwd, universal_newlines=True)
+        except OSError as e:
+            raise CommandError("%s could not be started: %s" % (command_line(args), e))
+
+        deadline = start_time + timeout if timeout > 0 else None
+        stdout = None
+        stderr = None
+
+        try:
+            while True:
+                wait = None
+
+                if cancel_event is not None:
+                    wait = poll_interval
+
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.time())
+                    wait = remaining if wait is None else min(wait, remaining)
+
+                try:
+                    stdout, stderr = process.communicate(input, timeout=wait)
+                    break
+                except subprocess.TimeoutExpired:
+                    input = None
+
+                if cancel_event is not None and cancel_event.is_set():
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                    raise CommandCancelled("%s cancelled" % command_line(args),
+                                           CommandResult(args, process.returncode, stdout, stderr or "",
+                                                         time.time() - start_time))
+
+                if deadline is not None and time.time() >= deadline:
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                    raise CommandTimeout("%s timed out after %g s" % (command_line(args), timeout),
+                                         CommandResult(args, process.returncode, stdout, stderr or "",
+                                                       time.time() - start_time))
+        except BaseException:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            raise
+
+        result = CommandResult(args, process.returncode, stdout, stderr or "", time.time() - start_time)
+    finally:
+        limiter().release()
+
+    return result
+
+
+async def run_async(args, input=None, timeout=None, check=False, merge_stderr=False, env=None, cwd=None):
+    """Coroutine version of run(). Cancelling the task kills the process."""
+
+    args = command_args(args)
+    start_time = time.time()
+
+    try:
+        result = await _run_async(args, input, _timeout(timeout), merge_stderr, env, cwd)
+    except CommandError as e:
+        _record(args, start_time, error=e)
+        raise
+    except asyncio.CancelledError:
+        _record(args, start_time, error=CommandCancelled("%s cancelled" % command_line(args)))
+        raise
+
+    _record(args, start_time, result)
+
+    if check:
+        result.check()
+
+    return result
+
+
+async def _run_async(args, input, timeout, merge_stderr, env, cwd):
+    await limiter().acquire_async()
+
+    try:
+        start_time = time.time()
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args, stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+                env=_environment(env), cwd=cwd)
+        except OSError as e:
+            raise CommandError("%s could not be started: %s" % (command_line(args), e))
+
+        data = input.encode("utf-8") if input is not None else None
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise CommandTimeout("%s timed out after %g s" % (command_line(args), timeout),
+                                 CommandResult(args, process.returncode, "", "", time.time() - start_time))
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+        result = CommandResult(args, process.returncode,
+                               stdout.decode("utf-8", "replace"),
+                               stderr.decode("utf-8", "replace") if stderr is not None else "",
+                               time.time() - start_time)
+    finally:
+        limiter().release()
+
+    return result
+
+
+def run_concurrently(commands, timeout=None, check=False):
+    """Run independent commands in parallel and return their results in order
+
+    Failed commands are returned as CommandError instances. Must not be
+    called from a running asyncio event loop."""
+
+    async def run_all():
+        return await asyncio.gather(*[run_async(args, timeout=timeout, check=check) for args in commands],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run_all())
+
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, CommandError):
+            raise result
+
+    return results
+
+
+class _CountingReader(object):
+    """Text stream wrapper counting the characters read"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        return data
+
+    def readline(self, size=-1):
+        line = self.stream.readline(size)
+        self.size += len(line)
+        return line
+
+    def __iter__(self):
+        for line in self.stream:
+            self.size += len(line)
+            yield line
+
+
+@contextlib.contextmanager
+def open_output(args, timeout=None, env=None):
+    """Run a command and yield its stdout as a text stream
+
+    Allows the output to be parsed while it is read. The process is
+    killed if it runs longer than timeout. On exit CommandTimeout is
+    raised if the command timed out and CommandError if it failed."""
+
+    args = command_args(args)
+    timeout = _timeout(timeout)
+
+    limiter().acquire()
+
+    try:
+        start_time = time.time()
+
+        try:
+            process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, env=_environment(env), universal_newlines=True)
+        except OSError as e:
+            error = CommandError("%s could not be started: %s" % (command_line(args), e))
+            _record(args, start_time, error=error)
+            raise error
+
+        stream = _CountingReader(process.stdout)
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout > 0 else None
+
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+
+        try:
+            yield stream
+
+            # Read the output left when the caller stopped early, e.g. at
+            # the end of a JSON array, so that the command doesn't fail
+            # with SIGPIPE when stdout is closed
+
+            while stream.read(65536) != "":
+                pass
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            try:
+                process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+                # Output isn't kept, only its size is recorded
+
+                result = CommandResult(args, process.returncode, "", "", time.time() - start_time)
+                command_stats.CommandStats.shared().record(
+                    args, result.duration, "timeout" if timed_out.is_set() else ("ok" if result.ok else "failed"),
+                    stream.size)
+
+        if timed_out.is_set():
+            raise CommandTimeout("%s timed out after %g s" % (command_line(args), timeout), result)
+
+        result.check()
+    finally:
+        limiter().release()
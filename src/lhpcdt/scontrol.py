@@ -0,0 +1,144 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+scontrol output parser
+
+Single-pass parser for the Key=Value output of scontrol show
+node/job/reservation/partition. A key is a word followed by = at the
+start of the line or after whitespace. Everything up to the next key is
+the value, so values containing = (CfgTRES=cpu=16,mem=94000M) or spaces
+(Reason=Not responding [slurm@2024-01-01T10:00:00]) are kept intact.
+Values starting with a double quote extend to the closing quote and
+are returned without the quotes. Runs of whitespace inside unquoted
+values are returned as a single space.
+
+Records are separated by newlines in one-liner (-o) output and by blank
+lines otherwise. Records are yielded one at a time, so output can be
+parsed while it is read from a pipe.
+"""
+
+import re
+import sys
+
+_key_re = re.compile(r'(?:^|(?<=\s))([A-Za-z][A-Za-z0-9_:./\-]*)=')
+
+
+def _value(text):
+    text = text.strip()
+
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1]
+    else:
+        return text
+
+
+def parse_line(text):
+    """Parse Key=Value pairs in text into a dict"""
+
+    # Fast path without quoted values: scan whitespace separated tokens.
+    # Tokens without a key continue the value of the previous key.
+
+    if '"' not in text:
+        record = {}
+        key = None
+
+        for token in text.split():
+            name, sep, value = token.partition("=")
+            if sep and name[:1].isalpha():
+                key = sys.intern(name)
+                record[key] = value
+            elif key is not None:
+                record[key] += " " + token
+
+        return record
+
+    record = {}
+    intern = sys.intern
+
+    key = None
+    value_start = 0
+    quote_end = -1
+
+    for match in _key_re.finditer(text):
+
+        # Ignore keys inside a quoted value
+
+        if match.start() < quote_end:
+            continue
+
+        if key is not None:
+            record[key] = _value(text[value_start:match.start()])
+
+        key = intern(match.group(1))
+        value_start = match.end()
+
+        if text.startswith('"', value_start):
+            quote_end = text.find('"', value_start + 1) + 1
+            if quote_end == 0:
+                quote_end = len(text)
+
+    if key is not None:
+        record[key] = _value(text[value_start:])
+
+    return record
+
+
+def _record_text(lines, multiline):
+    if multiline:
+        block = []
+        for line in lines:
+            if line.strip() == "":
+                if len(block) > 0:
+                    yield " ".join(block)
+                    block = []
+            else:
+                block.append(line.strip())
+        if len(block) > 0:
+            yield " ".join(block)
+    else:
+        for line in lines:
+            if line.strip() != "":
+                yield line
+
+
+def iter_records(output, multiline=False):
+    """Yield one dict per record in scontrol output
+
+    output can be a string or an iterable of lines, e.g. a pipe. Set
+    multiline for output without -o, where records span several lines."""
+
+    if isinstance(output, str):
+        output = output.split("\n")
+
+    for text in _record_text(output, multiline):
+        record = parse_line(text)
+        if len(record) > 0:
+            yield record
+
+
+def records_by_key(output, key, multiline=False):
+    """Return dict of key value -> record, with key removed from the records"""
+
+    records = {}
+
+    for record in iter_records(output, multiline):
+        if key in record:
+            records[record.pop(key)] = record
+
+    return records
@@ -28,6 +28,7 @@ class RunScript:
         ##LDT part_disable = "yes"
         ##LDT feature_disable = "yes"
         ##LDT direct_launch = "yes"
+        ##LDT speculative = "yes"
         ##LDT icon = "system-icon"
 
         self.__variables = {}
@@ -81,6 +82,10 @@ class RunScript:
             if self.__variables["feature_disable"] == "yes":
                 cmd_options += ' --feature-disable'
 
+        if "speculative" in self.__variables:
+            if self.__variables["speculative"] == "yes":
+                cmd_options += ' --speculative'
+
         if "no_launcher" in self.__variables:
             if self.__variables["no_launcher"] == "yes":
                 self.__no_launcher = True
@@ -0,0 +1,348 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+SLURM JSON output module
+
+Streaming decoder and mappers for the --json output of squeue, scontrol
+and sacct. The decoder yields the elements of a top-level array (e.g.
+"jobs") one at a time while reading from a pipe, so full-cluster dumps
+are never held in memory both as text and as decoded objects.
+
+The mappers convert decoded elements to the values printed by the text
+tools, so that lrms builds identical data structures from both outputs.
+Both the older (v0.0.37/38) and newer (v0.0.39+) data parser layouts are
+handled: numbers may be plain or {"set", "infinite", "number"} objects
+and states may be strings or lists of flags.
+"""
+
+import re
+import json
+import time
+import datetime
+
+from lhpcdt import queue_snapshot
+
+_ws_re = re.compile(r'[\s,]*')
+
+
+def iter_array(stream, key, chunk_size=65536):
+    """Yield the elements of the JSON array stored under key in stream
+
+    stream is a text file-like object. Only the current chunk and the
+    element being decoded are kept in memory."""
+
+    decoder = json.JSONDecoder()
+    start_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    # Find the start of the array
+
+    buffer = ""
+
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+
+        match = start_re.search(buffer)
+
+        if match is not None:
+            pos = match.end()
+            break
+
+        if chunk == "":
+            return
+
+        # Keep enough text to match a key split across chunks
+
+        buffer = buffer[-(len(key) + 16):]
+
+    # Decode elements one by one
+
+    eof = False
+
+    while True:
+        pos = _ws_re.match(buffer, pos).end()
+
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+
+        try:
+            if pos == len(buffer):
+                raise ValueError("need more data")
+            element, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise ValueError("truncated JSON array %s" % key)
+            chunk = stream.read(chunk_size)
+            eof = (chunk == "")
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield element
+
+
+def number(value, default=None):
+    """Return value as int, None if unset and -1 for infinite"""
+
+    if isinstance(value, dict):
+        if value.get("infinite", False):
+            return -1
+        if not value.get("set", True):
+            return default
+        value = value.get("number", default)
+
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def flags(value, separator="+"):
+    """Return a state/flag list or string as printed by the text tools"""
+
+    if isinstance(value, list):
+        return separator.join([str(item) for item in value])
+    elif value is None:
+        return ""
+    else:
+        return str(value)
+
+
+def text(value, empty="(null)"):
+    """Return a string value, using empty for missing values"""
+
+    if isinstance(value, list):
+        value = ",".join([str(item) for item in value])
+
+    if value is None or value == "":
+        return empty
+    else:
+        return str(value)
+
+
+def timestamp(value, empty="N/A"):
+    """Return an epoch time as a local ISO time string"""
+
+    seconds = number(value)
+
+    if seconds is None or seconds <= 0:
+        return empty
+    else:
+        return datetime.datetime.fromtimestamp(seconds).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def duration(seconds):
+    """Return seconds as a SLURM duration string"""
+
+    if seconds is None:
+        return "INVALID"
+    elif seconds == -1:
+        return "UNLIMITED"
+    else:
+        return queue_snapshot.format_duration(max(0, seconds))
+
+
+def queue_fields(job, now=None):
+    """Return squeue --json job as the fields of lrms.Queue.squeueFormat"""
+
+    if now is None:
+        now = time.time()
+
+    state = flags(job.get("job_state", ""), "+").split("+")[0]
+
+    time_limit = number(job.get("time_limit"))
+    if time_limit is not None and time_limit > 0:
+        time_limit = time_limit * 60
+
+    start_time = number(job.get("start_time"), 0)
+
+    if state in ["RUNNING", "COMPLETING", "SUSPENDED"] and start_time > 0:
+        elapsed = int(now - start_time)
+    else:
+        elapsed = 0
+
+    if time_limit is None or time_limit < 0:
+        time_left = time_limit
+    else:
+        time_left = max(0, time_limit - elapsed)
+
+    if state == "PENDING":
+        nodelist = "(%s)" % job.get("state_reason", "None")
+    else:
+        nodelist = job.get("nodes", "")
+
+    node_count = number(job.get("node_count"), 0)
+    cpus = number(job.get("cpus"), 0)
+
+    array_job_id = number(job.get("array_job_id"), 0)
+    array_task_id = number(job.get("array_task_id"))
+
+    if array_job_id and array_task_id is not None:
+        jobid = "%d_%d" % (array_job_id, array_task_id)
+    else:
+        jobid = str(number(job.get("job_id"), 0))
+
+    return [jobid,
+            job.get("partition", ""),
+            job.get("name", ""),
+            job.get("user_name", ""),
+            state,
+            duration(elapsed),
+            duration(time_limit),
+            str(node_count),
+            nodelist,
+            duration(time_left),
+            text(job.get("dependency")),
+            job.get("account", ""),
+            str(cpus),
+            text(job.get("features")),
+            timestamp(job.get("start_time"))]
+
+
+def node_record(node):
+    """Return scontrol show nodes --json node as scontrol key=value record"""
+
+    cpu_load = number(node.get("cpu_load"), 0)
+
+    record = {
+        "Arch": text(node.get("architecture")),
+        "CoresPerSocket": str(number(node.get("cores"), 0)),
+        "CPUAlloc": str(number(node.get("alloc_cpus"), 0)),
+        "CPUTot": str(number(node.get("cpus"), 0)),
+        "CPULoad": "%.2f" % (cpu_load / 100.0),
+        "AvailableFeatures": text(node.get("features")),
+        "ActiveFeatures": text(node.get("active_features")),
+        "Gres": text(node.get("gres")),
+        "NodeAddr": text(node.get("address")),
+        "NodeHostName": text(node.get("hostname")),
+        "OS": text(node.get("operating_system")),
+        "RealMemory": str(number(node.get("real_memory"), 0)),
+        "AllocMem": str(number(node.get("alloc_memory"), 0)),
+        "FreeMem": str(number(node.get("free_mem"), 0)),
+        "Sockets": str(number(node.get("sockets"), 0)),
+        "Boards": str(number(node.get("boards"), 0)),
+        "State": flags(node.get("state", "")),
+        "ThreadsPerCore": str(number(node.get("threads"), 0)),
+        "Weight": str(number(node.get("weight"), 0)),
+        "Partitions": text(node.get("partitions")),
+        "CfgTRES": text(node.get("tres"), ""),
+        "AllocTRES": text(node.get("tres_used"), "")
+    }
+
+    if node.get("reason", "") != "":
+        record["Reason"] = node["reason"]
+
+    return node.get("name", ""), record
+
+
+def partition_nodes(partition):
+    """Return name and node list of a scontrol show partitions --json partition"""
+
+    nodes = partition.get("nodes", "")
+
+    if isinstance(nodes, dict):
+        nodes = nodes.get("configured", "")
+
+    return partition.get("name", ""), nodes
+
+
+def reservation_record(reservation, now=None):
+    """Return scontrol show res --json reservation as scontrol key=value record"""
+
+    if now is None:
+        now = time.time()
+
+    start_time = number(reservation.get("start_time"), 0)
+    end_time = number(reservation.get("end_time"), 0)
+
+    if start_time <= now < end_time:
+        state = "ACTIVE"
+    else:
+        state = "INACTIVE"
+
+    return {
+        "ReservationName": reservation.get("name", ""),
+        "StartTime": timestamp(start_time),
+        "EndTime": timestamp(end_time),
+        "Duration": duration(max(0, end_time - start_time)),
+        "Nodes": text(reservation.get("node_list")),
+        "NodeCnt": str(number(reservation.get("node_count"), 0)),
+        "CoreCnt": str(number(reservation.get("core_count"), 0)),
+        "Features": text(reservation.get("features")),
+        "PartitionName": text(reservation.get("partition")),
+        "Flags": flags(reservation.get("flags", ""), ","),
+        "TRES": text(reservation.get("tres"), ""),
+        "Users": text(reservation.get("users")),
+        "Groups": text(reservation.get("groups")),
+        "Accounts": text(reservation.get("accounts")),
+        "Licenses": text(reservation.get("licenses")),
+        "State": state,
+        "BurstBuffer": text(reservation.get("burst_buffer")),
+        "Watts": text(reservation.get("watts"), "n/a")
+    }
+
+
+def _exit_code(exit_code):
+    if isinstance(exit_code, dict):
+        return_code = number(exit_code.get("return_code"), 0)
+        signal = exit_code.get("signal", {})
+        if isinstance(signal, dict):
+            signal = signal.get("id", signal.get("signal_id", 0))
+        return "%d:%d" % (return_code, number(signal, 0))
+    else:
+        return "%d:0" % number(exit_code, 0)
+
+
+def _state(state):
+    if isinstance(state, dict):
+        state = state.get("current", "")
+    return flags(state).split("+")[0]
+
+
+def accounting_entries(job):
+    """Return (jobid, step, state, exit code) tuples for a sacct --json job
+
+    Steps are named as in sacct -b output, the job allocation itself is
+    reported as step "first"."""
+
+    array = job.get("array", {})
+    array_job_id = number(array.get("job_id"), 0) if isinstance(array, dict) else 0
+    array_task_id = number(array.get("task_id")) if isinstance(array, dict) else None
+
+    if array_job_id and array_task_id is not None and array_task_id >= 0:
+        jobid = "%d_%d" % (array_job_id, array_task_id)
+    else:
+        jobid = str(number(job.get("job_id"), 0))
+
+    entries = [(jobid, "first", _state(job.get("state")), _exit_code(job.get("exit_code")))]
+
+    for step in job.get("steps", []):
+        step_id = step.get("step", {}).get("id", "")
+
+        if isinstance(step_id, dict):
+            step_id = step_id.get("step_id", "")
+
+        step_name = str(step_id).split(".")[-1]
+
+        entries.append((jobid, step_name, _state(step.get("state")), _exit_code(step.get("exit_code"))))
+
+    return entries
@@ -0,0 +1,430 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+slurmrestd client module
+
+Client for the slurmrestd REST API, used by lrms when backend = rest is
+set in the [slurm] section of the configuration. Connections are kept
+alive and pooled, so consecutive queries reuse an open connection instead
+of starting a SLURM client process each. slurmrestd can be reached over a
+Unix socket (unix:///run/slurmrestd.sock) or HTTP(S)
+(http://host:6820). A JWT in SLURM_JWT is sent with every request.
+
+slurmrestd uses the same data parsers as the --json output of the SLURM
+tools, so replies are decoded with slurm_json.
+"""
+
+import io
+import os
+import time
+import json
+import getpass
+import socket
+import threading
+import http.client
+import urllib.parse
+
+from lhpcdt import config
+from lhpcdt import slurm_json
+from lhpcdt import queue_snapshot
+from lhpcdt import command_stats
+
+
+class RestError(ValueError):
+    """Error reported by slurmrestd"""
+    pass
+
+
+# Exceptions raised by failed requests. Callers fall back to the SLURM tools.
+
+errors = (OSError, ValueError, http.client.HTTPException)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket"""
+
+    def __init__(self, socket_path, timeout=10.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+
+        self.sock = sock
+
+
+class RestClient(object):
+    """Pooled keep-alive client for slurmrestd"""
+
+    default_api_version = "v0.0.39"
+
+    __shared = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, url, api_version="", token=None, user=None, timeout=10.0, pool_size=4):
+        """Class constructor"""
+
+        parsed = urllib.parse.urlsplit(url)
+
+        self.url = url
+        self.scheme = parsed.scheme
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        if self.scheme == "unix":
+            self.socket_path = parsed.path
+            self.host = ""
+            self.port = None
+            self.base_path = ""
+        elif self.scheme in ["http", "https"]:
+            self.socket_path = ""
+            self.host = parsed.hostname
+            self.port = parsed.port
+            self.base_path = parsed.path.rstrip("/")
+        else:
+            raise ValueError("Unsupported slurmrestd URL %s" % url)
+
+        if api_version == "":
+            api_version = RestClient.default_api_version
+
+        self.api_version = api_version
+
+        if token is None:
+            token = os.environ.get("SLURM_JWT", "")
+
+        if user is None:
+            user = os.environ.get("SLURM_USER_NAME", getpass.getuser())
+
+        self.token = token
+        self.user = user
+
+        self.request_count = 0
+        self.connection_count = 0
+        self.verbose = False
+
+        self.lock = threading.Lock()
+        self.__idle = []
+
+    @classmethod
+    def shared(cls):
+        """Return the client configured in gfxlauncher.conf, None if the SLURM tools are used"""
+
+        cfg = config.GfxConfig.create()
+
+        if cfg.backend != "rest":
+            return None
+
+        if cfg.rest_url == "":
+            return None
+
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = RestClient(cfg.rest_url, cfg.rest_api_version)
+
+        return cls.__shared
+
+    def failed(self, path, error):
+        """Report a failed request. The caller falls back to the SLURM tools."""
+        print("slurmrestd request %s failed (%s), using SLURM tools." % (path, error))
+
+    def uses_plain_numbers(self):
+        """Return True if the API version encodes numbers without set/infinite objects"""
+        return self.api_version in ["v0.0.36", "v0.0.37", "v0.0.38"]
+
+    def number(self, value):
+        """Encode value for a numeric job property"""
+
+        if self.uses_plain_numbers():
+            return value
+        else:
+            return {"set": True, "infinite": False, "number": value}
+
+    def path(self, path, plugin="slurm"):
+        """Return request path of an endpoint, e.g. job/submit"""
+        return "%s/%s/%s/%s" % (self.base_path, plugin, self.api_version, path)
+
+    def headers(self, has_body=False):
+        """Return request headers"""
+
+        headers = {"Accept": "application/json"}
+
+        if has_body:
+            headers["Content-Type"] = "application/json"
+
+        if self.token != "":
+            headers["X-SLURM-USER-NAME"] = self.user
+            headers["X-SLURM-USER-TOKEN"] = self.token
+
+        return headers
+
+    def __connect(self):
+        if self.scheme == "unix":
+            connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        elif self.scheme == "https":
+            connection = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+        with self.lock:
+            self.connection_count += 1
+
+        return connection
+
+    def __acquire(self):
+        """Return an idle connection, or a new one, and whether it was reused"""
+
+        with self.lock:
+            if len(self.__idle) > 0:
+                return self.__idle.pop(), True
+
+        return self.__connect(), False
+
+    def __release(self, connection, response):
+        """Return connection to the pool if the response has been fully read"""
+
+        if response.isclosed() and not response.will_close:
+            with self.lock:
+                if len(self.__idle) < self.pool_size:
+                    self.__idle.append(connection)
+                    return
+
+        connection.close()
+
+    def close(self):
+        """Close all idle connections"""
+
+        with self.lock:
+            idle = self.__idle
+            self.__idle = []
+
+        for connection in idle:
+            connection.close()
+
+    def __send(self, method, path, body=None, plugin="slurm"):
+        """Send request and return (connection, response)
+
+        A pooled connection may have been closed by the server since it
+        was last used. The request is then retried on the next pooled
+        connection or a new one."""
+
+        url = self.path(path, plugin)
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = self.headers(data is not None)
+
+        while True:
+            connection, reused = self.__acquire()
+
+            try:
+                connection.request(method, url, body=data, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except:
+                connection.close()
+                raise
+
+            with self.lock:
+                self.request_count += 1
+
+            if self.verbose:
+                print("slurmrestd %s %s -> %d" % (method, url, response.status))
+
+            return connection, response
+
+    def __check(self, path, status, reply):
+        """Raise RestError if the request failed"""
+
+        messages = []
+
+        if isinstance(reply, dict):
+            for error in reply.get("errors", []):
+                if isinstance(error, dict):
+                    messages.append(error.get("description", "") or error.get("error", ""))
+                else:
+                    messages.append(str(error))
+
+        messages = [message for message in messages if message != ""]
+
+        if status >= 400 or len(messages) > 0:
+            if len(messages) == 0:
+                messages.append("HTTP status %d" % status)
+            raise RestError("%s: %s" % (path, "; ".join(messages)))
+
+    def __record(self, method, path, start_time, status, size=0):
+        """Add the request to the command statistics, grouped by method and endpoint"""
+
+        command_stats.CommandStats.shared().record(
+            [], time.time() - start_time, "ok" if status is not None and status < 400 else "failed", size,
+            name="slurmrestd %s %s" % (method, path if path == "job/submit" else path.split("/")[0]))
+
+    def request(self, method, path, body=None, plugin="slurm"):
+        """Send request and return the decoded reply"""
+
+        start_time = time.time()
+        status = None
+        data = b""
+
+        try:
+            connection, response = self.__send(method, path, body, plugin)
+
+            try:
+                data = response.read()
+                status = response.status
+            finally:
+                self.__release(connection, response)
+        finally:
+            self.__record(method, path, start_time, status, len(data))
+
+        reply = json.loads(data.decode("utf-8")) if len(data) > 0 else {}
+
+        self.__check(path, response.status, reply)
+
+        return reply
+
+    def iter_query(self, path, key, plugin="slurm"):
+        """Yield the elements of the array key of a GET reply
+
+        Elements are decoded while the reply is read, as for
+        lrms.OutputFormat.iter_query."""
+
+        start_time = time.time()
+        status = None
+
+        try:
+            connection, response = self.__send("GET", path, plugin=plugin)
+        except:
+            self.__record("GET", path, start_time, status)
+            raise
+
+        try:
+            status = response.status
+
+            if response.status >= 400:
+                data = response.read()
+                reply = json.loads(data.decode("utf-8")) if len(data) > 0 else {}
+                self.__check(path, response.status, reply)
+
+            stream = io.TextIOWrapper(response, encoding="utf-8")
+
+            for element in slurm_json.iter_array(stream, key):
+                yield element
+
+            # Read the rest of the reply so that the connection can be reused
+
+            stream.read()
+        finally:
+            self.__release(connection, response)
+            self.__record("GET", path, start_time, status)
+
+    def query(self, path, key, plugin="slurm"):
+        """Return the elements of the array key of a GET reply"""
+        return list(self.iter_query(path, key, plugin))
+
+    def job_properties(self, job, working_directory, environment):
+        """Return the job description of a jobs.Job for job/submit
+
+        slurmrestd doesn't read #SBATCH lines in the script, so the
+        options are taken from the job attributes."""
+
+        properties = {
+            "name": job.name,
+            "current_working_directory": working_directory,
+            "minimum_nodes": job.nodeCount if job.nodeCount > 0 else 1
+        }
+
+        if self.uses_plain_numbers():
+            properties["environment"] = dict(environment)
+        else:
+            properties["environment"] = ["%s=%s" % (name, value) for name, value in environment.items()]
+
+        if job.account != "":
+            properties["account"] = job.account
+
+        if job.submitNode:
+            properties["required_nodes"] = [job.node]
+        elif job.partition != "":
+            properties["partition"] = job.partition
+
+        if job.reservation != "":
+            properties["reservation"] = job.reservation
+
+        if job.output != "":
+            properties["standard_output"] = job.output
+
+        if job.tasksPerNode >= 0:
+            properties["tasks_per_node"] = job.tasksPerNode
+
+        time_limit = queue_snapshot.parse_duration(job.time)
+
+        if time_limit >= 0:
+            properties["time_limit"] = self.number(max(1, time_limit // 60))
+
+        if job.gres != "":
+            properties["tres_per_node"] = "gres/%s" % job.gres
+
+        if job.memory > 0:
+            properties["memory_per_node"] = self.number(job.memory)
+
+        if job.exclusive:
+            properties["shared"] = ["none"] if not self.uses_plain_numbers() else "none"
+
+        if job.oversubscribe:
+            properties["shared"] = ["oversubscribe"] if not self.uses_plain_numbers() else "oversubscribe"
+
+        if len(job.constraints) > 0:
+            properties["constraints"] = "&".join(job.constraints)
+
+        return properties
+
+    def submit(self, script, properties):
+        """Submit a batch script and return the job id"""
+
+        reply = self.request("POST", "job/submit", {"script": script, "job": properties})
+
+        job_id = reply.get("job_id", None)
+
+        if job_id is None:
+            job_id = reply.get("result", {}).get("job_id", None)
+
+        if job_id is None:
+            raise RestError("job/submit: no job id in reply")
+
+        return int(job_id)
+
+    def cancel(self, jobid):
+        """Cancel job"""
+        self.request("DELETE", "job/%s" % jobid)
+
+    def job(self, jobid):
+        """Return the slurmctld records of a job (one per array task)"""
+        return self.query("job/%s" % jobid, "jobs")
+
+    def accounting_job(self, jobid):
+        """Return the slurmdbd records of a job"""
+        return self.query("job/%s" % jobid, "jobs", plugin="slurmdb")
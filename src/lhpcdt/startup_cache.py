@@ -0,0 +1,148 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Startup cache module
+
+Implements a persistent per-user cache for the SLURM queries needed
+to populate the launcher window (partitions, features, projects and
+reservations). Entries are returned even when stale so that the
+launcher can show immediately and revalidate in the background.
+"""
+
+import os
+import json
+import time
+import getpass
+
+
+class StartupCache(object):
+    """Persistent per-user cache of launcher startup queries"""
+
+    default_ttls = {
+        "partitions": 3600,
+        "cluster_index": 3600,
+        "projects": 1800,
+        "reservations": 300
+    }
+
+    def __init__(self, cache_dir="", user="", ttls={}):
+        """Class constructor"""
+
+        if cache_dir == "":
+            if "XDG_CACHE_HOME" in os.environ:
+                cache_dir = os.path.join(os.environ["XDG_CACHE_HOME"], "lhpcdt")
+            else:
+                cache_dir = os.path.join(os.path.expanduser("~"), ".lhpc", "cache")
+
+        if user == "":
+            user = getpass.getuser()
+
+        self.cache_dir = cache_dir
+        self.filename = os.path.join(self.cache_dir, "startup-%s.json" % user)
+        self.ttls = dict(StartupCache.default_ttls)
+        self.ttls.update(ttls)
+        self.entries = {}
+        self.verbose = False
+
+    def load(self):
+        """Load cache from disk. A missing or broken cache is treated as empty."""
+
+        self.entries = {}
+
+        if not os.path.exists(self.filename):
+            return False
+
+        try:
+            with open(self.filename, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print("Couldn't read startup cache %s: %s" % (self.filename, e))
+            self.entries = {}
+            return False
+
+        return True
+
+    def save(self):
+        """Write cache to disk atomically"""
+
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir, mode=0o700)
+
+            tmp_filename = "%s.%d.tmp" % (self.filename, os.getpid())
+
+            with open(tmp_filename, "w") as f:
+                json.dump(self.entries, f)
+
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            print("Couldn't write startup cache %s: %s" % (self.filename, e))
+            return False
+
+        return True
+
+    def has(self, source, key=""):
+        """Return True if source is cached with a matching key"""
+
+        return (source in self.entries) and (self.entries[source].get("key", "") == key)
+
+    def get(self, source, key="", default=None):
+        """Return cached value for source, even if stale"""
+
+        if self.has(source, key):
+            return self.entries[source]["value"]
+        else:
+            return default
+
+    def age(self, source):
+        """Return age of cached source in seconds"""
+
+        if source in self.entries:
+            return time.time() - self.entries[source]["time"]
+        else:
+            return -1
+
+    def is_fresh(self, source, key=""):
+        """Return True if source is cached and within its TTL"""
+
+        if not self.has(source, key):
+            return False
+
+        return self.age(source) < self.ttls.get(source, 0)
+
+    def set(self, source, value, key=""):
+        """Store value for source. Returns True if the value changed."""
+
+        changed = not self.has(source, key) or (self.entries[source]["value"] != value)
+
+        self.entries[source] = {"time": time.time(), "key": key, "value": value}
+
+        return changed
+
+    def invalidate(self, source=None):
+        """Remove source (or all sources) from cache"""
+
+        if source is None:
+            self.entries = {}
+        elif source in self.entries:
+            if self.verbose:
+                print("Invalidating cached %s" % source)
+            del self.entries[source]
+
+        self.save()
@@ -0,0 +1,249 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Shared SLURM state daemon (lhpcdt-stated)
+
+Polls SLURM once per interval on a login node and serves the queue,
+node and job status snapshots to all local lrms clients over a Unix
+socket. Requests and replies are single JSON lines:
+
+    {"query": "queue", "user": ...}  -> squeue output (lrms.Queue format), optionally
+                                        filtered on user, state, partition and account
+    {"query": "nodes"}               -> scontrol show nodes -o output
+    {"query": "jobs", "jobids": [...]} -> status lines for pending/running jobs
+    {"query": "status"}              -> daemon statistics
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import socketserver
+
+from lhpcdt import lrms
+from lhpcdt import runner
+
+
+class StateSnapshot(object):
+    """SLURM state polled by the daemon"""
+
+    job_status_format = lrms.JobStatusService.squeue_format
+
+    def __init__(self):
+        """Class constructor"""
+        self.lock = threading.Lock()
+        self.queue = lrms.Queue()
+        self.time = 0.0
+        self.queue_output = ""
+        self.nodes_output = ""
+        self.job_status = {}
+        self.poll_count = 0
+        self.poll_duration = 0.0
+
+    def poll(self):
+        """Query SLURM and replace the current snapshot"""
+
+        start_time = time.time()
+
+        # The three queries are independent and run concurrently
+
+        results = runner.run_concurrently([
+            ["squeue", "--noheader", "--format=%s" % self.queue.squeueFormat],
+            ["scontrol", "show", "nodes", "-o"],
+            ["squeue", "-t", "PD,R", "-h", "-o", StateSnapshot.job_status_format]])
+
+        for result in results:
+            if isinstance(result, runner.CommandError):
+                print(result)
+
+        queue_output, nodes_output, status_output = [
+            result.output if isinstance(result, runner.CommandError) else result.stdout for result in results]
+
+        job_status = {}
+
+        for line in status_output.split("\n"):
+            items = line.strip().split(";", 1)
+            if len(items) == 2:
+                job_status[items[0]] = items[1]
+
+        with self.lock:
+            self.queue_output = queue_output
+            self.nodes_output = nodes_output
+            self.job_status = job_status
+            self.time = time.time()
+            self.poll_count += 1
+            self.poll_duration = self.time - start_time
+
+    def reply(self, request):
+        """Return reply for a client request"""
+
+        query = request.get("query", "")
+
+        with self.lock:
+            reply = {"ok": True, "time": self.time}
+
+            if self.time == 0.0:
+                reply = {"ok": False, "error": "no snapshot available"}
+            elif query == "queue":
+                reply["output"] = self.queue.filter_output(
+                    self.queue_output, request.get("user", ""), request.get("state", ""),
+                    request.get("partition", ""), request.get("account", ""))
+            elif query == "nodes":
+                reply["output"] = self.nodes_output
+            elif query == "jobs":
+                reply["output"] = {}
+                for jobid in request.get("jobids", []):
+                    if str(jobid) in self.job_status:
+                        reply["output"][str(jobid)] = self.job_status[str(jobid)]
+            elif query == "status":
+                reply["poll_count"] = self.poll_count
+                reply["poll_duration"] = self.poll_duration
+                reply["jobs"] = len(self.job_status)
+            else:
+                reply = {"ok": False, "error": "unknown query %s" % query}
+
+        return reply
+
+
+class StateRequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single client request"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            reply = self.server.snapshot.reply(request)
+        except ValueError:
+            reply = {"ok": False, "error": "invalid request"}
+
+        try:
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+        except OSError:
+            pass
+
+
+class StateServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server for SLURM state snapshots"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, snapshot):
+        self.snapshot = snapshot
+        socketserver.UnixStreamServer.__init__(self, socket_path, StateRequestHandler)
+
+
+class StateDaemon(object):
+    """Polls SLURM and serves snapshots to local clients"""
+
+    def __init__(self, socket_path=lrms.StateClient.default_socket, interval=15.0):
+        """Class constructor"""
+        self.socket_path = socket_path
+        self.interval = interval
+        self.snapshot = StateSnapshot()
+        self.server = None
+        self.verbose = False
+        self.__stop_event = threading.Event()
+
+    def poll_loop(self):
+        """Poll SLURM every interval until stopped. The first poll is made
+        by start()."""
+
+        while not self.__stop_event.wait(self.interval):
+            try:
+                self.snapshot.poll()
+                if self.verbose:
+                    print("Polled SLURM in %.2f s (%d jobs)" % (self.snapshot.poll_duration, len(self.snapshot.job_status)))
+            except Exception as e:
+                print("Failed to poll SLURM: %s" % e)
+
+    def start(self):
+        """Create socket and start polling"""
+
+        socket_dir = os.path.dirname(self.socket_path)
+
+        if socket_dir != "" and not os.path.exists(socket_dir):
+            os.makedirs(socket_dir, mode=0o755)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.server = StateServer(self.socket_path, self.snapshot)
+        os.chmod(self.socket_path, 0o666)
+
+        # Make sure clients get a snapshot on the first request
+
+        self.snapshot.poll()
+
+        poll_thread = threading.Thread(target=self.poll_loop, daemon=True)
+        poll_thread.start()
+
+    def serve_forever(self):
+        """Serve client requests until shutdown() is called"""
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Stop polling and serving requests"""
+
+        self.__stop_event.set()
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Shared SLURM state daemon for LUNARC HPC Desktop")
+
+    parser.add_argument("--socket", dest="socket_path", action="store",
+                        default=os.environ.get("LHPCDT_STATE_SOCKET", lrms.StateClient.default_socket),
+                        help="Unix socket to serve snapshots on.")
+
+    parser.add_argument("--interval", dest="interval", action="store", type=float, default=15.0,
+                        help="Seconds between SLURM polls.")
+
+    parser.add_argument("--verbose", dest="verbose", action="store_true", default=False,
+                        help="Print poll statistics.")
+
+    args = parser.parse_args()
+
+    daemon = StateDaemon(args.socket_path, args.interval)
+    daemon.verbose = args.verbose
+    daemon.start()
+
+    print("Serving SLURM state on %s (interval %.1f s)" % (args.socket_path, args.interval))
+
+    def on_signal(signum, frame):
+        threading.Thread(target=daemon.shutdown).start()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    daemon.serve_forever()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Telemetry module
+
+Streams CPU, memory and GPU usage from a node. A small sh agent is sent
+over ssh (through the master connection of remote.ConnectionManager) and
+prints one JSON line per sample on a single long-lived channel:
+
+    {"time": 1718000000, "cpu_usage": 12, "mem_total_kb": 98304000,
+     "mem_available_kb": 91234000, "gpu_usage": [0, 87]}
+
+CPU usage is computed from the difference between two reads of
+/proc/stat, memory from /proc/meminfo and GPU usage with nvidia-smi in
+query mode. The agent exits when the channel is closed.
+
+RingBuffer keeps a fixed number of samples of a metric for plotting.
+"""
+
+import json
+import array
+import threading
+import subprocess
+
+from lhpcdt import remote
+from lhpcdt import command_stats
+
+agent_script = r"""
+interval=${1:-2}
+prev=""
+while :; do
+    cur=$(awk '/^cpu / {print $2+$3+$4+$7+$8+$9, $2+$3+$4+$5+$6+$7+$8+$9}' /proc/stat)
+    cpu=-1
+    if [ -n "$prev" ]; then
+        cpu=$(echo "$prev $cur" | awk '{ if ($4 > $2) print int(100 * ($3 - $1) / ($4 - $2) + 0.5); else print 0 }')
+    fi
+    prev=$cur
+    mem=$(awk '/^MemTotal:/ {t = $2} /^MemAvailable:/ {a = $2} END {print t + 0, a + 0}' /proc/meminfo)
+    gpus=$(nvidia-smi --query-gpu=utilization.gpu --format=csv,noheader,nounits 2>/dev/null | awk '{printf "%s%d", (n++ ? ", " : ""), $1}')
+    printf '{"time": %s, "cpu_usage": %s, "mem_total_kb": %s, "mem_available_kb": %s, "gpu_usage": [%s]}\n' \
+        "$(date +%s)" "$cpu" ${mem% *} ${mem#* } "$gpus" || exit 0
+    sleep "$interval"
+done
+"""
+
+
+class RingBuffer(object):
+    """Fixed-size buffer of the latest values of a metric"""
+
+    def __init__(self, size):
+        """Class constructor"""
+
+        self.size = size
+        self.data = array.array("d", [0.0] * size)
+        self.count = 0
+        self.start = 0
+
+    def append(self, value):
+        """Add a value, replacing the oldest when the buffer is full"""
+
+        if self.count < self.size:
+            self.data[(self.start + self.count) % self.size] = value
+            self.count += 1
+        else:
+            self.data[self.start] = value
+            self.start = (self.start + 1) % self.size
+
+    def values(self):
+        """Return the values from the oldest to the latest"""
+
+        end = self.start + self.count
+
+        if end <= self.size:
+            return self.data[self.start:end].tolist()
+
+        return self.data[self.start:].tolist() + self.data[:end - self.size].tolist()
+
+    def last(self, default=0.0):
+        if self.count == 0:
+            return default
+
+        return self.data[(self.start + self.count - 1) % self.size]
+
+    def __len__(self):
+        return self.count
+
+
+def sample_record(sample, node):
+    """Convert an agent sample to a remote.StatusProbe record"""
+
+    total = int(round(sample["mem_total_kb"] / (1024 * 1024)))
+    used = int(round((sample["mem_total_kb"] - sample["mem_available_kb"]) / (1024 * 1024)))
+
+    return {
+        "hostname": node,
+        "cpu_usage": sample["cpu_usage"],
+        "total_mem": total,
+        "free_mem": total - used,
+        "used_mem": used,
+        "gpu_usage": sample["gpu_usage"],
+        "error": ""
+    }
+
+
+class TelemetryStream(object):
+    """Telemetry agent running on a node"""
+
+    def __init__(self, node, interval=2.0, local_exec=False):
+        """Class constructor"""
+
+        self.node = node
+        self.interval = interval
+        self.local_exec = local_exec
+        self.process = None
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the agent. Returns False if it couldn't be started."""
+
+        if self.local_exec:
+            args = ["/bin/sh", "-s", "--", str(self.interval)]
+        else:
+            connections = remote.ConnectionManager.shared()
+            connections.open(self.node)
+            args = ["ssh", "-T"] + connections.options(self.node) + [self.node, "sh", "-s", "--", str(self.interval)]
+
+        try:
+            process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True)
+            process.stdin.write(agent_script)
+            process.stdin.close()
+        except OSError as e:
+            print("Couldn't start telemetry agent on %s: %s" % (self.node, e))
+            return False
+
+        with self.lock:
+            if self.stopped:
+                process.terminate()
+                return False
+            self.process = process
+
+        command_stats.CommandStats.shared().record([], 0.0, name="telemetry session")
+
+        return True
+
+    def samples(self):
+        """Yield samples as dicts until the agent exits or stop() is called"""
+
+        with self.lock:
+            process = self.process
+
+        if process is None:
+            return
+
+        for line in process.stdout:
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                continue
+
+            # The first sample has no CPU usage, as it needs two reads of
+            # /proc/stat
+
+            if sample["cpu_usage"] >= 0:
+                yield sample
+
+        process.wait()
+
+    def stop(self):
+        """Stop the agent, which closes the channel"""
+
+        with self.lock:
+            process = self.process
+            self.process = None
+            self.stopped = True
+
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def is_active(self):
+        with self.lock:
+            return self.process is not None and self.process.poll() is None
@@ -0,0 +1,280 @@
+#!/bin/env python
+#
+# LUNARC HPC Desktop On-Demand graphical launch tool
+# Copyright (C) 2017-2025 LUNARC, Lund University
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Warm pool module
+
+Keeps placeholder job allocations alive after the application using them
+has exited, so that a later launch with the same partition, account,
+features and resources can attach to the allocation instead of waiting
+in the queue again.
+
+Idle allocations are registered per user in warm-pool-<user>.json in the
+startup cache directory. A launch takes a compatible allocation out of
+the registry and hands it back when its application exits. Allocations
+idle for longer than warm_pool_idle_timeout seconds are cancelled by a
+detached reaper process (python -m lhpcdt.warm_pool --reap), started
+when an allocation is handed back, and by launchers starting while the
+pool is not empty.
+
+The pool is enabled with warm_pool = yes in the [slurm] section of the
+configuration.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import getpass
+import argparse
+import subprocess
+import contextlib
+
+from lhpcdt import config
+from lhpcdt import jobs
+from lhpcdt import queue_snapshot
+
+
+def resource_key(job):
+    """Return the properties an allocation must match to be reused"""
+
+    return {
+        "partition": job.partition,
+        "account": job.account,
+        "reservation": job.reservation,
+        "constraints": sorted(job.constraints),
+        "node_count": job.nodeCount,
+        "tasks_per_node": job.tasksPerNode,
+        "memory": job.memory,
+        "exclusive": job.exclusive,
+        "gres": job.gres
+    }
+
+
+class WarmPool(object):
+    """Per-user registry of idle allocations"""
+
+    def __init__(self, pool_dir="", user="", idle_timeout=600, min_time=900):
+        """Class constructor"""
+
+        if pool_dir == "":
+            if "XDG_CACHE_HOME" in os.environ:
+                pool_dir = os.path.join(os.environ["XDG_CACHE_HOME"], "lhpcdt")
+            else:
+                pool_dir = os.path.join(os.path.expanduser("~"), ".lhpc", "cache")
+
+        if user == "":
+            user = getpass.getuser()
+
+        self.pool_dir = pool_dir
+        self.filename = os.path.join(self.pool_dir, "warm-pool-%s.json" % user)
+        self.reaper_lock_filename = os.path.join(self.pool_dir, "warm-pool-%s.reaper" % user)
+        self.idle_timeout = idle_timeout
+        self.min_time = min_time
+
+    @classmethod
+    def create(cls):
+        """Return a pool configured from the launcher configuration, or None
+        if the pool is disabled"""
+
+        cfg = config.GfxConfig.create()
+
+        if not cfg.warm_pool:
+            return None
+
+        return WarmPool(idle_timeout=cfg.warm_pool_idle_timeout, min_time=cfg.warm_pool_min_time)
+
+    @contextlib.contextmanager
+    def entries(self):
+        """Lock the registry and yield its entries, which are written back
+        when the block exits"""
+
+        if not os.path.exists(self.pool_dir):
+            os.makedirs(self.pool_dir, mode=0o700, exist_ok=True)
+
+        with open(self.filename + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            entries = {}
+
+            try:
+                with open(self.filename, "r") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+
+            yield entries
+
+            tmp_filename = "%s.%d.tmp" % (self.filename, os.getpid())
+
+            with open(tmp_filename, "w") as f:
+                json.dump(entries, f)
+
+            os.replace(tmp_filename, self.filename)
+
+    def is_empty(self):
+        """Return True if no allocations are registered. The registry is
+        read without locking, so the result is only a hint."""
+
+        try:
+            with open(self.filename, "r") as f:
+                return len(json.load(f)) == 0
+        except (OSError, ValueError):
+            return True
+
+    def release(self, job):
+        """Hand an allocation back to the pool after its application exited"""
+
+        with self.entries() as entries:
+            entries[str(job.id)] = {
+                "key": resource_key(job),
+                "nodes": job.nodes,
+                "time": job.time,
+                "released": time.time()
+            }
+
+        print("Session %d kept for %d seconds for later launches." % (job.id, self.idle_timeout))
+
+    def acquire(self, job, slurm):
+        """Attach job to a compatible idle allocation
+
+        On success job.id and job.nodes refer to the allocation and True is
+        returned. Allocations that have ended are removed. Allocations
+        whose status couldn't be queried are left to the reaper."""
+
+        # The allocation must last for the requested walltime, and at
+        # least min_time
+
+        key = resource_key(job)
+        needed = max(queue_snapshot.parse_duration(job.time), self.min_time)
+
+        with self.entries() as entries:
+            for job_id, entry in sorted(entries.items(), key=lambda item: -item[1]["released"]):
+                if entry["key"] != key:
+                    continue
+
+                allocation = jobs.Job()
+                allocation.id = int(job_id)
+
+                slurm.job_status(allocation)
+
+                if allocation.status != "R":
+                    status = slurm.status_service.last_status(allocation.id)
+                    if status is not None and slurm.status_service.is_finished(status):
+                        del entries[job_id]
+                    continue
+
+                if queue_snapshot.parse_duration(allocation.timeLeft) < needed:
+                    continue
+
+                del entries[job_id]
+
+                job.id = allocation.id
+                job.nodes = allocation.nodes
+                job.status = allocation.status
+
+                return True
+
+        return False
+
+    def reap(self, slurm):
+        """Cancel allocations idle longer than the idle timeout
+
+        Returns the number of seconds until the next allocation expires or
+        -1 if the pool is empty."""
+
+        now = time.time()
+        next_expiry = -1
+
+        with self.entries() as entries:
+            for job_id, entry in list(entries.items()):
+                expires = entry["released"] + self.idle_timeout
+
+                if expires <= now:
+                    print("Cancelling idle session %s." % job_id)
+                    slurm.cancel_job_with_id(int(job_id))
+                    del entries[job_id]
+                elif next_expiry < 0 or expires - now < next_expiry:
+                    next_expiry = expires - now
+
+        return next_expiry
+
+    def start_reaper(self):
+        """Start a detached reaper process unless one is running"""
+
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([package_dir] + [path for path in [env.get("PYTHONPATH", "")] if path])
+
+        cfg = config.GfxConfig.create()
+
+        if cfg.config_filename != "":
+            env["GFXLAUNCHER_CONFIG"] = cfg.config_filename
+
+        try:
+            subprocess.Popen([sys.executable, "-m", "lhpcdt.warm_pool", "--reap", "--pool-dir", self.pool_dir,
+                              "--idle-timeout", str(self.idle_timeout)],
+                             env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError as e:
+            print("Couldn't start warm pool reaper: %s" % e)
+
+    def run_reaper(self, slurm):
+        """Reap idle allocations until the pool is empty. Only a single
+        reaper runs per user."""
+
+        with open(self.reaper_lock_filename, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+
+            while True:
+                next_expiry = self.reap(slurm)
+
+                if next_expiry < 0:
+                    break
+
+                time.sleep(min(next_expiry, 60.0) + 1.0)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Warm pool reaper")
+    parser.add_argument("--reap", action="store_true", default=False,
+                        help="Cancel idle allocations until the pool is empty.")
+    parser.add_argument("--pool-dir", dest="pool_dir", default="")
+    parser.add_argument("--idle-timeout", dest="idle_timeout", type=int, default=600)
+    args = parser.parse_args()
+
+    from lhpcdt import lrms
+
+    pool = WarmPool(pool_dir=args.pool_dir, idle_timeout=args.idle_timeout)
+
+    if args.reap:
+        pool.run_reaper(lrms.Slurm())
+    else:
+        with pool.entries() as entries:
+            for job_id, entry in sorted(entries.items()):
+                print("%s %s idle %d s" % (job_id, entry["nodes"], time.time() - entry["released"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import os, sys, json, time, shutil, argparse, platform, resource, subprocess, tempfile
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+# Offscreen benchmark of the launcher windows against the simulated cluster
+# in slurm_sim.py. Every cluster size is run in its own process, so the peak
+# RSS belongs to that size. For GfxLaunchWindow, SessionWindow, NodeWindow,
+# LmodQueryWindow and ResourceSpecWindow the time to first paint, refresh,
+# sort and filter latencies are measured and written as JSON. Given a
+# baseline, metrics slower than the tolerance allows are reported and the
+# script exits with status 1:
+#
+#   python bench_gui.py --output gui.json
+#   python bench_gui.py --sizes 1000:10000 --baseline gui.json
+#   python bench_gui.py --baseline gui.json --update
+#
+# Sizes are given as nodes:jobs. Absolute times depend on the machine, so
+# compare against a baseline recorded on the same host.
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import slurm_sim
+
+default_sizes = "1000:10000,5000:50000,10000:100000"
+
+
+class Benchmark(object):
+    """Collects the metrics of a single cluster size"""
+
+    def __init__(self, app):
+        self.app = app
+        self.metrics = {}
+
+    def wait_for(self, condition, timeout=600.0):
+        """Process events until condition() is true"""
+
+        from PyQt5 import QtCore
+
+        deadline = time.perf_counter() + timeout
+
+        while not condition():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Timed out waiting for window")
+            self.app.processEvents(QtCore.QEventLoop.AllEvents, 20)
+
+    def settle(self):
+        """Process pending events, including the resulting repaints"""
+
+        from PyQt5 import QtCore
+
+        self.app.sendPostedEvents()
+        self.app.processEvents(QtCore.QEventLoop.AllEvents)
+
+    def record(self, name, start):
+        self.metrics[name] = time.perf_counter() - start
+        print("%-36s %8.3f s" % (name, self.metrics[name]))
+
+    def first_paint(self, name, create):
+        """Construct and show a window, return it once it has been painted"""
+
+        from PyQt5 import QtCore
+
+        class PaintWatcher(QtCore.QObject):
+            painted = False
+
+            def eventFilter(self, obj, event):
+                if event.type() == QtCore.QEvent.Paint:
+                    self.painted = True
+                return False
+
+        start = time.perf_counter()
+
+        window = create()
+
+        watcher = PaintWatcher()
+        window.installEventFilter(watcher)
+        window.show()
+
+        self.wait_for(lambda: watcher.painted)
+        self.record(name + ".first_paint", start)
+
+        window.removeEventFilter(watcher)
+
+        return window
+
+    def refresh(self, name, window):
+        """Time a full refresh through the window's Refresher"""
+
+        start = time.perf_counter()
+        window.update_table()
+        self.wait_for(lambda: not window.refresher.is_running())
+        self.settle()
+        self.record(name, start)
+
+    def timed(self, name, function, *args):
+        start = time.perf_counter()
+        function(*args)
+        self.settle()
+        self.record(name, start)
+
+
+def write_config(sim_dir):
+    """Write a launcher configuration using the simulated partitions"""
+
+    from lhpcdt import config_template
+
+    filename = os.path.join(sim_dir, "gfxlauncher.conf")
+
+    with open(filename, "w") as config_file:
+        config_file.write(config_template.gfxlauncher_template)
+
+    return filename
+
+
+def bench_launch_window(bench):
+    from lhpcdt import launcher, resource_win
+
+    window = bench.first_paint("launch", launcher.GfxLaunchWindow)
+
+    start = time.perf_counter()
+    bench.wait_for(lambda: not window.startup_pipeline.is_running())
+    bench.record("launch.startup_queries", start)
+
+    bench.timed("launch.update_partition_combo", window.update_partition_combo)
+    bench.timed("launch.update_feature_combo", window.update_feature_combo)
+
+    resource_window = bench.first_paint("resource", lambda: resource_win.ResourceSpecWindow(window))
+    bench.timed("resource.set_data", resource_window.set_data)
+    resource_window.close()
+
+    window.close()
+
+    # Second window starts from the startup cache written by the first
+
+    window = bench.first_paint("launch.cached", launcher.GfxLaunchWindow)
+    bench.wait_for(lambda: not window.startup_pipeline.is_running())
+    window.close()
+
+
+def bench_session_window(bench):
+    from PyQt5 import QtCore
+    from lhpcdt import monitor
+
+    window = bench.first_paint("session", monitor.SessionWindow)
+
+    start = time.perf_counter()
+    bench.wait_for(lambda: not window.refresher.is_running())
+    bench.record("session.first_refresh", start)
+
+    window.action_show_all_jobs.setChecked(True)
+
+    bench.refresh("session.refresh_all", window)
+    bench.refresh("session.refresh_all.again", window)
+
+    print("Running jobs: %d, pending jobs: %d" % (window.running_model.rowCount(), window.waiting_model.rowCount()))
+
+    for view_name, view in [("running", window.running_table_view), ("waiting", window.waiting_table_view)]:
+        bench.timed("session.sort.%s.col1" % view_name, view.sortByColumn, 1, QtCore.Qt.AscendingOrder)
+        bench.timed("session.sort.%s.col0" % view_name, view.sortByColumn, 0, QtCore.Qt.DescendingOrder)
+
+    for label, text in [("user", "simuser0001"), ("partition", "gpua40"), ("clear", "")]:
+        window.running_model.search_text = text
+        window.waiting_model.search_text = text
+        bench.timed("session.filter.%s" % label, window.apply_search)
+
+    window.close()
+
+
+def bench_node_window(bench):
+    from PyQt5 import QtCore
+    from lhpcdt import node_monitor
+
+    window = bench.first_paint("nodes", node_monitor.NodeWindow)
+
+    start = time.perf_counter()
+    bench.wait_for(lambda: not window.refresher.is_running())
+    bench.settle()
+    bench.record("nodes.first_refresh", start)
+
+    bench.refresh("nodes.refresh", window)
+
+    window.last_full_refresh = 0.0
+    bench.refresh("nodes.refresh.full", window)
+
+    bench.timed("nodes.sort.col1", window.node_view_table.sortByColumn, 1, QtCore.Qt.AscendingOrder)
+    bench.timed("nodes.sort.col0", window.node_view_table.sortByColumn, 0, QtCore.Qt.DescendingOrder)
+
+    for label, text in [("partition", "gpua40"), ("node", "cn00042"), ("clear", "")]:
+        bench.timed("nodes.filter.%s" % label, window.on_search_combo_currentTextChanged, text)
+
+    window.close()
+
+
+def bench_lmod_window(bench):
+    from lhpcdt import lmod_ui
+
+    window = bench.first_paint("lmod", lmod_ui.LmodQueryWindow)
+
+    for label, text in [("prefix", "m"), ("name", "matlab"), ("clear", "")]:
+        bench.timed("lmod.filter.%s" % label, window.on_search_edit_textChanged, text)
+
+    window.close()
+
+
+def run_size(nodes, jobs, speed, latency, result_filename):
+    """Benchmark all windows against a cluster of the given size"""
+
+    sim_dir = tempfile.mkdtemp(prefix="slurm_sim_")
+    home_dir = os.path.join(sim_dir, "home")
+
+    os.makedirs(home_dir, exist_ok=True)
+
+    slurm_sim.Simulator.create(sim_dir, slurm_sim.create_cluster(nodes, jobs, 42), speed,
+                               slurm_sim.parse_latency(latency.split(",")))
+
+    os.environ["PATH"] = os.path.join(sim_dir, "bin") + os.pathsep + os.environ["PATH"]
+    os.environ["HOME"] = home_dir
+    os.environ["XDG_CACHE_HOME"] = os.path.join(home_dir, ".cache")
+    os.environ["LHPCDT_STATE_SOCKET"] = os.path.join(sim_dir, "stated.sock")
+    os.environ["GFXLAUNCHER_CONFIG"] = write_config(sim_dir)
+
+    from PyQt5 import QtWidgets
+    from lhpcdt import config, settings, gfxlaunch
+
+    cfg = config.GfxConfig.create()
+    cfg.backend = "cli"
+    cfg.debug_mode = False
+    cfg.modules_json_file = os.path.join(os.path.dirname(os.path.abspath(gfxlaunch.__file__)), "modules.json")
+
+    launch_settings = settings.LaunchSettings.create()
+    launch_settings.args = gfxlaunch.create_parser().parse_args([])
+    launch_settings.tool_path = os.path.dirname(os.path.abspath(gfxlaunch.__file__))
+    launch_settings.copyright_info = gfxlaunch.gfxlaunch_copyright
+    launch_settings.copyright_short_info = gfxlaunch.gfxlaunch_copyright_short
+    launch_settings.version_info = gfxlaunch.gfxlaunch_version
+
+    app = QtWidgets.QApplication([sys.argv[0]])
+
+    bench = Benchmark(app)
+
+    try:
+        bench_launch_window(bench)
+        bench_session_window(bench)
+        bench_node_window(bench)
+        bench_lmod_window(bench)
+    finally:
+        shutil.rmtree(sim_dir, ignore_errors=True)
+
+    result = {
+        "nodes": nodes,
+        "jobs": jobs,
+        "metrics": bench.metrics,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+    with open(result_filename, "w") as result_file:
+        json.dump(result, result_file, indent=2)
+
+
+def compare(results, baseline, tolerance, slack):
+    """Return a list of metrics slower than the baseline allows"""
+
+    regressions = []
+
+    for size, result in sorted(results["sizes"].items()):
+        if size not in baseline.get("sizes", {}):
+            print("No baseline for size %s" % size)
+            continue
+
+        reference = baseline["sizes"][size]
+
+        values = dict(result["metrics"])
+        values["peak_rss_kb"] = result["peak_rss_kb"]
+
+        reference_values = dict(reference["metrics"])
+        reference_values["peak_rss_kb"] = reference["peak_rss_kb"]
+
+        for name, value in sorted(values.items()):
+            if name not in reference_values:
+                continue
+
+            limit = reference_values[name] * (1.0 + tolerance)
+
+            if name != "peak_rss_kb":
+                limit += slack
+
+            if value > limit:
+                regressions.append("%s %s: %.3f, baseline %.3f" % (size, name, value, reference_values[name]))
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the launcher windows offscreen")
+    parser.add_argument("--sizes", default=default_sizes, help="nodes:jobs,...")
+    parser.add_argument("--speed", type=float, default=60.0)
+    parser.add_argument("--latency", default="0", help="seconds or tool=seconds,...")
+    parser.add_argument("--output", default="", help="write results to this file")
+    parser.add_argument("--baseline", default="", help="compare with this result file")
+    parser.add_argument("--update", action="store_true", help="write results to the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--slack", type=float, default=0.05, help="allowed absolute slowdown in seconds")
+    parser.add_argument("--run-size", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--result", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size != "":
+        nodes, jobs = [int(value) for value in args.run_size.split(":")]
+        run_size(nodes, jobs, args.speed, args.latency, args.result)
+        sys.exit(0)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "sizes": {}
+    }
+
+    for size in args.sizes.split(","):
+        print("--- %s nodes:jobs" % size)
+
+        result_fd, result_filename = tempfile.mkstemp(suffix=".json")
+        os.close(result_fd)
+
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--run-size", size,
+                            "--speed", str(args.speed), "--latency", args.latency, "--result", result_filename],
+                           check=True)
+
+            with open(result_filename) as result_file:
+                results["sizes"][size] = json.load(result_file)
+        finally:
+            os.remove(result_filename)
+
+        print("Peak RSS: %.1f MB" % (results["sizes"][size]["peak_rss_kb"] / 1024.0))
+
+    if args.output != "":
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline != "" and args.update:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print("\nBaseline written to %s" % args.baseline)
+    elif args.baseline != "":
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.slack)
+
+        if len(regressions) > 0:
+            print("\nRegressions against %s:" % args.baseline)
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+
+        print("\nNo regressions against %s" % args.baseline)
@@ -0,0 +1,50 @@
+import os, sys, time
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+from lhpcdt import scontrol
+
+# Micro-benchmark of the scontrol parser against the split-based loop
+# previously used in lrms.Slurm.query_nodes() on a synthetic 10k-node
+# 'scontrol show nodes -o' dump.
+
+node_line = "NodeName=cn%05d Arch=x86_64 CoresPerSocket=24 CPUAlloc=12 CPUEfctv=48 CPUTot=48 CPULoad=11.92 AvailableFeatures=rack-%d,skylake,ib ActiveFeatures=rack-%d,skylake,ib Gres=gpu:a100:%d NodeAddr=cn%05d NodeHostName=cn%05d Version=23.02.7 OS=Linux 4.18.0-513.el8.x86_64 #1 SMP Wed Nov 8 04:58:08 EST 2023 RealMemory=191000 AllocMem=96000 FreeMem=80123 Sockets=2 Boards=1 State=MIXED ThreadsPerCore=1 TmpDisk=0 Weight=1 Owner=N/A MCS_label=N/A Partitions=lu48,gpu%d BootTime=2024-01-10T09:12:44 SlurmdStartTime=2024-01-10T09:14:02 LastBusyTime=2024-01-12T10:00:00 CfgTRES=cpu=48,mem=191000M,billing=48 AllocTRES=cpu=12,mem=96000M CapWatts=n/a CurrentWatts=0 AveWatts=0 ExtSensorsJoules=n/s ExtSensorsWatts=0 ExtSensorsTemp=n/s Reason=Not responding [slurm@2024-01-12T09:00:00]"
+
+
+def split_loop(output):
+    node_dict = {}
+    current_node_name = ""
+
+    for line in output.split("\n"):
+        var_pairs = line.strip().split(" ")
+        if len(var_pairs) >= 1:
+            for var_pair in var_pairs:
+                if len(var_pair) > 0:
+                    if var_pair.find("=") != -1:
+                        var_name = var_pair.split("=")[0]
+                        var_value = var_pair.split("=")[1]
+
+                        if var_name == "NodeName":
+                            current_node_name = var_value
+                            node_dict[var_value] = {}
+                        else:
+                            node_dict[current_node_name][var_name] = var_value
+
+    return node_dict
+
+
+if __name__ == "__main__":
+
+    output = "\n".join([node_line % (i, i % 40, i % 40, i % 4, i, i, i % 3) for i in range(10000)])
+
+    for name, parse in [("split loop", split_loop), ("scontrol parser", lambda o: scontrol.records_by_key(o, "NodeName"))]:
+        best = None
+        for i in range(5):
+            start = time.perf_counter()
+            nodes = parse(output)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        node = nodes["cn00001"]
+        print("%-16s %7.1f ms  CfgTRES=%s  OS=%s  Reason=%s" % (name, best * 1000, node["CfgTRES"], node["OS"], node["Reason"]))
@@ -0,0 +1,117 @@
+import os, sys, time, shutil, argparse, tempfile
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+# End-to-end benchmark of the lrms layer against the simulated cluster in
+# slurm_sim.py. Creates a simulator (10k nodes / 100k jobs by default),
+# puts its tools first on PATH and times the queries used by the launcher,
+# a session submission as done by SubmitThread and the nblaunch
+# submit/status/cancel cycle:
+#
+#   python bench_slurm_sim.py
+#   python bench_slurm_sim.py --format text --latency 0.2
+#   python bench_slurm_sim.py --dir /tmp/sim --keep
+
+import slurm_sim
+
+
+def timed(name, function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    elapsed = time.perf_counter() - start
+    print("%-32s %8.3f s" % (name, elapsed))
+    return value
+
+
+def submit_session(slurm, job):
+    """Submit and wait as lhpcdt.launcher.SubmitThread.run() does"""
+
+    if not slurm.submit(job):
+        raise RuntimeError("Submission failed: %s" % slurm.submit_error)
+
+    slurm.wait_for_start(job)
+    slurm.job_status(job)
+
+    return job.nodes
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark lrms against the Slurm simulator")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--speed", type=float, default=60.0)
+    parser.add_argument("--latency", default="0", help="seconds or tool=seconds,...")
+    parser.add_argument("--format", default="auto", choices=["auto", "json", "text"])
+    parser.add_argument("--dir", default="")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    sim_dir = args.dir if args.dir != "" else tempfile.mkdtemp(prefix="slurm_sim_")
+    home_dir = os.path.join(sim_dir, "home")
+
+    os.makedirs(home_dir, exist_ok=True)
+
+    slurm_sim.Simulator.create(sim_dir, slurm_sim.create_cluster(args.nodes, args.jobs, 42), args.speed,
+                               slurm_sim.parse_latency(args.latency.split(",")))
+
+    os.environ["PATH"] = os.path.join(sim_dir, "bin") + os.pathsep + os.environ["PATH"]
+    os.environ["HOME"] = home_dir
+    os.environ["LHPCDT_STATE_SOCKET"] = os.path.join(sim_dir, "stated.sock")
+
+    from lhpcdt import config, lrms, jobs, command_stats
+
+    cfg = config.GfxConfig.create()
+    cfg.backend = "cli"
+    cfg.output_format = args.format
+    cfg.debug_mode = False
+
+    slurm = lrms.Slurm()
+
+    timed("query_partitions", slurm.query_partitions)
+    nodes = timed("query_nodes", slurm.query_nodes)
+    timed("query_cluster_index", slurm.query_cluster_index)
+    features = timed("query_features", slurm.query_features, "gpua40")
+    timed("query_reservations", slurm.query_reservations)
+    timed("AccountManager", lrms.AccountManager)
+
+    queue = lrms.Queue()
+
+    timed("Queue.update", queue.update)
+    queue_size = len(queue.snapshot)
+    timed("Queue.update (again)", queue.update)
+    timed("Queue.update user", queue.update, "simuser0001")
+    timed("Queue.update running", queue.update, "", "R")
+
+    job = jobs.Job(account="lu-test", partition="lvis", time="00:30:00")
+    job.update()
+
+    node = timed("submit and wait for start", submit_session, slurm, job)
+    timed("cancel_job", slurm.cancel_job, job)
+
+    # nblaunch needs psutil through local_queue
+
+    try:
+        from lhpcdt import nblaunch
+    except ImportError as e:
+        print("Skipping nblaunch: %s" % e)
+    else:
+        controller = nblaunch.NotebookSlurmController()
+
+        timed("nblaunch submit", controller.do_submit, "")
+        timed("nblaunch status", controller.do_status, "")
+
+        for job_id in list(controller.active_jobs.keys()):
+            timed("nblaunch cancel", controller.do_cancel, job_id)
+
+    print()
+    print("Nodes: %d, features of gpua40: %s, queue: %d jobs, session node: %s" % (
+        len(nodes), ",".join(sorted(features)), queue_size, node))
+    print()
+    print(command_stats.CommandStats.shared().format_table())
+
+    if args.dir == "" and not args.keep:
+        shutil.rmtree(sim_dir)
+    else:
+        print("\nSimulator state kept in %s" % sim_dir)
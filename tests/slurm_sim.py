@@ -0,0 +1,2068 @@
+#!/usr/bin/env python3
+
+import os, sys, re, json, time, array, fcntl, random, shlex, bisect, getpass, argparse, contextlib
+
+# Synthetic Slurm cluster for benchmarks and end-to-end runs of the lrms
+# layer without a real cluster. "init" creates a state directory with a
+# cluster description and wrapper scripts for sbatch, squeue, scontrol,
+# sinfo, sacct, sacctmgr and scancel in <dir>/bin. All tools share the
+# state in <dir>/state.json:
+#
+#   python slurm_sim.py init /tmp/sim --nodes 10000 --jobs 100000 --speed 60
+#   export PATH=/tmp/sim/bin:$PATH
+#   squeue -u $USER
+#   python slurm_sim.py advance /tmp/sim 3600
+#   python slurm_sim.py latency /tmp/sim squeue=1.5 default=0.1
+#   python slurm_sim.py status /tmp/sim
+#
+# The background jobs are not stored. Each of the --jobs job slots runs
+# an endless sequence of jobs, pending and then running for durations
+# drawn once from the seed, so the queue holds a constant number of jobs
+# that start and finish as the simulated clock advances. The clock runs
+# --speed times faster than real time and can be moved forward with
+# "advance". Jobs submitted with sbatch start after a short delay and run
+# until their time limit unless they are cancelled.
+#
+# Each tool call sleeps for the configured latency before answering. The
+# SLURM_SIM_LATENCY environment variable ("1.5" or "squeue=1.5,default=0")
+# overrides the latency of the state directory.
+
+tools = ["sbatch", "squeue", "scontrol", "sinfo", "sacct", "sacctmgr", "scancel"]
+
+slurm_version = "23.02.7"
+
+first_background_jobid = 1000000
+
+default_partitions = [
+    {"name": "lu48", "prefix": "cn", "share": 0.6, "cpus": 48, "memory": 251000,
+     "features": ["milan", "mem256gb"], "gres": "", "max_time": 10080, "default": True},
+    {"name": "gpua40", "prefix": "ga", "share": 0.2, "cpus": 48, "memory": 510000,
+     "features": ["milan", "gpua40", "mem512gb"], "gres": "gpu:a40:4", "max_time": 2880},
+    {"name": "gpua100", "prefix": "gb", "share": 0.1, "cpus": 48, "memory": 510000,
+     "features": ["milan", "ampere", "mem512gb"], "gres": "gpu:a100:2", "max_time": 2880},
+    {"name": "lvis", "prefix": "gl", "share": 0.1, "cpus": 32, "memory": 384000,
+     "features": ["cascade", "gpua40i", "mem384gb"], "gres": "gpu:a40:1", "max_time": 1440}
+]
+
+job_names = ["bash", "sim.sh", "gromacs", "vasp_std", "python", "matlab", "lammps", "train.py", "gui_interactive",
+             "jupyter-lab", "abaqus", "comsol", "cp2k", "run.sh", "snakemake", "nextflow"]
+
+state_codes = {"PENDING": "PD", "RUNNING": "R", "COMPLETING": "CG", "COMPLETED": "CD", "CANCELLED": "CA",
+               "TIMEOUT": "TO", "FAILED": "F"}
+
+active_states = ["PENDING", "RUNNING", "COMPLETING"]
+
+
+class SimError(Exception):
+    pass
+
+
+def number(value):
+    return {"set": True, "infinite": False, "number": value}
+
+
+def duration(seconds):
+    """Format seconds as printed by squeue"""
+
+    if seconds < 0:
+        return "UNLIMITED"
+
+    d, rest = divmod(int(seconds), 86400)
+    h, rest = divmod(rest, 3600)
+    m, s = divmod(rest, 60)
+
+    if d > 0:
+        return "%d-%02d:%02d:%02d" % (d, h, m, s)
+    elif h > 0:
+        return "%d:%02d:%02d" % (h, m, s)
+    else:
+        return "%d:%02d" % (m, s)
+
+
+def long_duration(seconds):
+    """Format seconds as printed by scontrol and sacct"""
+
+    if seconds < 0:
+        return "UNLIMITED"
+
+    d, rest = divmod(int(seconds), 86400)
+    h, rest = divmod(rest, 3600)
+    m, s = divmod(rest, 60)
+
+    if d > 0:
+        return "%d-%02d:%02d:%02d" % (d, h, m, s)
+    else:
+        return "%02d:%02d:%02d" % (h, m, s)
+
+
+def timestamp(seconds, empty="N/A"):
+    if seconds <= 0:
+        return empty
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(seconds))
+
+
+def parse_time_limit(value):
+    """Parse a Slurm time limit into seconds, -1 for UNLIMITED"""
+
+    value = value.strip()
+
+    if value.upper() in ["UNLIMITED", "INFINITE", "-1"]:
+        return -1
+
+    match = re.match(r"^(?:(\d+)-)?(\d+)(?::(\d+))?(?::(\d+))?$", value)
+
+    if match is None:
+        raise SimError("Invalid time limit specification")
+
+    days, first, second, third = match.groups()
+
+    if days is not None:
+        # D-H, D-H:M, D-H:M:S
+        seconds = int(days) * 86400 + int(first) * 3600 + int(second or 0) * 60 + int(third or 0)
+    elif third is not None:
+        seconds = int(first) * 3600 + int(second) * 60 + int(third)
+    elif second is not None:
+        seconds = int(first) * 60 + int(second)
+    else:
+        seconds = int(first) * 60
+
+    return seconds
+
+
+def parse_options(args, options):
+    """Parse Slurm style command line options
+
+    options maps option names ("-o", "--format") to (key, takes value).
+    Returns a dict of option values and the positional arguments."""
+
+    values = {}
+    positional = []
+
+    i = 0
+
+    while i < len(args):
+        arg = args[i]
+
+        if arg.startswith("--") and len(arg) > 2:
+            name, sep, value = arg.partition("=")
+            if name not in options:
+                raise SimError("unrecognized option '%s'" % arg)
+            key, takes_value = options[name]
+            if takes_value and not sep:
+                i += 1
+                if i == len(args):
+                    raise SimError("option '%s' requires an argument" % name)
+                value = args[i]
+            values[key] = value if takes_value else True
+        elif arg.startswith("-") and len(arg) > 1 and not arg[1].isdigit():
+            flags = arg[1:]
+            while flags != "":
+                name = "-" + flags[0]
+                if name not in options:
+                    raise SimError("invalid option -- '%s'" % flags[0])
+                key, takes_value = options[name]
+                if takes_value:
+                    value = flags[1:]
+                    if value == "":
+                        i += 1
+                        if i == len(args):
+                            raise SimError("option requires an argument -- '%s'" % flags[0])
+                        value = args[i]
+                    values[key] = value
+                    flags = ""
+                else:
+                    values[key] = True
+                    flags = flags[1:]
+        else:
+            positional.append(arg)
+
+        i += 1
+
+    return values, positional
+
+
+def split_list(value):
+    return [item for item in value.split(",") if item != ""]
+
+
+# Format strings of squeue and sinfo: %[.][width]letter. A "." right
+# justifies the field, fields longer than width are truncated. The format
+# is compiled to a Python %-format taking a dict of field values.
+
+format_re = re.compile(r"%(\.?)(\d*)([A-Za-z])")
+
+
+def compile_format(format_string, fields, what):
+    """Return the %-format of a format string and the letters used"""
+
+    template = []
+    letters = set()
+    position = 0
+
+    for match in format_re.finditer(format_string):
+        template.append(format_string[position:match.start()].replace("%", "%%"))
+        right, width, letter = match.groups()
+        if letter not in fields:
+            raise SimError("Invalid %s format specification: %s" % (what, letter))
+        if width != "":
+            template.append("%%(%s)%s%s.%ss" % (letter, "" if right == "." else "-", width, width))
+        else:
+            template.append("%%(%s)s" % letter)
+        letters.add(letter)
+        position = match.end()
+
+    template.append(format_string[position:].replace("%", "%%"))
+
+    return "".join(template), letters
+
+
+def write_lines(lines):
+    if len(lines) > 0:
+        sys.stdout.write("\n".join(lines))
+        sys.stdout.write("\n")
+
+
+def write_json(key, elements, extra={}):
+    """Write a Slurm JSON reply with the top-level array key"""
+
+    sys.stdout.write('{"meta": {"plugin": {"type": "openapi/v0.0.39", "name": "Slurm OpenAPI v0.0.39"}, '
+                     '"Slurm": {"version": {"major": 23, "micro": 7, "minor": 2}, "release": "%s"}}, '
+                     % slurm_version)
+
+    for name, value in extra.items():
+        sys.stdout.write('"%s": %s, ' % (name, json.dumps(value)))
+
+    sys.stdout.write('"%s": [' % key)
+
+    separator = "\n"
+
+    for element in elements:
+        sys.stdout.write(separator)
+        sys.stdout.write(json.dumps(element))
+        separator = ",\n"
+
+    sys.stdout.write('\n], "warnings": [], "errors": []}\n')
+
+
+def create_cluster(node_count, job_count, seed, users=500, accounts=40):
+    """Return a cluster description with the default partitions"""
+
+    partitions = []
+    assigned = 0
+
+    for i, template in enumerate(default_partitions):
+        partition = dict(template)
+        if i == len(default_partitions) - 1:
+            partition["nodes"] = max(1, node_count - assigned)
+        else:
+            partition["nodes"] = max(1, int(node_count * template["share"]))
+        del partition["share"]
+        assigned += partition["nodes"]
+        partitions.append(partition)
+
+    user = getpass.getuser()
+
+    return {
+        "name": "simcluster",
+        "partitions": partitions,
+        "jobs": job_count,
+        "seed": seed,
+        "users": ["simuser%04d" % (i + 1) for i in range(users)],
+        "accounts": ["lu2024-2-%02d" % (i + 1) for i in range(accounts)],
+        "user": user,
+        "user_accounts": ["lu-test", "lu2024-7-80"],
+        "run_time": [600, 43200],
+        "pending_fraction": 0.6,
+        "start_delay": [2, 10],
+        "down_fraction": 0.01,
+        "reservations": [
+            {"name": "course", "accounts": "lu-test", "partition": partitions[-1]["name"], "nodes": 2,
+             "start": -3600, "duration": 86400, "flags": ["IGNORE_JOBS", "SPEC_NODES"]},
+            {"name": "maintenance", "accounts": "root", "partition": partitions[0]["name"],
+             "nodes": partitions[0]["nodes"], "start": 7 * 86400, "duration": 8 * 3600,
+             "flags": ["MAINT", "IGNORE_JOBS", "SPEC_NODES"]}
+        ]
+    }
+
+
+# Background job slots are stored as arrays of ints in this order
+
+slot_names = ["partition", "user", "name", "nodes", "cpus", "run", "pend", "phase"]
+
+
+def create_slots(cluster):
+    """Draw the background job slots of cluster from its seed"""
+
+    rng = random.Random(cluster["seed"])
+
+    partitions = cluster["partitions"]
+    weights = []
+    total = 0
+
+    for partition in partitions:
+        total += partition["nodes"]
+        weights.append(total)
+
+    run_min, run_max = cluster["run_time"]
+    pending_fraction = cluster["pending_fraction"]
+
+    slots = {name: [] for name in slot_names}
+
+    for i in range(cluster["jobs"]):
+        part = bisect.bisect_right(weights, rng.random() * total)
+        part = min(part, len(partitions) - 1)
+        partition = partitions[part]
+
+        run = rng.randint(run_min, run_max)
+        pend = int(run * pending_fraction / (1.0 - pending_fraction) * rng.uniform(0.5, 1.5))
+        node_count = 1 if rng.random() < 0.95 else min(partition["nodes"], rng.choice([2, 4, 8]))
+
+        slots["partition"].append(part)
+        slots["user"].append(rng.randrange(len(cluster["users"])))
+        slots["name"].append(rng.randrange(len(job_names)))
+        slots["nodes"].append(node_count)
+        slots["cpus"].append(rng.choice([1, 1, 2, 4, 8, 16]))
+        slots["run"].append(run)
+        slots["pend"].append(pend)
+        slots["phase"].append(rng.randrange(run + pend))
+
+    return slots
+
+
+class Job(object):
+    """Job as seen by the tools at the current simulated time"""
+
+    features = ""
+    exit_code = "0:0"
+    work_dir = "/tmp"
+    output = ""
+    submitted = False
+    end_time = 0
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    @property
+    def elapsed(self):
+        return self.end_time - self.start_time if self.start_time > 0 else 0
+
+
+class Simulator(object):
+    """Shared state of the simulated cluster"""
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.state_filename = os.path.join(self.directory, "state.json")
+        self.slots_filename = os.path.join(self.directory, "slots.bin")
+
+        if not os.path.exists(self.state_filename):
+            raise SimError("no simulator state in %s" % self.directory)
+
+        self.read_state()
+
+        self.__slots = None
+        self.__user_accounts = None
+
+    def read_state(self):
+        with open(self.state_filename) as state_file:
+            self.state = json.load(state_file)
+
+        self.cluster = self.state["cluster"]
+        self.partitions = self.cluster["partitions"]
+        self.job_count = self.cluster["jobs"]
+        self.epoch = self.state["clock"]["epoch"]
+        self.now = self.clock()
+
+        self.first_node = []
+        self.node_count = 0
+
+        for partition in self.partitions:
+            self.first_node.append(self.node_count)
+            self.node_count += partition["nodes"]
+
+        self.partition_index = {partition["name"]: i for i, partition in enumerate(self.partitions)}
+        self.prefix_index = {partition["prefix"]: i for i, partition in enumerate(self.partitions)}
+
+    def write_state(self):
+        filename = self.state_filename + ".tmp"
+
+        with open(filename, "w") as state_file:
+            json.dump(self.state, state_file)
+
+        os.replace(filename, self.state_filename)
+
+    @contextlib.contextmanager
+    def modify(self):
+        """Lock, re-read and write back the state"""
+
+        with open(os.path.join(self.directory, "state.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.read_state()
+            yield self.state
+            self.write_state()
+
+    @classmethod
+    def create(cls, directory, cluster, speed=1.0, latency=None, jitter=0.0):
+        """Create a state directory with wrapper scripts on PATH"""
+
+        directory = os.path.abspath(directory)
+        bin_dir = os.path.join(directory, "bin")
+
+        os.makedirs(bin_dir, exist_ok=True)
+
+        state = {
+            "cluster": cluster,
+            "clock": {"epoch": time.time(), "speed": speed, "offset": 0.0},
+            "latency": latency if latency is not None else {"default": 0.0},
+            "jitter": jitter,
+            "next_jobid": 100,
+            "jobs": {},
+            "cancelled": {}
+        }
+
+        with open(os.path.join(directory, "state.json"), "w") as state_file:
+            json.dump(state, state_file, indent=1)
+
+        with open(os.path.join(directory, "slots.bin"), "wb") as slots_file:
+            for name, values in create_slots(cluster).items():
+                array.array("i", values).tofile(slots_file)
+
+        script = os.path.abspath(__file__)
+
+        for tool in tools:
+            filename = os.path.join(bin_dir, tool)
+            with open(filename, "w") as wrapper:
+                wrapper.write('#!/bin/sh\nSLURM_SIM_DIR=%s exec %s %s %s "$@"\n' % (
+                    shlex.quote(directory), shlex.quote(sys.executable), shlex.quote(script), tool))
+            os.chmod(filename, 0o755)
+
+        return Simulator(directory)
+
+    def clock(self):
+        """Return the simulated time"""
+
+        clock = self.state["clock"]
+
+        return clock["epoch"] + (time.time() - clock["epoch"]) * clock["speed"] + clock["offset"]
+
+    def sleep_latency(self, tool):
+        latency = dict(self.state["latency"])
+        jitter = self.state.get("jitter", 0.0)
+
+        override = os.environ.get("SLURM_SIM_LATENCY", "")
+
+        for item in split_list(override):
+            name, sep, value = item.rpartition("=")
+            latency[name if sep else "default"] = float(value)
+
+        delay = latency.get(tool, latency.get("default", 0.0)) + random.uniform(0.0, jitter)
+
+        if delay > 0:
+            time.sleep(delay)
+
+    @property
+    def slots(self):
+        if self.__slots is None:
+            self.__slots = {}
+            with open(self.slots_filename, "rb") as slots_file:
+                for name in slot_names:
+                    values = array.array("i")
+                    values.fromfile(slots_file, self.job_count)
+                    self.__slots[name] = values
+        return self.__slots
+
+    # Nodes are numbered globally, partition by partition. Node names are
+    # the partition prefix and the 1-based index within the partition.
+
+    def node_name(self, part, local):
+        return "%s%05d" % (self.partitions[part]["prefix"], local + 1)
+
+    def node_index(self, name):
+        """Return (partition, local index) of a node name"""
+
+        match = re.match(r"^([A-Za-z]+)(\d+)$", name)
+
+        if match is None or match.group(1) not in self.prefix_index:
+            return None
+
+        part = self.prefix_index[match.group(1)]
+        local = int(match.group(2)) - 1
+
+        if local < 0 or local >= self.partitions[part]["nodes"]:
+            return None
+
+        return part, local
+
+    def node_list(self, part, locals):
+        """Return a compressed host list of nodes in a partition"""
+
+        if len(locals) == 0:
+            return ""
+
+        prefix = self.partitions[part]["prefix"]
+
+        if len(locals) == 1:
+            return "%s%05d" % (prefix, locals[0] + 1)
+
+        ranges = []
+        first = previous = None
+
+        for local in sorted(set(locals)):
+            if previous is not None and local == previous + 1:
+                previous = local
+                continue
+            if first is not None:
+                ranges.append((first, previous))
+            first = previous = local
+
+        ranges.append((first, previous))
+
+        return "%s[%s]" % (prefix, ",".join(["%05d" % (low + 1) if low == high else "%05d-%05d" % (low + 1, high + 1)
+                                              for low, high in ranges]))
+
+    def expand_node_list(self, node_list):
+        """Return the (partition, local index) tuples of a host list"""
+
+        nodes = []
+
+        for match in re.finditer(r"([A-Za-z]+)(?:\[([^\]]*)\]|(\d+))", node_list):
+            prefix, ranges, single = match.groups()
+            if ranges is None:
+                ranges = single
+            for item in ranges.split(","):
+                low, sep, high = item.partition("-")
+                for value in range(int(low), int(high if sep else low) + 1):
+                    node = self.node_index("%s%05d" % (prefix, value))
+                    if node is None:
+                        raise SimError("Invalid node name specified")
+                    nodes.append(node)
+
+        return nodes
+
+    def node_features(self, part, local):
+        return self.partitions[part]["features"] + ["rack-%d" % (local // 40)]
+
+    def node_down(self, part, local):
+        """Return the state flag of nodes that are down or drained"""
+
+        fraction = self.cluster.get("down_fraction", 0.0)
+
+        if fraction <= 0.0:
+            return ""
+
+        value = ((self.first_node[part] + local) * 2654435761) % 10000
+
+        if value < fraction * 5000:
+            return "DRAIN"
+        elif value < fraction * 10000:
+            return "NOT_RESPONDING"
+        else:
+            return ""
+
+    # Background jobs
+
+    def __background_job(self, i, k):
+        """Return job k of slot i, or None if it hasn't been submitted yet"""
+
+        slots = self.slots
+
+        run = slots["run"][i]
+        pend = slots["pend"][i]
+        period = run + pend
+
+        submit_time = self.epoch - slots["phase"][i] + k * period
+
+        if submit_time > self.now:
+            return None
+
+        jobid = first_background_jobid + k * self.job_count + i
+        part = slots["partition"][i]
+        partition = self.partitions[part]
+        user = slots["user"][i]
+        node_count = slots["nodes"][i]
+        start_time = submit_time + pend
+        end_time = start_time + run
+
+        cancel_time = self.state["cancelled"].get(str(jobid))
+
+        if cancel_time is not None and cancel_time < end_time:
+            end_time = cancel_time
+            state = "CANCELLED"
+            if cancel_time <= start_time:
+                start_time = 0
+        elif self.now < start_time:
+            state = "PENDING"
+            end_time = 0
+        elif self.now < end_time:
+            state = "RUNNING"
+        else:
+            state = "COMPLETED"
+
+        if start_time > 0 and state != "PENDING":
+            first = (i * 7919 + k * 104729) % partition["nodes"]
+            nodes = [(part, (first + n) % partition["nodes"]) for n in range(node_count)]
+        else:
+            nodes = []
+
+        time_limit = min((run // 3600 + 1) * 3600, partition["max_time"] * 60)
+
+        return Job(id=jobid, name=job_names[slots["name"][i]], user=self.cluster["users"][user],
+                   account=self.cluster["accounts"][user % len(self.cluster["accounts"])],
+                   partition=partition["name"], state=state, reason="Resources" if i % 10 == 0 else "Priority",
+                   node_count=node_count, cpus=slots["cpus"][i] * node_count, time_limit=time_limit,
+                   submit_time=int(submit_time), start_time=int(start_time), end_time=int(end_time), nodes=nodes,
+                   exit_code="0:15" if state == "CANCELLED" else "0:0")
+
+    def background_jobs(self):
+        """Yield the background jobs in the queue"""
+
+        slots = self.slots
+        run = slots["run"]
+        pend = slots["pend"]
+        phase = slots["phase"]
+
+        t = self.now - self.epoch
+        cancelled = self.state["cancelled"]
+
+        for i in range(self.job_count):
+            period = run[i] + pend[i]
+            k = int((t + phase[i]) // period)
+            if len(cancelled) > 0 and str(first_background_jobid + k * self.job_count + i) in cancelled:
+                continue
+            yield self.__background_job(i, k)
+
+    # Jobs submitted with sbatch
+
+    def __submitted_job(self, jobid, record):
+        start_time = record["start_time"]
+        end_time = start_time + record["run_time"]
+        final_state = "TIMEOUT" if record["run_time"] >= record["time_limit"] else "COMPLETED"
+        exit_code = "0:0"
+
+        if record.get("hold", False):
+            start_time = 0
+            end_time = 0
+            state = "PENDING"
+        elif self.now < start_time:
+            state = "PENDING"
+        elif self.now < end_time:
+            state = "RUNNING"
+        else:
+            state = final_state
+
+        cancel_time = record.get("cancel_time")
+
+        if cancel_time is not None and (state in active_states or cancel_time < end_time):
+            state = "CANCELLED"
+            exit_code = "0:15"
+            if start_time == 0 or cancel_time <= start_time:
+                start_time = 0
+            end_time = cancel_time
+
+        if state in active_states:
+            end_time = 0
+
+        part = self.partition_index[record["partition"]]
+
+        return Job(id=int(jobid), name=record["name"], user=record["user"], account=record["account"],
+                   partition=record["partition"], state=state,
+                   reason="JobHeldUser" if record.get("hold", False) else "Priority",
+                   node_count=len(record["nodes"]), cpus=record["cpus"], time_limit=record["time_limit"],
+                   submit_time=int(record["submit_time"]), start_time=int(start_time), end_time=int(end_time),
+                   nodes=[(part, local) for local in record["nodes"]] if start_time > 0 else [],
+                   features=record["features"], exit_code=exit_code, work_dir=record["work_dir"],
+                   output=record["output"], submitted=True)
+
+    def submitted_jobs(self):
+        for jobid, record in sorted(self.state["jobs"].items(), key=lambda item: int(item[0])):
+            yield self.__submitted_job(jobid, record)
+
+    def job(self, jobid):
+        """Return a job by id, including finished jobs"""
+
+        try:
+            jobid = int(str(jobid).split(".")[0])
+        except ValueError:
+            return None
+
+        if str(jobid) in self.state["jobs"]:
+            return self.__submitted_job(str(jobid), self.state["jobs"][str(jobid)])
+
+        if jobid < first_background_jobid:
+            return None
+
+        k, i = divmod(jobid - first_background_jobid, self.job_count)
+
+        return self.__background_job(i, k)
+
+    def queue(self):
+        """Yield all jobs in the queue"""
+
+        for job in self.submitted_jobs():
+            if job.state in active_states:
+                yield job
+
+        for job in self.background_jobs():
+            yield job
+
+    def node_usage(self):
+        """Return allocated CPUs per global node index"""
+
+        alloc = [0] * self.node_count
+
+        for job in self.queue():
+            if job.state == "RUNNING":
+                per_node = job.cpus // max(1, len(job.nodes))
+                for part, local in job.nodes:
+                    alloc[self.first_node[part] + local] += per_node
+
+        return alloc
+
+    def user_accounts(self):
+        """Return dict of user -> accounts"""
+
+        if self.__user_accounts is None:
+            accounts = self.cluster["accounts"]
+            self.__user_accounts = {user: [accounts[i % len(accounts)]] for i, user in enumerate(self.cluster["users"])}
+            self.__user_accounts[self.cluster["user"]] = self.cluster["user_accounts"]
+
+        return self.__user_accounts
+
+    def reservations(self):
+        """Return reservations with absolute times and node lists"""
+
+        reservations = []
+
+        for reservation in self.cluster.get("reservations", []):
+            part = self.partition_index[reservation["partition"]]
+            node_count = min(reservation["nodes"], self.partitions[part]["nodes"])
+            start_time = int(self.epoch + reservation["start"])
+
+            reservations.append(dict(reservation, part=part, nodes=list(range(node_count)), start_time=start_time,
+                                     end_time=start_time + reservation["duration"]))
+
+        return reservations
+
+
+# squeue
+
+squeue_fields = {
+    "i": "JOBID", "A": "JOBID", "P": "PARTITION", "j": "NAME", "u": "USER", "T": "STATE", "t": "ST",
+    "M": "TIME", "l": "TIME_LIMIT", "L": "TIME_LEFT", "D": "NODES", "R": "NODELIST(REASON)", "N": "NODELIST",
+    "E": "DEPENDENCY", "a": "ACCOUNT", "C": "CPUS", "f": "FEATURES", "S": "START_TIME", "V": "SUBMIT_TIME",
+    "r": "REASON", "Q": "PRIORITY", "Z": "WORK_DIR", "q": "QOS", "m": "MIN_MEMORY", "b": "TRES_PER_NODE"
+}
+
+squeue_options = {
+    "-h": ("noheader", False), "--noheader": ("noheader", False),
+    "-o": ("format", True), "--format": ("format", True),
+    "-j": ("jobs", True), "--jobs": ("jobs", True),
+    "-u": ("user", True), "--user": ("user", True), "--me": ("me", False),
+    "-t": ("states", True), "--states": ("states", True),
+    "-p": ("partition", True), "--partition": ("partition", True),
+    "-A": ("account", True), "--account": ("account", True),
+    "-l": ("long", False), "--long": ("long", False),
+    "-a": ("all", False), "--all": ("all", False),
+    "-r": ("array", False), "--array": ("array", False),
+    "-S": ("sort", True), "--sort": ("sort", True),
+    "--json": ("json", False)
+}
+
+
+def job_node_list(sim, job):
+    if len(job.nodes) == 1:
+        return sim.node_name(*job.nodes[0])
+
+    nodes = {}
+
+    for part, local in job.nodes:
+        nodes.setdefault(part, []).append(local)
+
+    return ",".join([sim.node_list(part, locals) for part, locals in nodes.items()])
+
+
+def squeue_values(sim, job, letters=squeue_fields):
+    """Return the squeue fields of a job
+
+    Times are only formatted if their field is in letters."""
+
+    node_list = job_node_list(sim, job)
+
+    values = {
+        "i": str(job.id), "A": str(job.id), "P": job.partition, "j": job.name, "u": job.user, "T": job.state,
+        "t": state_codes.get(job.state, job.state), "D": str(job.node_count),
+        "R": node_list if job.state != "PENDING" else "(%s)" % job.reason, "N": node_list, "E": "(null)",
+        "a": job.account, "C": str(job.cpus), "f": job.features if job.features != "" else "(null)",
+        "r": job.reason if job.state == "PENDING" else "None", "Q": "1", "Z": job.work_dir, "q": "normal",
+        "m": "0", "b": "N/A"
+    }
+
+    if "M" in letters or "L" in letters or "l" in letters:
+        elapsed = int(sim.now - job.start_time) if job.state == "RUNNING" else 0
+        values["M"] = duration(elapsed)
+        values["l"] = duration(job.time_limit)
+        values["L"] = duration(max(0, job.time_limit - elapsed)) if job.time_limit >= 0 else "UNLIMITED"
+
+    if "S" in letters or "V" in letters:
+        values["S"] = timestamp(job.start_time) if job.state != "PENDING" else "N/A"
+        values["V"] = timestamp(job.submit_time)
+
+    return values
+
+
+def job_json(sim, job):
+    return {
+        "job_id": job.id, "name": job.name, "user_name": job.user, "account": job.account,
+        "partition": job.partition, "job_state": [job.state],
+        "state_reason": job.reason if job.state == "PENDING" else "None",
+        "time_limit": number(job.time_limit // 60) if job.time_limit >= 0 else
+        {"set": True, "infinite": True, "number": 0},
+        "submit_time": number(job.submit_time), "start_time": number(job.start_time),
+        "end_time": number(job.end_time), "node_count": number(job.node_count), "nodes": job_node_list(sim, job),
+        "cpus": number(job.cpus), "features": job.features, "dependency": "", "qos": "normal",
+        "array_job_id": number(0), "array_task_id": {"set": False, "infinite": False, "number": 0},
+        "current_working_directory": job.work_dir, "standard_output": job.output,
+        "exit_code": {"status": ["SUCCESS"], "return_code": number(0)}
+    }
+
+
+def state_filter(value):
+    states = set()
+
+    for state in split_list(value.upper()):
+        if state == "ALL":
+            return None
+        for name, code in state_codes.items():
+            if state in [name, code]:
+                states.add(name)
+
+    return states
+
+
+def squeue(sim, args):
+    options, positional = parse_options(args, squeue_options)
+
+    if "jobs" in options:
+        jobids = split_list(options["jobs"])
+        jobs = [sim.job(jobid) for jobid in jobids]
+
+        if all([job is None for job in jobs]):
+            raise SimError("slurm_load_jobs error: Invalid job id specified")
+
+        jobs = [job for job in jobs if job is not None and job.state in active_states]
+    else:
+        jobs = sim.queue()
+
+    users = split_list(options.get("user", ""))
+
+    if options.get("me", False):
+        users.append(sim.cluster["user"])
+
+    states = state_filter(options["states"]) if "states" in options else None
+    partitions = split_list(options.get("partition", ""))
+    accounts = split_list(options.get("account", ""))
+
+    def selected(job):
+        return ((len(users) == 0 or job.user in users) and (states is None or job.state in states) and
+                (len(partitions) == 0 or job.partition in partitions) and
+                (len(accounts) == 0 or job.account in accounts))
+
+    if options.get("json", False):
+        write_json("jobs", (job_json(sim, job) for job in jobs if selected(job)))
+        return 0
+
+    if "format" in options:
+        format_string = options["format"]
+    elif options.get("long", False):
+        format_string = "%.18i %.9P %.8j %.8u %.8T %.10M %.9l %.6D %R"
+    else:
+        format_string = "%.18i %.9P %.8j %.8u %.2t %.10M %.6D %R"
+
+    template, letters = compile_format(format_string, squeue_fields, "job")
+
+    lines = []
+
+    if not options.get("noheader", False):
+        lines.append(template % squeue_fields)
+
+    for job in jobs:
+        if selected(job):
+            lines.append(template % squeue_values(sim, job, letters))
+
+    write_lines(lines)
+
+    return 0
+
+
+# scontrol
+
+scontrol_options = {
+    "-o": ("oneliner", False), "--oneliner": ("oneliner", False),
+    "-d": ("details", False), "--details": ("details", False),
+    "-a": ("all", False), "--all": ("all", False),
+    "--json": ("json", False)
+}
+
+
+def node_state(sim, part, local, alloc):
+    partition = sim.partitions[part]
+    flag = sim.node_down(part, local)
+
+    if flag == "NOT_RESPONDING":
+        return ["DOWN", "NOT_RESPONDING"]
+    elif alloc == 0:
+        state = ["IDLE"]
+    elif alloc < partition["cpus"]:
+        state = ["MIXED"]
+    else:
+        state = ["ALLOCATED"]
+
+    if flag == "DRAIN":
+        state.append("DRAIN")
+
+    return state
+
+
+def node_info(sim, part, local, alloc):
+    """Return a dict with the values of a node"""
+
+    partition = sim.partitions[part]
+    cpus = partition["cpus"]
+
+    # Nodes that are down or drained don't run the jobs placed on them
+
+    if sim.node_down(part, local) != "":
+        alloc = 0
+    else:
+        alloc = min(alloc, cpus)
+
+    state = node_state(sim, part, local, alloc)
+
+    memory = partition["memory"]
+    alloc_memory = memory * alloc // cpus
+
+    reason = ""
+    boot_time = sim.epoch - 86400 * (1 + local % 30)
+
+    if state[0] == "DOWN":
+        reason = "Not responding [slurm@%s]" % timestamp(sim.epoch - 3600)
+    elif "DRAIN" in state:
+        reason = "Maintenance [root@%s]" % timestamp(sim.epoch - 7200)
+
+    return {
+        "name": sim.node_name(part, local), "cpus": cpus, "alloc": alloc, "load": int(alloc * 95),
+        "features": sim.node_features(part, local), "gres": partition["gres"], "memory": memory,
+        "alloc_memory": alloc_memory, "free_memory": max(0, memory - alloc_memory - 4000) if state[0] != "DOWN" else 0,
+        "state": state, "partitions": [partition["name"]], "reason": reason, "boot_time": boot_time
+    }
+
+
+def node_text(info):
+    cpus = info["cpus"]
+    features = ",".join(info["features"])
+    gres = info["gres"] if info["gres"] != "" else "(null)"
+
+    lines = [
+        "NodeName=%s Arch=x86_64 CoresPerSocket=%d" % (info["name"], cpus // 2),
+        "CPUAlloc=%d CPUEfctv=%d CPUTot=%d CPULoad=%.2f" % (info["alloc"], cpus, cpus, info["load"] / 100.0),
+        "AvailableFeatures=%s" % features,
+        "ActiveFeatures=%s" % features,
+        "Gres=%s" % gres,
+        "NodeAddr=%s NodeHostName=%s Version=%s" % (info["name"], info["name"], slurm_version),
+        "OS=Linux 4.18.0-513.el8.x86_64 #1 SMP Wed Nov 8 04:58:08 EST 2023",
+        "RealMemory=%d AllocMem=%d FreeMem=%s Sockets=2 Boards=1" % (
+            info["memory"], info["alloc_memory"], info["free_memory"] if info["state"][0] != "DOWN" else "N/A"),
+        "State=%s ThreadsPerCore=1 TmpDisk=0 Weight=1 Owner=N/A MCS_label=N/A" % "+".join(info["state"]),
+        "Partitions=%s" % ",".join(info["partitions"]),
+        "BootTime=%s SlurmdStartTime=%s" % (timestamp(info["boot_time"]), timestamp(info["boot_time"] + 120)),
+        "LastBusyTime=%s ResumeAfterTime=None" % timestamp(info["boot_time"] + 3600),
+        "CfgTRES=cpu=%d,mem=%dM,billing=%d" % (cpus, info["memory"], cpus),
+        "AllocTRES=%s" % ("cpu=%d,mem=%dM" % (info["alloc"], info["alloc_memory"]) if info["alloc"] > 0 else ""),
+        "CapWatts=n/a",
+        "CurrentWatts=0 AveWatts=0",
+        "ExtSensorsJoules=n/s ExtSensorsWatts=0 ExtSensorsTemp=n/s"
+    ]
+
+    if info["reason"] != "":
+        lines.append("Reason=%s" % info["reason"])
+
+    return lines
+
+
+def node_json(info):
+    return {
+        "name": info["name"], "hostname": info["name"], "address": info["name"], "architecture": "x86_64",
+        "operating_system": "Linux 4.18.0-513.el8.x86_64 #1 SMP Wed Nov 8 04:58:08 EST 2023",
+        "cores": info["cpus"] // 2, "sockets": 2, "boards": 1, "threads": 1, "cpus": info["cpus"],
+        "alloc_cpus": info["alloc"], "cpu_load": info["load"], "features": info["features"],
+        "active_features": info["features"], "gres": info["gres"], "real_memory": info["memory"],
+        "alloc_memory": info["alloc_memory"], "free_mem": number(info["free_memory"]), "state": info["state"],
+        "weight": 1, "partitions": info["partitions"], "reason": info["reason"],
+        "tres": "cpu=%d,mem=%dM,billing=%d" % (info["cpus"], info["memory"], info["cpus"]),
+        "tres_used": "cpu=%d,mem=%dM" % (info["alloc"], info["alloc_memory"]) if info["alloc"] > 0 else "",
+        "boot_time": number(info["boot_time"]), "version": slurm_version
+    }
+
+
+def partition_text(sim, part):
+    partition = sim.partitions[part]
+    max_time = long_duration(partition["max_time"] * 60)
+
+    return [
+        "PartitionName=%s" % partition["name"],
+        "AllowGroups=ALL AllowAccounts=ALL AllowQos=ALL",
+        "AllocNodes=ALL Default=%s QoS=N/A" % ("YES" if partition.get("default", False) else "NO"),
+        "DefaultTime=01:00:00 DisableRootJobs=NO ExclusiveUser=NO GraceTime=0 Hidden=NO",
+        "MaxNodes=UNLIMITED MaxTime=%s MinNodes=0 LLN=NO MaxCPUsPerNode=UNLIMITED" % max_time,
+        "Nodes=%s" % sim.node_list(part, list(range(partition["nodes"]))),
+        "PriorityJobFactor=1 PriorityTier=1 RootOnly=NO ReqResv=NO OverSubscribe=NO",
+        "OverTimeLimit=NONE PreemptMode=OFF",
+        "State=UP TotalCPUs=%d TotalNodes=%d SelectTypeParameters=NONE" % (
+            partition["cpus"] * partition["nodes"], partition["nodes"]),
+        "JobDefaults=(null)",
+        "DefMemPerCPU=%d MaxMemPerNode=UNLIMITED" % (partition["memory"] // partition["cpus"])
+    ]
+
+
+def partition_json(sim, part):
+    partition = sim.partitions[part]
+
+    return {
+        "name": partition["name"],
+        "nodes": {"configured": sim.node_list(part, list(range(partition["nodes"]))), "total": partition["nodes"],
+                  "allowed_allocation": ""},
+        "cpus": {"total": partition["cpus"] * partition["nodes"]},
+        "maximums": {"time": number(partition["max_time"])},
+        "partition": {"state": ["UP"]},
+        "default": partition.get("default", False)
+    }
+
+
+def reservation_values(sim, reservation):
+    partition = sim.partitions[reservation["part"]]
+    node_count = len(reservation["nodes"])
+
+    return {
+        "node_list": sim.node_list(reservation["part"], reservation["nodes"]),
+        "node_count": node_count,
+        "core_count": node_count * partition["cpus"],
+        "active": reservation["start_time"] <= sim.now < reservation["end_time"]
+    }
+
+
+def reservation_text(sim, reservation):
+    values = reservation_values(sim, reservation)
+
+    return [
+        "ReservationName=%s StartTime=%s EndTime=%s Duration=%s" % (
+            reservation["name"], timestamp(reservation["start_time"]), timestamp(reservation["end_time"]),
+            long_duration(reservation["duration"])),
+        "Nodes=%s NodeCnt=%d CoreCnt=%d Features=(null) PartitionName=(null) Flags=%s" % (
+            values["node_list"], values["node_count"], values["core_count"], ",".join(reservation["flags"])),
+        "TRES=cpu=%d" % values["core_count"],
+        "Users=(null) Groups=(null) Accounts=%s Licenses=(null) State=%s BurstBuffer=(null) Watts=n/a" % (
+            reservation["accounts"], "ACTIVE" if values["active"] else "INACTIVE"),
+        "MaxStartDelay=(null)"
+    ]
+
+
+def reservation_json(sim, reservation):
+    values = reservation_values(sim, reservation)
+
+    return {
+        "name": reservation["name"], "accounts": reservation["accounts"], "node_list": values["node_list"],
+        "node_count": values["node_count"], "core_count": values["core_count"],
+        "start_time": number(reservation["start_time"]), "end_time": number(reservation["end_time"]),
+        "flags": reservation["flags"], "tres": "cpu=%d" % values["core_count"], "partition": "", "users": "",
+        "groups": "", "features": "", "licenses": "", "burst_buffer": ""
+    }
+
+
+def job_text(sim, job):
+    values = squeue_values(sim, job)
+
+    if job.state == "RUNNING":
+        run_time = int(sim.now - job.start_time)
+    else:
+        run_time = job.elapsed
+
+    if job.start_time > 0:
+        end_time = job.end_time if job.end_time > 0 else job.start_time + job.time_limit
+    else:
+        end_time = 0
+
+    first_node = sim.node_name(*job.nodes[0]) if len(job.nodes) > 0 else ""
+
+    return [
+        "JobId=%d JobName=%s" % (job.id, job.name),
+        "UserId=%s(1000) GroupId=%s(1000) MCS_label=N/A" % (job.user, job.user),
+        "Priority=1 Nice=0 Account=%s QOS=normal" % job.account,
+        "JobState=%s Reason=%s Dependency=(null)" % (job.state, values["r"]),
+        "Requeue=1 Restarts=0 BatchFlag=1 Reboot=0 ExitCode=%s" % job.exit_code,
+        "RunTime=%s TimeLimit=%s TimeMin=N/A" % (long_duration(run_time), long_duration(job.time_limit)),
+        "SubmitTime=%s EligibleTime=%s" % (timestamp(job.submit_time), timestamp(job.submit_time)),
+        "AccrueTime=%s" % timestamp(job.submit_time),
+        "StartTime=%s EndTime=%s Deadline=N/A" % (timestamp(job.start_time, "Unknown"), timestamp(end_time, "Unknown")),
+        "Partition=%s AllocNode:Sid=login1:4242" % job.partition,
+        "ReqNodeList=(null) ExcNodeList=(null)",
+        "NodeList=%s" % (values["N"] if values["N"] != "" else "(null)"),
+        "BatchHost=%s" % first_node,
+        "NumNodes=%d NumCPUs=%d NumTasks=%d CPUs/Task=1 ReqB:S:C:T=0:0:*:*" % (job.node_count, job.cpus, job.cpus),
+        "TRES=cpu=%d,node=%d,billing=%d" % (job.cpus, job.node_count, job.cpus),
+        "Features=%s DelayBoot=00:00:00" % values["f"],
+        "Command=(null)",
+        "WorkDir=%s" % job.work_dir,
+        "StdOut=%s" % (job.output if job.output != "" else os.path.join(job.work_dir, "slurm-%d.out" % job.id))
+    ]
+
+
+def write_records(records, oneliner):
+    if oneliner:
+        write_lines([" ".join(lines) for lines in records])
+    else:
+        write_lines(["\n   ".join(lines) + "\n" for lines in records])
+
+
+def scontrol_show(sim, options, entity, name):
+    oneliner = options.get("oneliner", False)
+    use_json = options.get("json", False)
+
+    if entity in ["node", "nodes"]:
+        if name is not None:
+            nodes = sim.expand_node_list(name) if "[" in name or "," in name else [sim.node_index(name)]
+            if None in nodes:
+                raise SimError("Node %s not found" % name)
+        else:
+            nodes = [(part, local) for part, partition in enumerate(sim.partitions)
+                     for local in range(partition["nodes"])]
+
+        alloc = sim.node_usage()
+        infos = (node_info(sim, part, local, alloc[sim.first_node[part] + local]) for part, local in nodes)
+
+        if use_json:
+            write_json("nodes", (node_json(info) for info in infos), {"last_update": number(int(sim.now))})
+        else:
+            write_records((node_text(info) for info in infos), oneliner)
+
+    elif entity in ["partition", "partitions"]:
+        if name is not None:
+            if name not in sim.partition_index:
+                raise SimError("Partition %s not found" % name)
+            parts = [sim.partition_index[name]]
+        else:
+            parts = list(range(len(sim.partitions)))
+
+        if use_json:
+            write_json("partitions", [partition_json(sim, part) for part in parts])
+        else:
+            write_records([partition_text(sim, part) for part in parts], oneliner)
+
+    elif entity in ["res", "reservation", "reservations"]:
+        reservations = [reservation for reservation in sim.reservations()
+                        if name is None or reservation["name"] == name and reservation["end_time"] > sim.now]
+
+        if name is not None and len(reservations) == 0:
+            raise SimError("Reservation %s not found" % name)
+
+        if use_json:
+            write_json("reservations", [reservation_json(sim, reservation) for reservation in reservations])
+        elif len(reservations) == 0:
+            print("No reservations in the system")
+        else:
+            write_records([reservation_text(sim, reservation) for reservation in reservations], oneliner)
+
+    elif entity in ["job", "jobs"]:
+        if name is not None:
+            job = sim.job(name)
+            if job is None:
+                raise SimError("slurm_load_jobs error: Invalid job id specified")
+            jobs = [job]
+        else:
+            jobs = sim.queue()
+
+        if use_json:
+            write_json("jobs", (job_json(sim, job) for job in jobs))
+        else:
+            write_records((job_text(sim, job) for job in jobs), oneliner)
+
+    else:
+        raise SimError("invalid entity: %s for keyword: show" % entity)
+
+    return 0
+
+
+def scontrol_hold(sim, command, jobids):
+    with sim.modify() as state:
+        for jobid in jobids:
+            job = sim.job(jobid)
+            if job is None or not job.submitted or job.state != "PENDING":
+                raise SimError("Invalid job id specified for job %s" % jobid)
+
+            record = state["jobs"][str(job.id)]
+
+            if command == "hold":
+                record["hold"] = True
+            elif record.get("hold", False):
+                del record["hold"]
+                delay = record["start_time"] - record["submit_time"]
+                record["start_time"] = max(record["start_time"], sim.now + delay)
+
+    return 0
+
+
+# scontrol update JobId=... fields and the sbatch options they replace
+
+update_fields = {
+    "partition": "partition", "account": "account", "timelimit": "time", "numnodes": "nodes",
+    "numtasks": "ntasks", "features": "constraint", "minmemorynode": "mem", "reservation": "reservation",
+    "name": "name", "jobname": "name"
+}
+
+
+def scontrol_update(sim, assignments):
+    values = {}
+
+    for assignment in assignments:
+        key, sep, value = assignment.partition("=")
+        if not sep:
+            raise SimError("Invalid input: %s" % assignment)
+        values[key.lower()] = value
+
+    if "jobid" not in values:
+        raise SimError("No job identification field found")
+
+    for key in values:
+        if key != "jobid" and key not in update_fields:
+            raise SimError("Update of this parameter is not supported: %s" % key)
+
+    with sim.modify() as state:
+        job = sim.job(values["jobid"])
+
+        if job is None or not job.submitted:
+            raise SimError("Invalid job id specified")
+        if job.state != "PENDING":
+            raise SimError("Job is no longer pending execution for job %s" % job.id)
+
+        record = state["jobs"][str(job.id)]
+        options = dict(record.get("options", {}))
+
+        for key, value in values.items():
+            if key == "jobid":
+                continue
+            if key == "numtasks":
+                options.pop("ntasks_per_node", None)
+            if value == "":
+                options.pop(update_fields[key], None)
+            else:
+                options[update_fields[key]] = value
+
+        try:
+            updated = job_record(sim, options, record["name"], job.id)
+        except SimError as e:
+            raise SimError(str(e).replace("Batch job submission failed: ", ""))
+
+        for key in ["submit_time", "start_time", "work_dir", "output"]:
+            updated[key] = record[key]
+
+        if record.get("hold", False):
+            updated["hold"] = True
+
+        updated["options"] = options
+
+        state["jobs"][str(job.id)] = updated
+
+    return 0
+
+
+def scontrol(sim, args):
+    options, positional = parse_options(args, scontrol_options)
+
+    if len(positional) == 0:
+        raise SimError("no command given")
+
+    command = positional[0].lower()
+
+    if command == "show" and len(positional) >= 2:
+        return scontrol_show(sim, options, positional[1].lower(), positional[2] if len(positional) > 2 else None)
+    elif command in ["hold", "release"] and len(positional) >= 2:
+        return scontrol_hold(sim, command, split_list(",".join(positional[1:])))
+    elif command == "update" and len(positional) >= 2:
+        return scontrol_update(sim, positional[1:])
+    elif command == "ping":
+        print("Slurmctld(primary) at simctl is UP")
+        return 0
+    else:
+        raise SimError("invalid keyword: %s" % " ".join(positional))
+
+
+# sinfo
+
+sinfo_fields = {
+    "P": "PARTITION", "R": "PARTITION", "a": "AVAIL", "l": "TIMELIMIT", "D": "NODES", "t": "STATE", "T": "STATE",
+    "N": "NODELIST", "n": "HOSTNAMES", "c": "CPUS", "m": "MEMORY", "f": "AVAIL_FEATURES", "b": "ACTIVE_FEATURES",
+    "G": "GRES", "O": "CPU_LOAD", "e": "FREE_MEM", "C": "CPUS(A/I/O/T)", "F": "NODES(A/I/O/T)", "E": "REASON",
+    "z": "S:C:T"
+}
+
+# Fields summed or joined over the nodes of a line
+
+sinfo_aggregates = ["D", "N", "n", "C", "F"]
+
+sinfo_options = {
+    "-h": ("noheader", False), "--noheader": ("noheader", False),
+    "-o": ("format", True), "--format": ("format", True),
+    "-N": ("node", False), "--Node": ("node", False),
+    "-p": ("partition", True), "--partition": ("partition", True),
+    "-n": ("nodes", True), "--nodes": ("nodes", True),
+    "-t": ("states", True), "--states": ("states", True),
+    "-s": ("summarize", False), "--summarize": ("summarize", False),
+    "-l": ("long", False), "--long": ("long", False),
+    "-a": ("all", False), "--all": ("all", False),
+    "-r": ("responding", False), "--responding": ("responding", False),
+    "-V": ("version", False), "--version": ("version", False)
+}
+
+compact_states = {"IDLE": "idle", "MIXED": "mix", "ALLOCATED": "alloc", "DOWN": "down"}
+long_states = {"IDLE": "idle", "MIXED": "mixed", "ALLOCATED": "allocated", "DOWN": "down"}
+
+
+def sinfo_values(sim, part, local, info):
+    partition = sim.partitions[part]
+    state = info["state"]
+
+    if "DRAIN" in state:
+        compact = long = "drain" if info["alloc"] == 0 else "drng"
+    else:
+        compact = compact_states[state[0]]
+        long = long_states[state[0]]
+
+    if "NOT_RESPONDING" in state:
+        compact += "*"
+        long += "*"
+
+    cpus = info["cpus"]
+    other = cpus if state[0] == "DOWN" or "DRAIN" in state else 0
+    allocated = info["alloc"]
+
+    return {
+        "P": partition["name"] + ("*" if partition.get("default", False) else ""), "R": partition["name"],
+        "a": "up", "l": long_duration(partition["max_time"] * 60), "t": compact, "T": long, "c": str(cpus),
+        "m": str(info["memory"]), "f": ",".join(info["features"]), "b": ",".join(info["features"]),
+        "G": info["gres"] if info["gres"] != "" else "(null)", "O": "%.2f" % (info["load"] / 100.0),
+        "e": str(info["free_memory"]) if state[0] != "DOWN" else "N/A",
+        "E": info["reason"].split(" [")[0] if info["reason"] != "" else "none", "z": "2:%d:1" % (cpus // 2),
+        "nodes": [(part, local)],
+        "cpus": [allocated, cpus - allocated - other, other, cpus],
+        "node_states": [int(allocated > 0 and other == 0), int(allocated == 0 and other == 0), int(other > 0), 1]
+    }
+
+
+def sinfo(sim, args):
+    options, positional = parse_options(args, sinfo_options)
+
+    if options.get("version", False):
+        print("slurm %s" % slurm_version)
+        return 0
+
+    node_oriented = options.get("node", False)
+
+    if "format" in options:
+        format_string = options["format"]
+    elif options.get("summarize", False):
+        format_string = "%9P %.5a %.10l %.16F  %N"
+    elif node_oriented:
+        format_string = "%N %.6D %9P %6t"
+    else:
+        format_string = "%9P %.5a %.10l %.6D %.6t %N"
+
+    format_string = format_string.replace("%#P", "%9P")
+
+    template, letters = compile_format(format_string, sinfo_fields, "node")
+
+    if options.get("summarize", False):
+        group_letters = [letter for letter in letters if letter in ["P", "R", "a", "l"]]
+    else:
+        group_letters = [letter for letter in letters if letter not in sinfo_aggregates]
+
+    partitions = split_list(options.get("partition", ""))
+    states = [state.lower() for state in split_list(options.get("states", ""))]
+
+    if "nodes" in options:
+        selected_nodes = set(sim.expand_node_list(options["nodes"]))
+    else:
+        selected_nodes = None
+
+    alloc = sim.node_usage()
+
+    groups = {}
+
+    for part, partition in enumerate(sim.partitions):
+        if len(partitions) > 0 and partition["name"] not in partitions:
+            continue
+
+        for local in range(partition["nodes"]):
+            if selected_nodes is not None and (part, local) not in selected_nodes:
+                continue
+
+            values = sinfo_values(sim, part, local, node_info(sim, part, local, alloc[sim.first_node[part] + local]))
+
+            if len(states) > 0 and values["T"].rstrip("*") not in states and values["t"].rstrip("*") not in states:
+                continue
+
+            if node_oriented:
+                key = (part, local)
+            else:
+                key = tuple([values[letter] for letter in group_letters])
+
+            if key in groups:
+                group = groups[key]
+                group["nodes"] += values["nodes"]
+                group["cpus"] = [a + b for a, b in zip(group["cpus"], values["cpus"])]
+                group["node_states"] = [a + b for a, b in zip(group["node_states"], values["node_states"])]
+            else:
+                groups[key] = values
+
+    lines = []
+
+    if not options.get("noheader", False):
+        lines.append(template % sinfo_fields)
+
+    for values in groups.values():
+        parts = {}
+        for part, local in values["nodes"]:
+            parts.setdefault(part, []).append(local)
+
+        values["N"] = values["n"] = ",".join([sim.node_list(part, locals) for part, locals in parts.items()])
+        values["D"] = str(len(values["nodes"]))
+        values["C"] = "/".join([str(value) for value in values["cpus"]])
+        values["F"] = "/".join([str(value) for value in values["node_states"]])
+
+        lines.append(template % values)
+
+    write_lines(lines)
+
+    return 0
+
+
+# sacct
+
+sacct_fields = {
+    "jobid": ("JobID", 12), "jobidraw": ("JobIDRaw", 12), "jobname": ("JobName", 10),
+    "partition": ("Partition", 10), "account": ("Account", 10), "alloccpus": ("AllocCPUS", 10),
+    "state": ("State", 10), "exitcode": ("ExitCode", 8), "elapsed": ("Elapsed", 10), "start": ("Start", 19),
+    "end": ("End", 19), "submit": ("Submit", 19), "nodelist": ("NodeList", 15), "user": ("User", 9),
+    "nnodes": ("NNodes", 8), "timelimit": ("Timelimit", 10), "workdir": ("WorkDir", 20)
+}
+
+sacct_options = {
+    "-n": ("noheader", False), "--noheader": ("noheader", False),
+    "-P": ("parsable2", False), "--parsable2": ("parsable2", False),
+    "-p": ("parsable", False), "--parsable": ("parsable", False),
+    "-X": ("allocations", False), "--allocations": ("allocations", False),
+    "-b": ("brief", False), "--brief": ("brief", False),
+    "-o": ("format", True), "--format": ("format", True),
+    "-j": ("jobs", True), "--jobs": ("jobs", True),
+    "-u": ("user", True), "--user": ("user", True),
+    "-a": ("allusers", False), "--allusers": ("allusers", False),
+    "-S": ("starttime", True), "--starttime": ("starttime", True),
+    "-E": ("endtime", True), "--endtime": ("endtime", True),
+    "-s": ("state", True), "--state": ("state", True),
+    "-L": ("allclusters", False), "--allclusters": ("allclusters", False),
+    "--json": ("json", False)
+}
+
+
+def job_steps(sim, job):
+    """Return (step name, state, exit code) of the steps of a started job"""
+
+    if job.start_time == 0:
+        return []
+
+    if job.state in ["RUNNING", "COMPLETING"]:
+        return [("batch", "RUNNING", "0:0"), ("extern", "RUNNING", "0:0")]
+    elif job.state in ["CANCELLED", "TIMEOUT"]:
+        return [("batch", "CANCELLED", "0:15"), ("extern", "COMPLETED", "0:0")]
+    else:
+        return [("batch", job.state, job.exit_code), ("extern", "COMPLETED", "0:0")]
+
+
+def sacct_values(sim, job, step=None):
+    values = squeue_values(sim, job)
+
+    if job.state == "RUNNING":
+        elapsed = int(sim.now - job.start_time)
+    else:
+        elapsed = job.elapsed
+
+    if step is None:
+        state = job.state + (" by 1000" if job.state == "CANCELLED" else "")
+        return {
+            "jobid": str(job.id), "jobidraw": str(job.id), "jobname": job.name, "partition": job.partition,
+            "account": job.account, "alloccpus": str(job.cpus), "state": state, "exitcode": job.exit_code,
+            "elapsed": long_duration(elapsed), "start": timestamp(job.start_time, "Unknown"),
+            "end": timestamp(job.end_time, "Unknown"), "submit": timestamp(job.submit_time),
+            "nodelist": values["N"] if values["N"] != "" else "None assigned", "user": job.user,
+            "nnodes": str(job.node_count), "timelimit": long_duration(job.time_limit), "workdir": job.work_dir
+        }
+    else:
+        name, state, exit_code = step
+        first_node = sim.node_name(*job.nodes[0]) if len(job.nodes) > 0 else ""
+        return {
+            "jobid": "%d.%s" % (job.id, name), "jobidraw": "%d.%s" % (job.id, name), "jobname": name,
+            "partition": "", "account": job.account, "alloccpus": str(job.cpus), "state": state,
+            "exitcode": exit_code, "elapsed": long_duration(elapsed), "start": timestamp(job.start_time, "Unknown"),
+            "end": timestamp(job.end_time, "Unknown"), "submit": timestamp(job.start_time),
+            "nodelist": first_node if name == "batch" else values["N"], "user": "", "nnodes": "1",
+            "timelimit": "", "workdir": ""
+        }
+
+
+def accounting_json(sim, job):
+    def exit_code(code):
+        return_code, signal = [int(value) for value in code.split(":")]
+        return {"status": ["SUCCESS"] if return_code == 0 and signal == 0 else ["SIGNALED"],
+                "return_code": number(return_code), "signal": {"id": number(signal), "name": ""}}
+
+    values = squeue_values(sim, job)
+
+    return {
+        "job_id": job.id, "name": job.name, "user": job.user, "account": job.account, "partition": job.partition,
+        "state": {"current": [job.state], "reason": "None"}, "exit_code": exit_code(job.exit_code),
+        "nodes": values["N"], "array": {"job_id": 0, "task_id": {"set": False, "infinite": False, "number": 0}},
+        "time": {"submission": job.submit_time, "start": job.start_time, "end": job.end_time,
+                 "elapsed": job.elapsed, "limit": number(job.time_limit // 60)},
+        "steps": [{"step": {"id": "%d.%s" % (job.id, name), "name": name}, "state": [state],
+                   "exit_code": exit_code(code)} for name, state, code in job_steps(sim, job)]
+    }
+
+
+def sacct(sim, args):
+    options, positional = parse_options(args, sacct_options)
+
+    if "jobs" in options:
+        jobs = [sim.job(jobid) for jobid in split_list(options["jobs"])]
+        jobs = [job for job in jobs if job is not None]
+    else:
+        users = split_list(options.get("user", sim.cluster["user"]))
+        jobs = [job for job in sim.submitted_jobs() if options.get("allusers", False) or job.user in users]
+
+    if "state" in options:
+        states = state_filter(options["state"])
+        if states is not None:
+            jobs = [job for job in jobs if job.state in states]
+
+    if options.get("json", False):
+        write_json("jobs", [accounting_json(sim, job) for job in jobs])
+        return 0
+
+    if "format" in options:
+        names = split_list(options["format"])
+    elif options.get("brief", False):
+        names = ["jobid", "state", "exitcode"]
+    else:
+        names = ["jobid", "jobname", "partition", "account", "alloccpus", "state", "exitcode"]
+
+    columns = []
+
+    for name in names:
+        field, sep, width = name.partition("%")
+        field = field.lower()
+        if field not in sacct_fields:
+            raise SimError("Invalid field requested: \"%s\"" % field)
+        columns.append((field, sacct_fields[field][0], int(width) if sep else sacct_fields[field][1]))
+
+    parsable = options.get("parsable", False) or options.get("parsable2", False)
+    terminator = "|" if options.get("parsable", False) else ""
+
+    def row(values):
+        if parsable:
+            return "|".join(values) + terminator
+        else:
+            return " ".join([value[:width].rjust(width) for value, (field, title, width) in zip(values, columns)])
+
+    lines = []
+
+    if not options.get("noheader", False):
+        lines.append(row([title for field, title, width in columns]))
+        if not parsable:
+            lines.append(" ".join(["-" * width for field, title, width in columns]))
+
+    for job in jobs:
+        rows = [sacct_values(sim, job)]
+        if not options.get("allocations", False):
+            rows += [sacct_values(sim, job, step) for step in job_steps(sim, job)]
+        for values in rows:
+            lines.append(row([values[field] for field, title, width in columns]))
+
+    write_lines(lines)
+
+    return 0
+
+
+# sacctmgr
+
+sacctmgr_options = {
+    "-P": ("parsable2", False), "--parsable2": ("parsable2", False),
+    "-p": ("parsable", False), "--parsable": ("parsable", False),
+    "-n": ("noheader", False), "--noheader": ("noheader", False),
+    "-i": ("immediate", False), "--immediate": ("immediate", False)
+}
+
+
+def sacctmgr(sim, args):
+    options, positional = parse_options(args, sacctmgr_options)
+
+    words = [word for word in positional if word.lower() not in ["where"]]
+
+    if len(words) < 2 or words[0].lower() not in ["show", "list"]:
+        raise SimError("Unknown option: %s" % " ".join(positional))
+
+    entity = words[1].lower()
+    with_assoc = False
+    names = []
+
+    for word in words[2:]:
+        key, sep, value = word.partition("=")
+        if word.lower() == "withassoc":
+            with_assoc = True
+        elif sep and key.lower() in ["name", "names", "user", "users", "account", "accounts"]:
+            names += split_list(value)
+        elif not sep:
+            names += split_list(word)
+
+    user_accounts = sim.user_accounts()
+
+    if entity in ["user", "users"]:
+        users = [user for user in sorted(user_accounts) if len(names) == 0 or user in names]
+        if with_assoc:
+            header = ["User", "Def Acct", "Admin", "Cluster", "Account", "Partition", "Share", "Priority",
+                      "MaxJobs", "MaxNodes", "MaxCPUs", "MaxSubmit", "MaxWall", "MaxCPUMins", "QOS", "Def QOS"]
+            rows = [[user, user_accounts[user][0], "None", sim.cluster["name"], account, "", "1", "", "", "", "",
+                     "", "", "", "normal", ""] for user in users for account in user_accounts[user]]
+        else:
+            header = ["User", "Def Acct", "Admin"]
+            rows = [[user, user_accounts[user][0], "None"] for user in users]
+    elif entity in ["account", "accounts"]:
+        accounts = sorted(set([account for user in user_accounts for account in user_accounts[user]]))
+        header = ["Account", "Descr", "Org"]
+        rows = [[account, account, "simulated"] for account in accounts if len(names) == 0 or account in names]
+    elif entity in ["assoc", "association", "associations"]:
+        header = ["Cluster", "Account", "User", "Partition", "Share", "QOS", "Def QOS"]
+        rows = [[sim.cluster["name"], account, user, "", "1", "normal", ""] for user in sorted(user_accounts)
+                for account in user_accounts[user] if len(names) == 0 or user in names]
+    else:
+        raise SimError("Unknown option: %s" % entity)
+
+    parsable = options.get("parsable", False) or options.get("parsable2", False)
+    terminator = "|" if options.get("parsable", False) else ""
+
+    lines = []
+
+    if parsable:
+        if not options.get("noheader", False):
+            lines.append("|".join(header) + terminator)
+        lines += ["|".join(row) + terminator for row in rows]
+    else:
+        if not options.get("noheader", False):
+            lines.append(" ".join([title[:10].rjust(10) for title in header]))
+            lines.append(" ".join(["-" * 10 for title in header]))
+        lines += [" ".join([value[:10].rjust(10) for value in row]) for row in rows]
+
+    write_lines(lines)
+
+    return 0
+
+
+# scancel
+
+scancel_options = {
+    "-u": ("user", True), "--user": ("user", True), "--me": ("me", False),
+    "-p": ("partition", True), "--partition": ("partition", True),
+    "-t": ("states", True), "--state": ("states", True),
+    "-n": ("name", True), "--name": ("name", True),
+    "-s": ("signal", True), "--signal": ("signal", True),
+    "-Q": ("quiet", False), "--quiet": ("quiet", False),
+    "-v": ("verbose", False), "--verbose": ("verbose", False)
+}
+
+
+def scancel(sim, args):
+    options, positional = parse_options(args, scancel_options)
+
+    users = split_list(options.get("user", ""))
+
+    if options.get("me", False):
+        users.append(sim.cluster["user"])
+
+    status = 0
+
+    with sim.modify() as state:
+        if len(positional) > 0:
+            jobs = []
+            for jobid in positional:
+                job = sim.job(jobid.split("_")[0])
+                if job is None:
+                    print("scancel: error: Kill job error on job id %s: Invalid job id specified" % jobid,
+                          file=sys.stderr)
+                    status = 1
+                elif job.state not in active_states:
+                    if not options.get("quiet", False):
+                        print("scancel: error: Kill job error on job id %s: Job/step already completing or completed"
+                              % jobid, file=sys.stderr)
+                else:
+                    jobs.append(job)
+        elif len(users) > 0 or "name" in options or "partition" in options:
+            jobs = list(sim.queue())
+        else:
+            raise SimError("No job identification provided")
+
+        states = state_filter(options["states"]) if "states" in options else None
+
+        for job in jobs:
+            if len(users) > 0 and job.user not in users:
+                continue
+            if "name" in options and job.name != options["name"]:
+                continue
+            if "partition" in options and job.partition != options["partition"]:
+                continue
+            if states is not None and job.state not in states:
+                continue
+
+            if job.submitted:
+                state["jobs"][str(job.id)]["cancel_time"] = sim.now
+            else:
+                state["cancelled"][str(job.id)] = sim.now
+
+    return status
+
+
+# sbatch
+
+sbatch_options = {
+    "-J": ("name", True), "--job-name": ("name", True),
+    "-p": ("partition", True), "--partition": ("partition", True),
+    "-A": ("account", True), "--account": ("account", True),
+    "-t": ("time", True), "--time": ("time", True),
+    "-N": ("nodes", True), "--nodes": ("nodes", True),
+    "-n": ("ntasks", True), "--ntasks": ("ntasks", True),
+    "-c": ("cpus_per_task", True), "--cpus-per-task": ("cpus_per_task", True),
+    "--ntasks-per-node": ("ntasks_per_node", True),
+    "-C": ("constraint", True), "--constraint": ("constraint", True),
+    "--gres": ("gres", True), "-G": ("gpus", True), "--gpus": ("gpus", True),
+    "--gpus-per-node": ("gpus_per_node", True),
+    "--mem": ("mem", True), "--mem-per-cpu": ("mem_per_cpu", True),
+    "-o": ("output", True), "--output": ("output", True),
+    "-e": ("error", True), "--error": ("error", True),
+    "-D": ("chdir", True), "--chdir": ("chdir", True),
+    "--reservation": ("reservation", True),
+    "-w": ("nodelist", True), "--nodelist": ("nodelist", True),
+    "-x": ("exclude", True), "--exclude": ("exclude", True),
+    "--exclusive": ("exclusive", False), "-s": ("oversubscribe", False), "--oversubscribe": ("oversubscribe", False),
+    "--parsable": ("parsable", False), "-H": ("hold", False), "--hold": ("hold", False),
+    "-Q": ("quiet", False), "--quiet": ("quiet", False),
+    "-q": ("qos", True), "--qos": ("qos", True), "--begin": ("begin", True),
+    "--mail-type": ("mail_type", True), "--mail-user": ("mail_user", True),
+    "--export": ("export", True), "--comment": ("comment", True), "--signal": ("signal", True),
+    "--tmp": ("tmp", True), "-L": ("licenses", True), "--licenses": ("licenses", True),
+    "--requeue": ("requeue", False), "--no-requeue": ("requeue", False), "--wrap": ("wrap", True)
+}
+
+
+def script_options(script):
+    """Return the #SBATCH arguments of a job script"""
+
+    args = []
+
+    for line in script.split("\n"):
+        line = line.strip()
+        if line.startswith("#SBATCH"):
+            args += shlex.split(line[7:], comments=True)
+        elif line != "" and not line.startswith("#"):
+            break
+
+    return args
+
+
+def constraint_nodes(sim, part, constraint):
+    """Return local indices of the nodes in partition matching constraint"""
+
+    alternatives = [[feature for feature in re.split(r"[&,]", alternative) if feature != ""]
+                    for alternative in constraint.replace("[", "").replace("]", "").split("|")]
+
+    known = set()
+
+    for partition in sim.partitions:
+        known.update(partition["features"])
+
+    for alternative in alternatives:
+        for feature in alternative:
+            if feature not in known and not feature.startswith("rack-"):
+                raise SimError("Batch job submission failed: Invalid feature specification")
+
+    nodes = []
+
+    for local in range(sim.partitions[part]["nodes"]):
+        features = sim.node_features(part, local)
+        if any([all([feature in features for feature in alternative]) for alternative in alternatives]):
+            nodes.append(local)
+
+    return nodes
+
+
+def sbatch(sim, args):
+    options, positional = parse_options(args, sbatch_options)
+
+    if "wrap" in options:
+        script = "#!/bin/sh\n%s\n" % options["wrap"]
+    elif len(positional) > 0:
+        with open(positional[0]) as script_file:
+            script = script_file.read()
+    else:
+        script = sys.stdin.read()
+
+    if not script.startswith("#!"):
+        raise SimError("This does not look like a batch script.  The first line must start with #! followed by "
+                       "the path to an interpreter.")
+
+    # Command line options override the #SBATCH lines
+
+    script_values, script_positional = parse_options(script_options(script), sbatch_options)
+    script_values.update(options)
+    options = script_values
+
+    default_name = os.path.basename(positional[0]) if len(positional) > 0 else "sbatch"
+
+    with sim.modify() as state:
+        jobid = state["next_jobid"]
+
+        record = job_record(sim, options, default_name, jobid)
+        record["options"] = options
+
+        if options.get("hold", False):
+            record["hold"] = True
+
+        state["jobs"][str(jobid)] = record
+        state["next_jobid"] += 1
+
+    if options.get("parsable", False):
+        print(jobid)
+    elif not options.get("quiet", False):
+        print("Submitted batch job %d" % jobid)
+
+    return 0
+
+
+def job_record(sim, options, default_name, jobid):
+    """Validate sbatch options, select nodes and return the job record"""
+
+    user = sim.cluster["user"]
+    accounts = sim.user_accounts()[user]
+
+    # Nodes given with -w select the partition
+
+    requested_nodes = sim.expand_node_list(options["nodelist"]) if "nodelist" in options else []
+
+    if "partition" in options:
+        partition_name = options["partition"].split(",")[0]
+    elif len(requested_nodes) > 0:
+        partition_name = sim.partitions[requested_nodes[0][0]]["name"]
+    else:
+        partition_name = [partition["name"] for partition in sim.partitions if partition.get("default", False)][0]
+
+    if partition_name not in sim.partition_index:
+        raise SimError("Batch job submission failed: Invalid partition name specified")
+
+    account = options.get("account", accounts[0])
+
+    if account not in accounts:
+        raise SimError("Batch job submission failed: Invalid account or account/partition combination specified")
+
+    part = sim.partition_index[partition_name]
+    partition = sim.partitions[part]
+
+    time_limit = parse_time_limit(options["time"]) if "time" in options else 3600
+    max_time = partition["max_time"] * 60
+
+    if time_limit < 0:
+        time_limit = max_time
+    elif time_limit > max_time:
+        raise SimError("Batch job submission failed: Requested time limit is invalid (missing or exceeds some limit)")
+
+    node_count = int(options.get("nodes", "1").split("-")[0])
+
+    if "ntasks_per_node" in options:
+        tasks_per_node = int(options["ntasks_per_node"])
+    else:
+        tasks_per_node = max(1, -(-int(options.get("ntasks", "1")) // node_count))
+
+    cpus_per_node = tasks_per_node * int(options.get("cpus_per_task", "1"))
+
+    if options.get("exclusive", False):
+        cpus_per_node = partition["cpus"]
+
+    if "gres" in options and partition["gres"] == "":
+        raise SimError("Batch job submission failed: Invalid generic resource (gres) specification")
+
+    memory = options.get("mem", "0").rstrip("MGmg") or "0"
+
+    if cpus_per_node > partition["cpus"] or int(memory) > partition["memory"]:
+        raise SimError("Batch job submission failed: Requested node configuration is not available")
+
+    # Select nodes
+
+    if "reservation" in options:
+        reservations = [reservation for reservation in sim.reservations()
+                        if reservation["name"] == options["reservation"] and reservation["end_time"] > sim.now]
+        if len(reservations) == 0 or reservations[0]["part"] != part:
+            raise SimError("Batch job submission failed: Requested reservation is invalid")
+        candidates = reservations[0]["nodes"]
+    elif len(requested_nodes) > 0:
+        if any([node_part != part for node_part, local in requested_nodes]):
+            raise SimError("Batch job submission failed: Requested node configuration is not available")
+        candidates = [local for node_part, local in requested_nodes]
+        node_count = max(node_count, len(candidates))
+    else:
+        candidates = list(range(partition["nodes"]))
+
+    if "constraint" in options:
+        matching = set(constraint_nodes(sim, part, options["constraint"]))
+        candidates = [local for local in candidates if local in matching]
+
+    candidates = [local for local in candidates if sim.node_down(part, local) == ""]
+
+    if len(candidates) < node_count:
+        raise SimError("Batch job submission failed: Requested node configuration is not available")
+
+    rng = random.Random(jobid)
+
+    if len(requested_nodes) > 0:
+        nodes = candidates[:node_count]
+    else:
+        first = rng.randrange(len(candidates))
+        nodes = [candidates[(first + n) % len(candidates)] for n in range(node_count)]
+
+    delay_min, delay_max = sim.cluster["start_delay"]
+    work_dir = os.path.abspath(options.get("chdir", os.getcwd()))
+    output = options.get("output", "slurm-%j.out").replace("%j", str(jobid)).replace("%u", user)
+
+    return {
+        "name": options.get("name", default_name),
+        "user": user,
+        "account": account,
+        "partition": partition_name,
+        "nodes": nodes,
+        "cpus": cpus_per_node * node_count,
+        "time_limit": time_limit,
+        "run_time": time_limit,
+        "features": options.get("constraint", ""),
+        "submit_time": sim.now,
+        "start_time": sim.now + rng.uniform(delay_min, delay_max),
+        "work_dir": work_dir,
+        "output": os.path.join(work_dir, output)
+    }
+
+
+tool_functions = {"sbatch": sbatch, "squeue": squeue, "scontrol": scontrol, "sinfo": sinfo, "sacct": sacct,
+                  "sacctmgr": sacctmgr, "scancel": scancel}
+
+
+def run_tool(tool, args):
+    try:
+        sim = Simulator(os.environ.get("SLURM_SIM_DIR", ""))
+        sim.sleep_latency(tool)
+        return tool_functions[tool](sim, args)
+    except SimError as e:
+        message = str(e)
+        if tool in ["sbatch", "squeue", "sinfo", "sacct", "scancel"] and not message.startswith("slurm_"):
+            message = "%s: error: %s" % (tool, message)
+        print(message, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        sys.stderr.close()
+        return 1
+
+
+def parse_latency(values):
+    latency = {"default": 0.0}
+
+    for value in values:
+        name, sep, seconds = value.rpartition("=")
+        latency[name if sep else "default"] = float(seconds)
+
+    return latency
+
+
+def status(sim):
+    counts = {}
+
+    for job in sim.queue():
+        counts[job.state] = counts.get(job.state, 0) + 1
+
+    alloc = sim.node_usage()
+
+    print("Simulated time : %s (%.0f s since start, speed %g)" % (
+        timestamp(sim.now), sim.now - sim.epoch, sim.state["clock"]["speed"]))
+    print("Nodes          : %d, %d with allocations" % (sim.node_count, sum([1 for value in alloc if value > 0])))
+    print("Partitions     : %s" % ", ".join(["%s (%d)" % (partition["name"], partition["nodes"])
+                                            for partition in sim.partitions]))
+    print("Jobs           : %s" % ", ".join(["%s %d" % (state, count) for state, count in sorted(counts.items())]))
+    print("Submitted jobs : %d" % len(sim.state["jobs"]))
+    print("Latency        : %s, jitter %g s" % (sim.state["latency"], sim.state.get("jitter", 0.0)))
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1 and sys.argv[1] in tools:
+        sys.exit(run_tool(sys.argv[1], sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description="Synthetic Slurm cluster simulator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = commands.add_parser("init", help="create a simulated cluster")
+    init_parser.add_argument("directory")
+    init_parser.add_argument("--nodes", type=int, default=10000)
+    init_parser.add_argument("--jobs", type=int, default=100000)
+    init_parser.add_argument("--seed", type=int, default=42)
+    init_parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per second")
+    init_parser.add_argument("--latency", action="append", default=[], help="seconds or tool=seconds")
+    init_parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency in seconds")
+    init_parser.add_argument("--cluster", default="", help="JSON file overriding cluster settings")
+
+    advance_parser = commands.add_parser("advance", help="move the simulated clock forward")
+    advance_parser.add_argument("directory")
+    advance_parser.add_argument("seconds", type=float)
+
+    latency_parser = commands.add_parser("latency", help="set tool latencies")
+    latency_parser.add_argument("directory")
+    latency_parser.add_argument("latency", nargs="+", help="seconds or tool=seconds")
+    latency_parser.add_argument("--jitter", type=float, default=None)
+
+    status_parser = commands.add_parser("status", help="print a summary of the cluster")
+    status_parser.add_argument("directory")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "init":
+            cluster = create_cluster(args.nodes, args.jobs, args.seed)
+            if args.cluster != "":
+                with open(args.cluster) as cluster_file:
+                    cluster.update(json.load(cluster_file))
+            sim = Simulator.create(args.directory, cluster, args.speed, parse_latency(args.latency), args.jitter)
+            print("Created %d nodes and %d background jobs in %s" % (sim.node_count, sim.job_count, sim.directory))
+            print("export PATH=%s:$PATH" % os.path.join(sim.directory, "bin"))
+        elif args.command == "advance":
+            sim = Simulator(args.directory)
+            with sim.modify() as state:
+                state["clock"]["offset"] += args.seconds
+        elif args.command == "latency":
+            sim = Simulator(args.directory)
+            with sim.modify() as state:
+                state["latency"] = parse_latency(args.latency)
+                if args.jitter is not None:
+                    state["jitter"] = args.jitter
+        elif args.command == "status":
+            status(Simulator(args.directory))
+    except SimError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
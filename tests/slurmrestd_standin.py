@@ -0,0 +1,255 @@
+import os, sys, re, json, time, tempfile, threading, socketserver
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+from lhpcdt import config, lrms, jobs, slurm_rest
+
+# Stand-in for slurmrestd replaying canned v0.0.39 responses. Run without
+# arguments to check the lrms rest backend over a temporary Unix socket, or with a port number to serve over HTTP for manual testing:
+#
+#   python slurmrestd_standin.py
+#   python slurmrestd_standin.py 6820
+
+api = "v0.0.39"
+
+now = int(time.time())
+
+
+def number(value):
+    return {"set": True, "infinite": False, "number": value}
+
+
+canned_jobs = [
+    {"job_id": 101, "partition": "lvis", "name": "gui_interactive", "user_name": "alice",
+     "job_state": ["RUNNING"], "time_limit": number(60), "start_time": number(now - 300),
+     "node_count": number(1), "nodes": "cn1", "state_reason": "None", "dependency": "",
+     "account": "lu-test", "cpus": number(16), "features": ""},
+    {"job_id": 102, "partition": "gpu", "name": "notebook", "user_name": "bob",
+     "job_state": ["PENDING"], "time_limit": number(30), "start_time": number(0),
+     "node_count": number(2), "nodes": "", "state_reason": "Priority", "dependency": "",
+     "account": "lu-test", "cpus": number(32), "features": "kepler"}
+]
+
+canned_nodes = [
+    {"name": "cn1", "architecture": "x86_64", "cores": 8, "cpus": 16, "alloc_cpus": 16, "cpu_load": 1592,
+     "features": ["rack-f1", "kepler"], "active_features": ["rack-f1", "kepler"], "gres": "gpu:k20:2",
+     "state": ["ALLOCATED"], "partitions": ["lvis", "gpu"], "reason": ""},
+    {"name": "cn2", "architecture": "x86_64", "cores": 8, "cpus": 16, "alloc_cpus": 0, "cpu_load": 1,
+     "features": ["rack-f1"], "active_features": ["rack-f1"], "gres": "",
+     "state": ["IDLE"], "partitions": ["lvis"], "reason": ""}
+]
+
+canned_partitions = [
+    {"name": "lvis", "nodes": {"configured": "cn[1-2]"}},
+    {"name": "gpu", "nodes": {"configured": "cn1"}}
+]
+
+canned_reservations = [
+    {"name": "course", "accounts": "lu-test", "node_list": "cn2", "start_time": number(now - 60),
+     "end_time": number(now + 3600), "flags": ["IGNORE_JOBS", "SPEC_NODES"], "tres": "cpu=16"}
+]
+
+canned_db_jobs = {
+    "103": {"job_id": 103, "state": {"current": ["COMPLETED"]},
+            "exit_code": {"status": ["SUCCESS"], "return_code": number(0)}, "steps": []}
+}
+
+
+def reply(key, elements):
+    return {"meta": {"plugin": {"type": "openapi/%s" % api}}, key: elements, "warnings": [], "errors": []}
+
+
+def error_reply(status, description):
+    return status, {"errors": [{"description": description, "error_number": 2017, "error": "Invalid job id"}]}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Replays canned responses with keep-alive connections"""
+
+    protocol_version = "HTTP/1.1"
+
+    submitted = []
+    cancelled = []
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def route(self, method, body):
+        path = self.path
+        StandinHandler.requests.append((method, path, self.headers.get("X-SLURM-USER-TOKEN", "")))
+
+        match = re.match(r"^/(slurm|slurmdb)/%s/(.*)$" % api, path)
+
+        if match is None:
+            return 404, {"errors": [{"description": "Unknown path %s" % path}]}
+
+        plugin, endpoint = match.groups()
+
+        if plugin == "slurmdb":
+            job_match = re.match(r"^job/(\d+)$", endpoint)
+            if method == "GET" and job_match and job_match.group(1) in canned_db_jobs:
+                return 200, reply("jobs", [canned_db_jobs[job_match.group(1)]])
+            return error_reply(404, "Job not found")
+
+        if method == "GET" and endpoint == "jobs":
+            return 200, reply("jobs", canned_jobs)
+        elif method == "GET" and endpoint == "nodes":
+            return 200, reply("nodes", canned_nodes)
+        elif method == "GET" and endpoint.startswith("node/"):
+            return 200, reply("nodes", [node for node in canned_nodes if node["name"] == endpoint[5:]])
+        elif method == "GET" and endpoint == "partitions":
+            return 200, reply("partitions", canned_partitions)
+        elif method == "GET" and endpoint == "reservations":
+            return 200, reply("reservations", canned_reservations)
+        elif endpoint.startswith("job/") and endpoint != "job/submit":
+            jobid = endpoint[4:]
+            found = [job for job in canned_jobs if str(job["job_id"]) == jobid]
+            if len(found) == 0:
+                return error_reply(404, "Invalid job id specified")
+            if method == "DELETE":
+                StandinHandler.cancelled.append(jobid)
+                return 200, reply("jobs", [])
+            return 200, reply("jobs", found)
+        elif method == "POST" and endpoint == "job/submit":
+            request = json.loads(body)
+            if request["job"].get("partition", "") == "invalid":
+                return error_reply(500, "Invalid partition name specified")
+            StandinHandler.submitted.append(request)
+            return 200, {"job_id": 200 + len(StandinHandler.submitted), "step_id": "batch", "errors": []}
+
+        return 404, {"errors": [{"description": "Unknown endpoint %s" % endpoint}]}
+
+    def handle_request(self, method):
+        length = int(self.headers.get("Content-Length", "0"))
+        body = self.rfile.read(length).decode("utf-8") if length > 0 else ""
+
+        status, data = self.route(method, body)
+        payload = json.dumps(data).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+
+class UnixStandinServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        return request, ["local", 0]
+
+
+def run_checks(socket_path):
+    cfg = config.GfxConfig.create()
+    cfg.backend = "rest"
+    cfg.rest_url = "unix://%s" % socket_path
+    cfg.rest_api_version = api
+
+    os.environ["SLURM_JWT"] = "standin-token"
+
+    client = slurm_rest.RestClient.shared()
+
+    queue = lrms.Queue()
+    queue.update()
+    print("Queue:", [dict(queue.jobs[jobid].items()) for jobid in queue.jobs])
+    assert sorted(queue.jobs) == ["101", "102"], list(queue.jobs)
+
+    queue.update(user="bob")
+    print("Queue (user=bob):", list(queue.jobs))
+    assert list(queue.jobs) == ["102"], list(queue.jobs)
+
+    slurm = lrms.Slurm()
+    slurm.query_partitions()
+    print("Partitions:", sorted(slurm.partitions), slurm.node_lists)
+    print("Nodes:", slurm.query_nodes())
+    print("Node cn2:", slurm.query_node("cn2"))
+    print("Reservations:", slurm.query_reservations())
+
+    job = jobs.Job(account="lu-test", partition="lvis", time="00:30:00")
+    job.add_constraint("kepler")
+    job.update()
+    submitted = slurm.submit(job)
+    print("Submit:", submitted, job.id)
+    assert submitted and job.id == 201, (submitted, job.id)
+
+    properties = {key: value for key, value in StandinHandler.submitted[-1]["job"].items() if key != "environment"}
+    print("Submitted job properties:", properties)
+    assert properties["account"] == "lu-test", properties
+    assert properties["partition"] == "lvis", properties
+    assert properties["constraints"] == "kepler", properties
+    assert properties["time_limit"] == number(30), properties
+
+    bad_job = jobs.Job(account="lu-test", partition="invalid")
+    submitted = slurm.submit(bad_job)
+    print("Submit (invalid partition):", submitted, bad_job.id, slurm.submit_error)
+    assert not submitted and bad_job.id == -1, (submitted, bad_job.id)
+    assert "Invalid partition name specified" in slurm.submit_error, slurm.submit_error
+
+    service = lrms.JobStatusService()
+    for jobid in ["101", "102", "103", "999"]:
+        service.add(jobid)
+    statuses = service.poll()
+    for jobid, status in sorted(statuses.items()):
+        print("Status %s:" % jobid, status["source"], status["status"], status["state"], status["nodes"],
+              status["time_left"], "finished" if service.is_finished(status) else "")
+
+    expected = {
+        "101": ("slurmrestd", "R", "RUNNING", "cn1", False),
+        "102": ("slurmrestd", "PD", "PENDING", "", False),
+        "103": ("sacct", "", "COMPLETED", "", True),
+        "999": ("none", "", "", "", False)
+    }
+
+    for jobid, status in statuses.items():
+        result = (status["source"], status["status"], status["state"], status["nodes"], service.is_finished(status))
+        assert result == expected[jobid], (jobid, result)
+
+    assert sorted(statuses) == sorted(expected), list(statuses)
+
+    running_job = jobs.Job()
+    running_job.id = 101
+    result = slurm.cancel_job(running_job)
+    print("Cancel:", result, StandinHandler.cancelled)
+    assert result == 0 and StandinHandler.cancelled == ["101"], (result, StandinHandler.cancelled)
+
+    tokens = {token for method, path, token in StandinHandler.requests}
+    print("%d requests on %d connections, tokens sent: %s" % (client.request_count, client.connection_count, tokens))
+    assert client.request_count == 15 and client.connection_count == 1, (client.request_count,
+                                                                         client.connection_count)
+    assert tokens == {"standin-token"}, tokens
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1:
+        server = ThreadingHTTPServer(("localhost", int(sys.argv[1])), StandinHandler)
+        print("Serving canned slurmrestd responses on http://localhost:%s" % sys.argv[1])
+        server.serve_forever()
+    else:
+        socket_path = os.path.join(tempfile.mkdtemp(), "slurmrestd.sock")
+
+        server = UnixStandinServer(socket_path, StandinHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            run_checks(socket_path)
+            print("ok")
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.remove(socket_path)
@@ -0,0 +1,86 @@
+import os, sys, shutil, tempfile
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+# Runs remote.GPUSampler and StatusProbe against a stub nvidia-smi that
+# prints canned --query-gpu output for 10 GPUs, one of them without
+# memory utilisation. In loop mode (-lms) the stub prints three rounds.
+#
+#   python test_gpu_sampler.py
+
+from lhpcdt import remote
+
+canned_output = """0, 12, 3, 1024, 40960
+1, 87, 45, 30000, 40960
+2, 0, 0, 0, 40960
+3, 100, 99, 40000, 40960
+4, 5, 1, 512, 40960
+5, 6, 2, 513, 40960
+6, 60, 30, 20000, 40960
+7, 70, 35, 21000, 40960
+8, 80, [N/A], 22000, 40960
+9, 90, 40, 23000, 40960
+"""
+
+stub_script = """#!/bin/sh
+rounds=1
+for arg in "$@"; do
+    [ "$arg" = "-lms" ] && rounds=3
+done
+while [ $rounds -gt 0 ]; do
+    cat "$(dirname "$0")/canned.csv"
+    rounds=$((rounds - 1))
+done
+"""
+
+
+def check_gpus(gpus):
+    assert len(gpus) == 10, gpus
+    assert [gpu.index for gpu in gpus] == list(range(10))
+    assert [gpu.utilization for gpu in gpus] == [12, 87, 0, 100, 5, 6, 60, 70, 80, 90]
+    assert gpus[1].memory_utilization == 45
+    assert gpus[1].memory_used == 30000
+    assert gpus[1].memory_total == 40960
+    assert gpus[8].memory_utilization == -1
+
+
+if __name__ == "__main__":
+
+    stub_dir = tempfile.mkdtemp(prefix="nvidia_smi_stub_")
+
+    try:
+        with open(os.path.join(stub_dir, "canned.csv"), "w") as f:
+            f.write(canned_output)
+
+        with open(os.path.join(stub_dir, "nvidia-smi"), "w") as f:
+            f.write(stub_script)
+
+        os.chmod(os.path.join(stub_dir, "nvidia-smi"), 0o755)
+        os.environ["PATH"] = stub_dir + os.pathsep + os.environ["PATH"]
+
+        check_gpus(remote.parse_gpu_query(canned_output))
+        assert remote.parse_gpu_query("") == []
+
+        sampler = remote.GPUSampler(local_exec=True)
+
+        check_gpus(sampler.sample())
+
+        rounds = list(sampler.stream(interval_ms=100))
+        assert len(rounds) == 3, rounds
+        for gpus in rounds:
+            check_gpus(gpus)
+
+        probe = remote.StatusProbe(local_exec=True)
+
+        probe.check_gpu_usage("")
+        check_gpus(probe.gpus)
+
+        probe.check_all("")
+        check_gpus(probe.gpus)
+        assert probe.gpu_usage == [12, 87, 0, 100, 5, 6, 60, 70, 80, 90]
+
+        print(probe.gpus)
+        print("ok")
+    finally:
+        shutil.rmtree(stub_dir)
@@ -0,0 +1,179 @@
+import os, sys, time, shutil, tempfile, threading
+
+sys.path.append("..")
+sys.path.append(os.path.join("..", "src"))
+
+# Runs the shared state daemon (lhpcdt-stated) against stub squeue,
+# scontrol and sinfo binaries put first on PATH. Checks that the daemon
+# polls once at startup, that lrms.Queue, Slurm.query_nodes(),
+# query_node_states(), query_node_details() and Slurm.job_status() are
+# served from its snapshot without running the SLURM tools, and that clients query SLURM directly once the socket is
+# gone:
+#
+#   python test_stated.py
+
+queue_lines = [
+    "1001;lu48;xterm;alice;RUNNING;10:00;1:00:00;1;cn001;50:00;(null);lu-test;48;(null);2025-01-01T10:00:00",
+    "1002;gpua40;paraview;bob;PENDING;0:00;2:00:00;1;(Priority);2:00:00;(null);lu-test;16;(null);N/A",
+    "1003;lu48;matlab;alice;PENDING;0:00;4:00:00;2;(Resources);4:00:00;(null);lu-other;96;(null);N/A"
+]
+
+node_lines = [
+    "NodeName=cn001 State=MIXED CPULoad=1.50 CPUAlloc=48 CPUTot=48 RealMemory=250000 FreeMem=200000 Partitions=lu48",
+    "NodeName=cn002 State=IDLE CPULoad=0.01 CPUAlloc=0 CPUTot=48 RealMemory=250000 FreeMem=245000 Partitions=lu48"
+]
+
+status_lines = [
+    "1001;R;RUNNING;cn001;50:00;10:00;1:00:00",
+    "1002;PD;PENDING;;2:00:00;0:00;2:00:00",
+    "1003;PD;PENDING;;4:00:00;0:00;4:00:00"
+]
+
+# Every call is logged, so the test can tell whether SLURM was queried
+
+stub_template = """#!/bin/sh
+echo "$(basename "$0") $*" >> "%(log)s"
+%(body)s
+"""
+
+squeue_body = """case "$*" in
+    *"%%i;%%t"*) cat <<'EOF'
+%s
+EOF
+    ;;
+    *) cat <<'EOF'
+%s
+EOF
+    ;;
+esac
+""" % ("\n".join(status_lines), "\n".join(queue_lines))
+
+scontrol_body = """cat <<'EOF'
+%s
+EOF
+""" % "\n".join(node_lines)
+
+sinfo_body = """echo "cn001 mixed 1.50 200000"
+echo "cn002 idle 0.01 245000"
+"""
+
+
+def write_stub(bin_dir, name, log_filename, body):
+    filename = os.path.join(bin_dir, name)
+
+    with open(filename, "w") as f:
+        f.write(stub_template % {"log": log_filename, "body": body})
+
+    os.chmod(filename, 0o755)
+
+
+def calls(log_filename, tool):
+    """Return the number of times tool was run"""
+
+    if not os.path.exists(log_filename):
+        return 0
+
+    with open(log_filename) as f:
+        return len([line for line in f if line.split()[0] == tool])
+
+
+if __name__ == "__main__":
+
+    test_dir = tempfile.mkdtemp(prefix="stated_test_")
+    bin_dir = os.path.join(test_dir, "bin")
+    log_filename = os.path.join(test_dir, "calls.log")
+    socket_path = os.path.join(test_dir, "stated.sock")
+
+    os.makedirs(bin_dir)
+
+    write_stub(bin_dir, "squeue", log_filename, squeue_body)
+    write_stub(bin_dir, "scontrol", log_filename, scontrol_body)
+    write_stub(bin_dir, "sinfo", log_filename, sinfo_body)
+
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    os.environ["HOME"] = test_dir
+    os.environ["LHPCDT_STATE_SOCKET"] = socket_path
+
+    from lhpcdt import config, lrms, jobs, stated
+
+    cfg = config.GfxConfig.create()
+    cfg.backend = "cli"
+    cfg.output_format = "text"
+    cfg.debug_mode = False
+
+    try:
+        # No daemon running
+
+        assert lrms.StateClient().query_output("nodes") is None
+
+        daemon = stated.StateDaemon(socket_path, interval=3600.0)
+        daemon.start()
+
+        server_thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        server_thread.start()
+
+        time.sleep(0.5)
+
+        # A single poll at startup: queue, job status and nodes
+
+        assert calls(log_filename, "squeue") == 2, calls(log_filename, "squeue")
+        assert calls(log_filename, "scontrol") == 1, calls(log_filename, "scontrol")
+
+        assert lrms.StateClient().request("status")["poll_count"] == 1
+
+        queue = lrms.Queue()
+
+        queue.update()
+        assert len(queue.snapshot) == 3, len(queue.snapshot)
+
+        queue.update(user="alice")
+        assert len(queue.snapshot) == 2, len(queue.snapshot)
+
+        queue.update(state="PENDING", account="lu-test")
+        assert len(queue.snapshot) == 1, len(queue.snapshot)
+
+        slurm = lrms.Slurm()
+
+        nodes = slurm.query_nodes()
+        assert sorted(nodes.keys()) == ["cn001", "cn002"], nodes.keys()
+        assert nodes["cn002"]["State"] == "IDLE"
+
+        states = slurm.query_node_states()
+        assert states == {"cn001": ("MIXED", "1.50", "200000"), "cn002": ("IDLE", "0.01", "245000")}, states
+
+        details = slurm.query_node_details(["cn002", "cn999"])
+        assert list(details.keys()) == ["cn002"], details.keys()
+        assert details["cn002"]["CPUTot"] == "48"
+
+        job = jobs.Job()
+        job.id = 1001
+        slurm.job_status(job)
+        assert job.status == "R", job.status
+        assert job.nodes == "cn001", job.nodes
+
+        assert calls(log_filename, "squeue") == 2, calls(log_filename, "squeue")
+        assert calls(log_filename, "scontrol") == 1, calls(log_filename, "scontrol")
+        assert calls(log_filename, "sinfo") == 0, calls(log_filename, "sinfo")
+
+        # Without the daemon clients run the SLURM tools themselves
+
+        daemon.shutdown()
+
+        assert not os.path.exists(socket_path)
+        assert lrms.StateClient().query_output("queue") is None
+
+        queue.update()
+        assert len(queue.snapshot) == 3, len(queue.snapshot)
+        assert calls(log_filename, "squeue") == 3, calls(log_filename, "squeue")
+
+        nodes = slurm.query_nodes()
+        assert sorted(nodes.keys()) == ["cn001", "cn002"], nodes.keys()
+        assert calls(log_filename, "scontrol") == 2, calls(log_filename, "scontrol")
+
+        states = slurm.query_node_states()
+        assert states["cn001"] == ("mixed", "1.50", "200000"), states
+        assert calls(log_filename, "sinfo") == 1, calls(log_filename, "sinfo")
+
+        print("ok")
+    finally:
+        shutil.rmtree(test_dir)